@@ -1,47 +1,18 @@
 import json
 import statistics
-from collections import defaultdict
 from datetime import datetime
+
+from ratemyprofessor.analytics import department_statistics
+from ratemyprofessor.snapshot import Snapshot
 import matplotlib.pyplot as plt
 import numpy as np
 
-# Load professor data
-with open("professors_school_1448_complete.json", "r") as f:
-    data = json.load(f)
-    professors = data["professors"]
-
-# Group professors by department
-departments = defaultdict(list)
-for prof in professors:
-    dept = prof.get("department", "Unknown")
-    if dept and dept != "Unknown":
-        departments[dept].append(prof)
-
-# Calculate statistics for each department
-dept_stats = {}
-
-for dept_name, profs in departments.items():
-    # Filter out professors with no ratings
-    rated_profs = [p for p in profs if p.get("numRatings", 0) > 0]
-    
-    if rated_profs:
-        ratings = [p.get("rating", 0) for p in rated_profs if p.get("rating")]
-        difficulties = [p.get("difficulty", 0) for p in rated_profs if p.get("difficulty")]
-        num_ratings = [p.get("numRatings", 0) for p in rated_profs]
-        would_take_again = [p.get("wouldTakeAgainPercent", 0) for p in rated_profs if p.get("wouldTakeAgainPercent")]
-        
-        dept_stats[dept_name] = {
-            "total_professors": len(profs),
-            "rated_professors": len(rated_profs),
-            "avg_rating": statistics.mean(ratings) if ratings else 0,
-            "avg_difficulty": statistics.mean(difficulties) if difficulties else 0,
-            "total_reviews": sum(num_ratings),
-            "avg_reviews_per_prof": statistics.mean(num_ratings) if num_ratings else 0,
-            "avg_would_take_again": statistics.mean(would_take_again) if would_take_again else 0,
-            "rating_std_dev": statistics.stdev(ratings) if len(ratings) > 1 else 0,
-            "top_prof": max(rated_profs, key=lambda x: x.get("rating", 0) * x.get("numRatings", 0)),
-            "most_reviewed": max(rated_profs, key=lambda x: x.get("numRatings", 0))
-        }
+# Compute every department's statistics in one pass over the professor data
+professors = Snapshot("professors_school_1448_complete.json")
+statistics_document = department_statistics(professors)
+professor_count = statistics_document["total_professors"]
+department_count = statistics_document["total_departments"]
+dept_stats = statistics_document["department_stats"]
 
 # Sort departments by various metrics
 by_rating = sorted(dept_stats.items(), key=lambda x: x[1]["avg_rating"], reverse=True)
@@ -124,7 +95,7 @@ article = f"""
 
 ## Executive Summary
 
-An analysis of {len(professors)} professors across {len(departments)} departments at the University of Northern British Columbia reveals significant variations in student satisfaction and teaching effectiveness across academic units.
+An analysis of {professor_count} professors across {department_count} departments at the University of Northern British Columbia reveals significant variations in student satisfaction and teaching effectiveness across academic units.
 
 ## Key Findings
 
@@ -207,8 +178,8 @@ for dept, stats in sorted(low_rating_high_difficulty, key=lambda x: x[1]["avg_di
 article += f"""
 ## By The Numbers
 
-- **Total Professors Analyzed**: {len(professors)}
-- **Departments Evaluated**: {len(departments)}
+- **Total Professors Analyzed**: {professor_count}
+- **Departments Evaluated**: {department_count}
 - **Total Student Reviews**: {sum(s['total_reviews'] for s in dept_stats.values()):,}
 - **Overall UNBC Rating**: {statistics.mean([p.get('rating', 0) for p in professors if p.get('rating')]):,.2f}/5.0
 - **Overall UNBC Difficulty**: {statistics.mean([p.get('difficulty', 0) for p in professors if p.get('difficulty')]):,.2f}/5.0
@@ -234,12 +205,7 @@ with open("unbc_department_analysis_article.md", "w") as f:
 
 # Also save raw stats for fact-checking
 with open("department_statistics.json", "w") as f:
-    json.dump({
-        "analysis_date": datetime.now().isoformat(),
-        "total_professors": len(professors),
-        "total_departments": len(departments),
-        "department_stats": dept_stats
-    }, f, indent=2)
+    json.dump(statistics_document, f, indent=2)
 
 print("✅ Analysis complete!")
 print(f"📊 Generated visualization: unbc_department_analysis.png")
@@ -1,8 +1,9 @@
-import requests
 import json
 import base64
 import time
 
+import ratemyprofessor
+
 # Your school ID
 SCHOOL_ID = 1448
 
@@ -56,6 +57,7 @@ search_query = {
     }
 }
 
+transport = ratemyprofessor.get_transport()
 all_professors = []
 cursor = None
 page = 1
@@ -71,11 +73,8 @@ while True:
     print(f"Fetching page {page}...")
     
     try:
-        response = requests.post(
-            "https://www.ratemyprofessors.com/graphql",
-            json=search_query,
-            headers=headers
-        )
+        # The shared transport rate limits, and retries throttled requests with backoff
+        response = transport.post("/graphql", json=search_query, headers=headers)
         
         if response.status_code != 200:
             print(f"Error: HTTP {response.status_code}")
@@ -118,7 +117,6 @@ while True:
         if page_info.get("hasNextPage"):
             cursor = page_info.get("endCursor")
             page += 1
-            time.sleep(1)  # Rate limiting
         else:
             print("No more pages.")
             break
@@ -1,10 +1,14 @@
-import requests
 import json
 import base64
-import time
 import os
 from datetime import datetime
 
+import ratemyprofessor
+from ratemyprofessor.jsonl import JSONLWriter, read_jsonl
+from ratemyprofessor.snapshot import Snapshot
+
+transport = ratemyprofessor.get_transport()
+
 # Your school ID
 SCHOOL_ID = 1448
 
@@ -15,12 +19,11 @@ headers = {
     "Content-Type": "application/json"
 }
 
-# Load existing professor data
-with open("professors_school_1448_complete.json", "r") as f:
-    professor_data = json.load(f)
-    professors = professor_data["professors"]
+# Load existing professor data lazily, one professor at a time
+professors = Snapshot("professors_school_1448_complete.json")
+professor_count = professors.count()
 
-print(f"Found {len(professors)} professors to fetch detailed data for...")
+print(f"Found {professor_count} professors to fetch detailed data for...")
 print("-" * 80)
 
 # Enhanced GraphQL query for professor details
@@ -128,7 +131,7 @@ def fetch_all_ratings(professor_graphql_id):
         }
         
         try:
-            response = requests.post("https://www.ratemyprofessors.com/graphql", json=query, headers=headers)
+            response = transport.post("/graphql", json=query, headers=headers)
             data = response.json()
             
             ratings_data = data.get("data", {}).get("node", {}).get("ratings", {})
@@ -142,7 +145,6 @@ def fetch_all_ratings(professor_graphql_id):
             page_info = ratings_data.get("pageInfo", {})
             if page_info.get("hasNextPage"):
                 cursor = page_info.get("endCursor")
-                time.sleep(0.2)  # Rate limiting
             else:
                 break
                 
@@ -152,13 +154,17 @@ def fetch_all_ratings(professor_graphql_id):
     
     return all_ratings
 
-# Fetch detailed data for each professor
-enhanced_professors = []
+# Fetch detailed data for each professor, appending each one to the output file as soon as it is done
+fetch_date = datetime.now()
+output_file = f"professors_UNBC_complete_with_details_{fetch_date.strftime('%Y%m%d_%H%M%S')}.jsonl"
+metadata_file = output_file[:-len(".jsonl")] + ".meta.json"
+writer = JSONLWriter(output_file)
+total_professors = 0
 batch_size = 10  # Process in batches to show progress
 
 for i, prof in enumerate(professors):
     if i % batch_size == 0:
-        print(f"\nProcessing professors {i+1}-{min(i+batch_size, len(professors))}...")
+        print(f"\nProcessing professors {i+1}-{min(i+batch_size, professor_count)}...")
     
     professor_graphql_id = prof.get("graphql_id")
     if not professor_graphql_id:
@@ -169,7 +175,7 @@ for i, prof in enumerate(professors):
     
     try:
         # Fetch professor details
-        response = requests.post("https://www.ratemyprofessors.com/graphql", json=professor_detail_query, headers=headers)
+        response = transport.post("/graphql", json=professor_detail_query, headers=headers)
         data = response.json()
         
         professor_info = data.get("data", {}).get("node", {})
@@ -243,40 +249,40 @@ for i, prof in enumerate(professors):
                 "ratings": processed_ratings
             }
             
-            enhanced_professors.append(enhanced_prof)
+            writer.write(enhanced_prof)
+            total_professors += 1
             
             # Show progress
             if (i + 1) % 5 == 0:
                 print(f"  Processed: {prof['name']} - {len(processed_ratings)} ratings, {len(courses)} courses, {len(tags)} tags")
         
-        # Rate limiting
-        time.sleep(0.5)
-        
     except Exception as e:
         print(f"  Error processing {prof['name']}: {str(e)}")
         # Still add the professor with original data
-        enhanced_professors.append(prof)
+        writer.write(prof)
+        total_professors += 1
 
-print("\n" + "-" * 80)
-print(f"Successfully fetched detailed data for {len(enhanced_professors)} professors")
+writer.close()
 
-# Save enhanced data
-output_file = f"professors_UNBC_complete_with_details_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-with open(output_file, "w", encoding="utf-8") as f:
+# What used to be the header of the JSON output, next to the professors
+with open(metadata_file, "w", encoding="utf-8") as f:
     json.dump({
         "school_id": SCHOOL_ID,
         "school_name": "University of Northern British Columbia",
-        "total_professors": len(enhanced_professors),
-        "fetch_date": datetime.now().isoformat(),
-        "professors": enhanced_professors
+        "total_professors": total_professors,
+        "fetch_date": fetch_date.isoformat(),
+        "professors_file": os.path.basename(output_file)
     }, f, indent=2, ensure_ascii=False)
 
+print("\n" + "-" * 80)
+print(f"Successfully fetched detailed data for {total_professors} professors")
 print(f"\nEnhanced data saved to: {output_file}")
+print(f"School and fetch details saved to: {metadata_file}")
 
-# Generate statistics
-total_ratings = sum(prof.get("total_ratings_fetched", 0) for prof in enhanced_professors)
-total_courses = sum(len(prof.get("courses", [])) for prof in enhanced_professors)
-professors_with_tags = sum(1 for prof in enhanced_professors if prof.get("rating_tags"))
+# Generate statistics, reading the professors back one at a time
+total_ratings = sum(prof.get("total_ratings_fetched", 0) for prof in read_jsonl(output_file))
+total_courses = sum(len(prof.get("courses", [])) for prof in read_jsonl(output_file))
+professors_with_tags = sum(1 for prof in read_jsonl(output_file) if prof.get("rating_tags"))
 
 print("\nStatistics:")
 print(f"  Total ratings collected: {total_ratings:,}")
@@ -285,7 +291,7 @@ print(f"  Professors with rating tags: {professors_with_tags}")
 
 # Find most common tags
 all_tags = {}
-for prof in enhanced_professors:
+for prof in read_jsonl(output_file):
     for tag in prof.get("rating_tags", []):
         tag_name = tag.get("name", "")
         tag_count = tag.get("count", 0)
@@ -298,7 +304,7 @@ for tag, count in sorted_tags:
 
 # Find most reviewed courses
 all_courses = {}
-for prof in enhanced_professors:
+for prof in read_jsonl(output_file):
     for course in prof.get("courses", []):
         course_name = course.get("name", "")
         course_count = course.get("count", 0)
@@ -313,7 +319,7 @@ for course, count in sorted_courses:
 # Sample some interesting ratings
 print("\nSample Recent Reviews:")
 all_recent_ratings = []
-for prof in enhanced_professors:
+for prof in read_jsonl(output_file):
     for rating in prof.get("ratings", [])[:5]:  # Get first 5 from each
         if rating.get("comment") and rating.get("date"):
             all_recent_ratings.append({
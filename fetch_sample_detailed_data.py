@@ -1,9 +1,13 @@
-import requests
 import json
 import base64
-import time
+import heapq
 from datetime import datetime
 
+import ratemyprofessor
+from ratemyprofessor.snapshot import Snapshot
+
+transport = ratemyprofessor.get_transport()
+
 # Your school ID
 SCHOOL_ID = 1448
 
@@ -14,13 +18,9 @@ headers = {
     "Content-Type": "application/json"
 }
 
-# Load existing professor data
-with open("professors_school_1448_complete.json", "r") as f:
-    professor_data = json.load(f)
-    professors = professor_data["professors"]
-
-# Take top 5 professors by rating count as examples
-sample_professors = sorted(professors, key=lambda x: x.get("numRatings", 0), reverse=True)[:5]
+# Take top 5 professors by rating count as examples, reading the existing professor data one professor at a time
+with Snapshot("professors_school_1448_complete.json") as professors:
+    sample_professors = heapq.nlargest(5, professors, key=lambda x: x.get("numRatings", 0))
 
 print(f"Fetching detailed data for top 5 professors as examples...")
 print("-" * 80)
@@ -96,7 +96,7 @@ def fetch_professor_details(professor_graphql_id, professor_name):
     }
     
     try:
-        response = requests.post("https://www.ratemyprofessors.com/graphql", json=query, headers=headers)
+        response = transport.post("/graphql", json=query, headers=headers)
         data = response.json()
         return data.get("data", {}).get("node", {})
     except Exception as e:
@@ -184,8 +184,7 @@ for prof in sample_professors:
         print(f"  ✓ Courses: {len(enhanced_prof['courses'])}")
         print(f"  ✓ Tags: {', '.join([t['name'] for t in enhanced_prof['tags'][:5]])}")
         print(f"  ✓ Recent reviews: {len(enhanced_prof['recent_reviews'])}")
-        
-    time.sleep(1)  # Rate limiting
+
 
 # Save the sample data
 output_file = "sample_professors_detailed_data.json"
@@ -11,56 +11,37 @@ Original
 Updated in 2024 by sejager
 """
 
-import requests
-import re
 import json
 import base64
-import os
-import difflib
-
 from .professor import Professor
-from .school import School
-
+from .school import School, get_school, parse_school_id
+from .cache import SQLiteCache, memo, normalize_query
+from .names import INDEX_MIN_SCORE, NameIndex
+from .offline import allows_network, get_offline, set_offline
+from .ratelimit import RateLimiter, RetryPolicy, TokenBucket, get_limiter, set_limiter
+from .store import Store
+from .transport import Transport, get_transport, set_transport
+from .queries import HEADERS as headers
+from .queries import SCHOOL_SEARCH_QUERY, TEACHER_SEARCH_QUERY, graphql_headers, graphql_request
 
-with open(os.path.join(os.path.dirname(__file__), "json/header.json"), 'r') as f:
-    headers = json.load(f)
 
-def get_school_by_name(school_name: str):
+def get_school_by_name(school_name: str, transport: Transport = None, name_index: NameIndex = None):
     """
     NEW VERSION by sejager
     Gets a School with the name closest to the search string
+
+    :param school_name: The school's name.
+    :param transport: The transport to send requests through. Defaults to the shared transport.
+    :param name_index: A NameIndex of schools. If it has a close enough name, that school is returned
+                       without a search request.
+    :return: The school that best matches the school name. If no schools are found, this will return None.
     """
-    
-    school_name.replace(' ', '+')
-    url = "https://www.ratemyprofessors.com/search/schools?q=%s" % school_name
-    page = requests.get(url)
-    # Create an array of all the school names found via the search function
-    pat = r"(?<=(\"name\":\")).+?(?=\")"
-    matches = re.finditer(pat, page.text)
-    school_list = []
-    for match in matches:
-            school_list.append(match.group())
-    # Get the closest match and its index
-    closest_match = difflib.get_close_matches(school_name, school_list, 1, 0.1)
-    # If the string isn't close enough to anything try old method of just getting top of list
-    try:
-        closest_match_index = school_list.index(closest_match[0])
-    except IndexError:
-        schools = get_schools_by_name(school_name)
-        if schools:
-            return schools[0]
-        else:
-            return None
+    if name_index is not None:
+        matches = name_index.resolve(school_name, limit=1, min_score=INDEX_MIN_SCORE)
+        if matches:
+            return get_school(matches[0].key, name=matches[0].name, transport=transport, lazy=True)
 
-    # Create an array of the school IDs and find the wanted one using the index above
-    data = re.findall(r'"legacyId":(\d+)', page.text)
-    school_list = []
-    for school_data in data:
-        try:
-            school_list.append(School(int(school_data)))
-        except ValueError:
-            pass
-    return school_list[closest_match_index]
+    return _closest_school(school_name, get_schools_by_name(school_name, transport=transport))
 
     """
     OLD VERSION
@@ -80,30 +61,88 @@ def get_school_by_name(school_name: str):
         return None
     """
 
-def get_schools_by_name(school_name: str):
+
+def get_schools_by_name(school_name: str, transport: Transport = None):
     """
     Gets a list of Schools with the specified name.
 
     This only returns up to 20 schools, so make sure that the name is specific.
     For instance, searching "University" will return more than 20 schools, but only the first 20 will be returned.
+    Use iter_schools to get every match.
+
+    The schools are filled in from the search results, so no further requests are made for them.
+    Recent searches are kept in memo, so repeating one does not request the page again.
+    In offline mode, the schools are found in the store when it has any with a close enough name.
 
     :param school_name: The school's name.
+    :param transport: The transport to send requests through. Defaults to the shared transport.
     :return: List of schools that match the school name. If no schools are found, this will return an empty list.
     """
-    school_name.replace(' ', '+')
-    url = "https://www.ratemyprofessors.com/search/schools?q=%s" % school_name
-    page = requests.get(url)
-    data = re.findall(r'"legacyId":(\d+)', page.text)
-    school_list = []
-    for school_data in data:
-        try:
-            school_list.append(School(int(school_data)))
-        except ValueError:
-            pass
-    return school_list
+    store = get_offline()
+    if store is not None:
+        schools = store.search_schools(school_name)
+        if schools or not allows_network():
+            return schools
+
+    transport = transport or get_transport()
+    key = (transport, "schools", normalize_query(school_name))
+    schools = memo.get(key)
+    if schools is None:
+        query, request_headers = _school_search_request(school_name, 20)
+        data = transport.post("/graphql", json=query, headers=request_headers, kind="search")
+        schools, _ = _school_search_page(data.text, transport)
+        memo.set(key, schools)
+    return list(schools)
+
+
+def iter_schools(school_name: str, page_size: int = 20, transport: Transport = None):
+    """
+    Yields every School with the specified name, fetching them one page at a time.
+
+    :param school_name: The school's name.
+    :param page_size: The number of schools to request at once.
+    :param transport: The transport to send requests through. Defaults to the shared transport.
+    :return: A generator of the schools that match the school name, with their city, state and departments.
+    """
+    transport = transport or get_transport()
+    cursor = None
+    while True:
+        query, request_headers = _school_search_request(school_name, page_size, cursor)
+        data = transport.post("/graphql", json=query, headers=request_headers, kind="search")
+        schools, page_info = _school_search_page(data.text, transport)
+        yield from schools
+
+        if not schools or page_info is None or not page_info["hasNextPage"]:
+            return
+        cursor = page_info["endCursor"]
+
+
+def get_professors(professor_ids: list, chunk_size: int = 50, transport: Transport = None):
+    """
+    Gets a list of Professors with the specified ids.
+
+    The professors are fetched chunk_size at a time, so N ids take ceil(N / chunk_size) requests
+    instead of one request per professor.
+
+    :param professor_ids: The professors' ids.
+    :param chunk_size: The maximum number of professors to fetch in one request.
+    :param transport: The transport to send requests through. Defaults to the shared transport.
+    :return: List of professors in the same order as the ids. Ids that are not found are left out.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+
+    professor_ids = [int(professor_id) for professor_id in professor_ids]
+    # In offline mode, only the professors the store does not have are requested.
+    found, missing = Professor._split_offline(professor_ids, transport=transport)
+    for start in range(0, len(missing), chunk_size):
+        for professor in Professor._get_many(missing[start:start + chunk_size], transport=transport):
+            found[professor.id] = professor
+    return [found[professor_id] for professor_id in professor_ids if professor_id in found]
 
 
-def get_professor_by_school_and_name(college: School, professor_name: str):
+def get_professor_by_school_and_name(college: School, professor_name: str, transport: Transport = None,
+                                     name_index: NameIndex = None):
     """
     Gets a Professor with the specified School and professor name.
 
@@ -114,6 +153,9 @@ def get_professor_by_school_and_name(college: School, professor_name: str):
 
     :param college: The professor's school.
     :param professor_name: The professor's name.
+    :param transport: The transport to send requests through. Defaults to the shared transport.
+    :param name_index: A NameIndex of professors, grouped by school id. If it has a close enough name at the school,
+                       that professor is returned without a search request, and loaded when first read.
     :return: The professor that matches the school and name. If no professors are found, this will return None.
     """
     
@@ -121,41 +163,30 @@ def get_professor_by_school_and_name(college: School, professor_name: str):
     if college is None:
         return None
 
-    prof_names = []
-    closest_match = ''
-    max_professor = None
-    
-    professors = get_professors_by_school_and_name(college, professor_name)
+    if name_index is not None:
+        matches = name_index.resolve(professor_name, limit=1, group=college.id, min_score=INDEX_MIN_SCORE)
+        if matches:
+            return Professor(matches[0].key, transport=transport, lazy=True)
 
-    for prof in professors:
-        prof_names.append(prof.name)
-    
-    # Check name that is closest if there's a first and last name? Could use this as default
-    # instead of checking for space in case people are doing firstNamelastName without space
-    if (' ' in professor_name):
-        closest_match = difflib.get_close_matches(professor_name, prof_names, 1, 0.4)
-    try:
-        closest_match_index = prof_names.index(closest_match[0])
-    # If the string isn't close enough to anything try old method
-    except IndexError:
-        for prof in professors:
-            if max_professor is None or max_professor.num_ratings < prof.num_ratings:
-                max_professor = prof
-        return max_professor
-    
-    return professors[closest_match_index]
+    professors = get_professors_by_school_and_name(college, professor_name, transport=transport)
+    return _closest_professor(professor_name, professors)
 
 
-def get_professors_by_school_and_name(college: School, professor_name: str):
+def get_professors_by_school_and_name(college: School, professor_name: str, transport: Transport = None):
     """
     Gets a list of professors with the specified School and professor name.
 
     This only returns up to 20 professors, so make sure that the name is specific.
     For instance, searching "Smith" with a school might return more than 20 professors,
-    but only the first 20 will be returned.
+    but only the first 20 will be returned. Use iter_professors to get every match.
+
+    The professors are filled in from the search results. Anything the search does not return, such as
+    their courses, is only requested when it is first read. Recent searches are kept in memo.
+    In offline mode, the professors are found in the store when it has any with a close enough name at the school.
 
     :param college: The professor's school.
     :param professor_name: The professor's name.
+    :param transport: The transport to send requests through. Defaults to the shared transport.
     :return: List of professors that match the school and name. If no professors are found,
              this will return an empty list.
     """
@@ -163,17 +194,138 @@ def get_professors_by_school_and_name(college: School, professor_name: str):
 
     if college is None:
         return None
+
+    store = get_offline()
+    if store is not None:
+        professors = store.search_professors(college.id, professor_name)
+        if professors or not allows_network():
+            return professors
+
+    transport = transport or get_transport()
+    key = (transport, "professors", college.id, normalize_query(professor_name))
+    professors = memo.get(key)
+    if professors is None:
+        query, request_headers = _teacher_search_request(college, professor_name, 20)
+        data = transport.post("/graphql", json=query, headers=request_headers, kind="search")
+        professors, _ = _teacher_search_page(data.text, college, transport)
+        memo.set(key, professors)
+    return list(professors)
+
+
+def iter_professors(college: School, query: str = "", page_size: int = 100, transport: Transport = None):
+    """
+    Yields every professor at a School whose name matches the query, fetching them one page at a time.
+
+    The professors are filled in from the search results, so their rating, difficulty, number of ratings and
+    would take again percentage need no further request. Their courses are only requested when first read.
+
+    :param college: The professors' school.
+    :param query: The professor's name, or an empty string for every professor at the school.
+    :param page_size: The number of professors to request at once.
+    :param transport: The transport to send requests through. Defaults to the shared transport.
+    :return: A generator of the professors that match the query.
+    """
+    transport = transport or get_transport()
+    cursor = None
+    while True:
+        request, request_headers = _teacher_search_request(college, query, page_size, cursor)
+        data = transport.post("/graphql", json=request, headers=request_headers, kind="search")
+        professors, page_info = _teacher_search_page(data.text, college, transport)
+        yield from professors
+
+        if not professors or page_info is None or not page_info["hasNextPage"]:
+            return
+        cursor = page_info["endCursor"]
+
+
+def _closest_school(school_name: str, schools: list):
+    """Picks the school from a search whose name is closest to the search string."""
+    # Key the names by their position, so schools with the same name stay apart
+    names = NameIndex()
+    for position, school in enumerate(schools):
+        names.add(position, school.name)
+    closest_match = names.resolve(school_name, limit=1, min_score=INDEX_MIN_SCORE)
+    # If the string isn't close enough to anything try old method of just getting top of list
+    if not closest_match:
+        if schools:
+            return schools[0]
+        else:
+            return None
+
+    return schools[closest_match[0].key]
+
+
+def _closest_professor(professor_name: str, professors: list):
+    """Picks the professor from a search whose name is closest to the search string, or the most rated one."""
+    closest_match = []
+    max_professor = None
+
+    # Check name that is closest if there's a first and last name? Could use this as default
+    # instead of checking for space in case people are doing firstNamelastName without space
+    if (' ' in professor_name):
+        names = NameIndex()
+        for position, prof in enumerate(professors):
+            names.add(position, prof.name)
+        closest_match = names.resolve(professor_name, limit=1, min_score=INDEX_MIN_SCORE)
+    # If the string isn't close enough to anything try old method
+    if not closest_match:
+        for prof in professors:
+            if max_professor is None or max_professor.num_ratings < prof.num_ratings:
+                max_professor = prof
+        return max_professor
     
-    url = 'https://www.ratemyprofessors.com/search/professors/%s?q=%s' % (college.id, professor_name)
-    page = requests.get(url)
-    data = re.findall(r'"legacyId":(\d+)', page.text)
-    professor_list = []
+    return professors[closest_match[0].key]
+
+
+def _school_search_request(school_name: str, count: int, cursor: str = None):
+    """Builds the query and headers that fetch one page of a school search."""
+    return graphql_request(SCHOOL_SEARCH_QUERY, query={"text": school_name}, count=count, cursor=cursor), \
+        graphql_headers()
+
+
+def _school_search_page(text: str, transport: Transport = None):
+    """
+    Gets the schools out of a school search response.
+
+    :param text: The GraphQL response.
+    :param transport: The transport the schools send their own requests through.
+    :return: The schools, and the page info with hasNextPage and endCursor.
+    """
+    data = json.loads(text).get("data")
+    if data is None:
+        raise ValueError("Bad request.")
+
+    schools = data["newSearch"]["schools"]
+    return [School._from_search(edge["node"], transport=transport) for edge in schools["edges"]], \
+        schools.get("pageInfo")
+
 
-    for professor_data in data:
-        try:
-            professor_list.append(Professor(int(professor_data)))
-        except ValueError:
-            pass
+def _teacher_search_request(college: School, professor_name: str, count: int, cursor: str = None):
+    """Builds the query and headers that fetch one page of a professor search at a school."""
+    school_id = base64.b64encode(("School-%s" % college.id).encode('ascii')).decode('ascii')
+    return graphql_request(TEACHER_SEARCH_QUERY, query={"text": professor_name, "schoolID": school_id},
+                           count=count, cursor=cursor), \
+        graphql_headers("https://www.ratemyprofessors.com/search/professors/%s" % college.id)
 
-    return professor_list
 
+def _teacher_search_page(text: str, college: School, transport: Transport = None):
+    """
+    Gets the professors out of a professor search response.
+
+    When nothing matches, RateMyProfessor falls back to other professors and sets didFallback.
+    Those are not matches, so they are left out.
+
+    :param text: The GraphQL response.
+    :param college: The school that was searched.
+    :param transport: The transport the professors send their own requests through.
+    :return: The professors, and the page info with hasNextPage and endCursor.
+    """
+    data = json.loads(text).get("data")
+    if data is None:
+        raise ValueError("Bad request.")
+
+    teachers = data["search"]["teachers"]
+    if teachers.get("didFallback"):
+        return [], None
+    return [Professor._from_search(edge["node"], college, transport=transport) for edge in teachers["edges"]], \
+        teachers.get("pageInfo")
@@ -0,0 +1,507 @@
+"""
+asyncio versions of the ratemyprofessor functions.
+
+Every coroutine here mirrors the function of the same name in the ratemyprofessor package,
+but sends its requests through an AsyncTransport so one event loop can serve many lookups at once.
+This module requires aiohttp, which can be installed with ``pip install RateMyProfessorAPI[aio]``.
+"""
+
+import asyncio
+import datetime
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError("ratemyprofessor.aio requires aiohttp. "
+                      "Install it with: pip install RateMyProfessorAPI[aio]") from e
+
+from . import INDEX_MIN_SCORE, _closest_professor, _closest_school, _school_search_page, _school_search_request, \
+    _teacher_search_page, _teacher_search_request
+from .cache import cache_key, memo, normalize_query
+from .professor import Professor, Rating, _offline_data, _utc
+from .ratelimit import RETRY_STATUSES, RateLimiter, RetryPolicy, get_limiter, retry_after
+from .singleflight import AsyncSingleFlight
+from .names import NameIndex
+from .offline import allows_network, get_offline
+from .school import School, get_school
+from .transport import BASE_URL, USER_AGENT
+
+
+class AsyncTransport:
+    """Owns the aiohttp connection pool that every asynchronous RateMyProfessor request goes through."""
+
+    def __init__(self, base_url: str = BASE_URL, pool_size: int = 100, per_host: int = 0,
+                 max_concurrency: int = 100, timeout: float = 30, limiter: RateLimiter = None,
+                 retry: RetryPolicy = None, coalesce: bool = True):
+        """
+        Initializes an asynchronous transport.
+
+        The aiohttp session is created on first use, inside the running event loop.
+
+        :param base_url: The site root that relative paths are resolved against.
+        :param pool_size: The maximum number of open connections in total.
+        :param per_host: The maximum number of open connections per host, or 0 for no per-host limit.
+        :param max_concurrency: The maximum number of requests in flight at once. Extra requests wait their turn.
+        :param timeout: The total timeout for one request in seconds.
+        :param limiter: The rate limiter requests wait on. Defaults to the limiter shared by the whole process,
+                        which the synchronous transport uses too.
+        :param retry: When to retry requests that fail or are throttled. Defaults to RetryPolicy().
+        :param coalesce: If true, identical requests sent while one is already in flight share its response
+                         instead of going to the network again.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.limiter = limiter
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.flights = AsyncSingleFlight() if coalesce else None
+        # The Professors and Schools built by this module are given this instead of a synchronous transport.
+        self._stand_in = _AsyncOnly(self)
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+
+    def url(self, path: str):
+        """
+        Returns the absolute url for a path on the site.
+
+        :param path: A path such as "/graphql", or an absolute url which is returned unchanged.
+        :return: The absolute url.
+        """
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return self.base_url + path
+
+    async def _get_session(self):
+        loop = asyncio.get_running_loop()
+        # A session belongs to the loop it was created in, so a new loop gets a new session, and the old one's
+        # connections are closed.
+        session = self._session
+        if session is None or session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.per_host)
+            self._session = aiohttp.ClientSession(connector=connector, headers={"User-Agent": USER_AGENT},
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+            if session is not None and not session.closed:
+                await session.close()
+        return self._session
+
+    async def get(self, path: str, headers: dict = None, params: dict = None):
+        """
+        Sends a GET request through the connection pool.
+
+        :param path: The path or url to request.
+        :param headers: Extra headers for this request.
+        :param params: Query string parameters for this request.
+        :return: The response body as text.
+        """
+        return await self._coalesce("GET", self.url(path), headers=headers, params=params)
+
+    async def post(self, path: str, json: dict = None, headers: dict = None):
+        """
+        Sends a POST request with a JSON body through the connection pool.
+
+        :param path: The path or url to request.
+        :param json: The JSON body to send.
+        :param headers: Extra headers for this request.
+        :return: The response body as text.
+        """
+        return await self._coalesce("POST", self.url(path), json=json, headers=headers)
+
+    async def _coalesce(self, method: str, url: str, headers: dict = None, params: dict = None, json: dict = None):
+        """Sends a request, or joins the identical request that is already in flight."""
+        if self.flights is None:
+            return await self._request(method, url, headers=headers, params=params, json=json)
+        return await self.flights.do(cache_key(method, url, params, json), self._request, method, url,
+                                     headers=headers, params=params, json=json)
+
+    async def _request(self, method: str, url: str, **kwargs):
+        """Sends a request once its endpoint's rate limit allows it, retrying failures and throttled responses."""
+        session = await self._get_session()
+        bucket = (self.limiter or get_limiter()).bucket(url)
+        attempt = 0
+        while True:
+            if bucket is not None:
+                await asyncio.sleep(bucket.reserve())
+
+            try:
+                async with self._semaphore:
+                    async with session.request(method, url, **kwargs) as response:
+                        text = await response.text()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.retry.retries:
+                    raise
+                await asyncio.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status not in RETRY_STATUSES:
+                if bucket is not None:
+                    bucket.on_success()
+                return text
+
+            wait = retry_after(response)
+            if bucket is not None:
+                bucket.on_throttle(self.retry.throttle(wait))
+            if self.retry.gives_up(attempt, wait):
+                return text
+            await asyncio.sleep(self.retry.delay(attempt, wait))
+            attempt += 1
+
+    async def close(self):
+        """Closes every pooled connection."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class _AsyncOnly:
+    """
+    Stands in for the synchronous transport of the Professors and Schools that this module returns.
+
+    Reading a field of a lazy professor would otherwise send a blocking request from inside the event loop,
+    so it raises ValueError instead, and the professor has to be loaded with load_professor first.
+    """
+
+    def __init__(self, transport: AsyncTransport):
+        self.async_transport = transport
+        self.base_url = transport.base_url
+
+    def get(self, path: str, **kwargs):
+        raise ValueError("Objects from ratemyprofessor.aio do not send blocking requests. "
+                         "Load the professor with await ratemyprofessor.aio.load_professor(professor) first.")
+
+    post = get
+
+
+def _async_transport(professor: Professor, transport: AsyncTransport = None):
+    """Gets the transport a professor's requests go through, by default the one it was found with."""
+    if transport is None and isinstance(professor._transport, _AsyncOnly):
+        transport = professor._transport.async_transport
+    return transport or get_transport()
+
+
+_transport = None
+
+
+def get_transport():
+    """
+    Gets the asynchronous transport shared by the whole process, creating it on first use.
+
+    :return: The shared asynchronous transport.
+    """
+    global _transport
+    if _transport is None:
+        _transport = AsyncTransport()
+    return _transport
+
+
+def set_transport(transport: AsyncTransport):
+    """
+    Replaces the asynchronous transport shared by the whole process.
+
+    :param transport: The transport to use, or None to go back to a default transport on next use.
+    :return: The transport that was previously in use, if any.
+    """
+    global _transport
+    previous = _transport
+    _transport = transport
+    return previous
+
+
+async def get_school_by_name(school_name: str, transport: AsyncTransport = None, name_index: NameIndex = None):
+    """
+    Gets a School with the name closest to the search string.
+
+    :param school_name: The school's name.
+    :param transport: The transport to send requests through. Defaults to the shared asynchronous transport.
+    :param name_index: A NameIndex of schools. If it has a close enough name, that school is returned
+                       without a search request.
+    :return: The school that best matches the school name. If no schools are found, this will return None.
+    """
+    if name_index is not None:
+        matches = name_index.resolve(school_name, limit=1, min_score=INDEX_MIN_SCORE)
+        if matches:
+            return get_school(matches[0].key, name=matches[0].name,
+                              transport=(transport or get_transport())._stand_in, lazy=True)
+    return _closest_school(school_name, await get_schools_by_name(school_name, transport=transport))
+
+
+async def get_schools_by_name(school_name: str, transport: AsyncTransport = None):
+    """
+    Gets a list of Schools with the specified name.
+
+    :param school_name: The school's name.
+    :param transport: The transport to send requests through. Defaults to the shared asynchronous transport.
+    :return: List of schools that match the school name. If no schools are found, this will return an empty list.
+    """
+    store = get_offline()
+    if store is not None:
+        schools = store.search_schools(school_name)
+        if schools or not allows_network():
+            return schools
+
+    transport = transport or get_transport()
+    # Keyed by the transport the schools hold, like the synchronous functions key theirs.
+    key = (transport._stand_in, "schools", normalize_query(school_name))
+    schools = memo.get(key)
+    if schools is None:
+        query, request_headers = _school_search_request(school_name, 20)
+        text = await transport.post("/graphql", json=query, headers=request_headers)
+        schools, _ = _school_search_page(text, transport._stand_in)
+        memo.set(key, schools)
+    return list(schools)
+
+
+async def iter_schools(school_name: str, page_size: int = 20, transport: AsyncTransport = None):
+    """
+    Yields every School with the specified name, fetching them one page at a time.
+
+    :param school_name: The school's name.
+    :param page_size: The number of schools to request at once.
+    :param transport: The transport to send requests through. Defaults to the shared asynchronous transport.
+    :return: An asynchronous generator of the schools that match the school name.
+    """
+    transport = transport or get_transport()
+    cursor = None
+    while True:
+        query, request_headers = _school_search_request(school_name, page_size, cursor)
+        schools, page_info = _school_search_page(await transport.post("/graphql", json=query,
+                                                                      headers=request_headers),
+                                                 transport._stand_in)
+        for school in schools:
+            yield school
+
+        if not schools or page_info is None or not page_info["hasNextPage"]:
+            return
+        cursor = page_info["endCursor"]
+
+
+async def get_professor_by_school_and_name(college: School, professor_name: str, transport: AsyncTransport = None,
+                                           name_index: NameIndex = None):
+    """
+    Gets a Professor with the specified School and professor name.
+
+    :param college: The professor's school.
+    :param professor_name: The professor's name.
+    :param transport: The transport to send requests through. Defaults to the shared asynchronous transport.
+    :param name_index: A NameIndex of professors, grouped by school id. If it has a close enough name at the school,
+                       that professor is loaded by id instead of searched for.
+    :return: The professor that matches the school and name. If no professors are found, this will return None.
+    """
+    if college is None:
+        return None
+
+    if name_index is not None:
+        matches = name_index.resolve(professor_name, limit=1, group=college.id, min_score=INDEX_MIN_SCORE)
+        if matches:
+            return await get_professor(matches[0].key, transport=transport)
+
+    professors = await get_professors_by_school_and_name(college, professor_name, transport=transport)
+    return _closest_professor(professor_name, professors)
+
+
+async def get_professors_by_school_and_name(college: School, professor_name: str, transport: AsyncTransport = None):
+    """
+    Gets a list of professors with the specified School and professor name.
+
+    :param college: The professor's school.
+    :param professor_name: The professor's name.
+    :param transport: The transport to send requests through. Defaults to the shared asynchronous transport.
+    :return: List of professors that match the school and name. If no professors are found,
+             this will return an empty list.
+    """
+    if college is None:
+        return None
+
+    store = get_offline()
+    if store is not None:
+        professors = store.search_professors(college.id, professor_name)
+        if professors or not allows_network():
+            return professors
+
+    transport = transport or get_transport()
+    key = (transport._stand_in, "professors", college.id, normalize_query(professor_name))
+    professors = memo.get(key)
+    if professors is None:
+        query, request_headers = _teacher_search_request(college, professor_name, 20)
+        text = await transport.post("/graphql", json=query, headers=request_headers)
+        professors, _ = _teacher_search_page(text, college, transport._stand_in)
+        memo.set(key, professors)
+    return list(professors)
+
+
+async def iter_professors(college: School, query: str = "", page_size: int = 100, transport: AsyncTransport = None):
+    """
+    Yields every professor at a School whose name matches the query, fetching them one page at a time.
+
+    :param college: The professors' school.
+    :param query: The professor's name, or an empty string for every professor at the school.
+    :param page_size: The number of professors to request at once.
+    :param transport: The transport to send requests through. Defaults to the shared asynchronous transport.
+    :return: An asynchronous generator of the professors that match the query.
+    """
+    transport = transport or get_transport()
+    cursor = None
+    while True:
+        request, request_headers = _teacher_search_request(college, query, page_size, cursor)
+        professors, page_info = _teacher_search_page(await transport.post("/graphql", json=request,
+                                                                          headers=request_headers), college,
+                                                     transport._stand_in)
+        for professor in professors:
+            yield professor
+
+        if not professors or page_info is None or not page_info["hasNextPage"]:
+            return
+        cursor = page_info["endCursor"]
+
+
+async def get_professor(professor_id: int, transport: AsyncTransport = None):
+    """
+    Gets a fully loaded Professor with the specified id.
+
+    :param professor_id: The professor's id.
+    :param transport: The transport to send requests through. Defaults to the shared asynchronous transport.
+    :return: The professor.
+    :raises ValueError: If there is no professor with that id.
+    """
+    professor = Professor(professor_id, transport=(transport or get_transport())._stand_in, lazy=True)
+    await load_professor(professor, transport=transport)
+    return professor
+
+
+async def get_professors(professor_ids: list, chunk_size: int = 50, transport: AsyncTransport = None):
+    """
+    Gets a list of fully loaded Professors with the specified ids.
+
+    The chunks of chunk_size professors are requested concurrently.
+
+    :param professor_ids: The professors' ids.
+    :param chunk_size: The maximum number of professors to fetch in one request.
+    :param transport: The transport to send requests through. Defaults to the shared asynchronous transport.
+    :return: List of professors in the same order as the ids. Ids that are not found are left out.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+
+    transport = transport or get_transport()
+    professor_ids = [int(professor_id) for professor_id in professor_ids]
+    found, missing = Professor._split_offline(professor_ids, transport=transport._stand_in)
+    chunks = [missing[start:start + chunk_size] for start in range(0, len(missing), chunk_size)]
+
+    async def get_chunk(chunk):
+        query, request_headers = Professor._batch_request(chunk)
+        text = await transport.post("/graphql", json=query, headers=request_headers)
+        return Professor._from_batch(chunk, text, transport=transport._stand_in)
+
+    for professors in await asyncio.gather(*(get_chunk(chunk) for chunk in chunks)):
+        for professor in professors:
+            found[professor.id] = professor
+    return [found[professor_id] for professor_id in professor_ids if professor_id in found]
+
+
+async def load_professor(professor: Professor, transport: AsyncTransport = None):
+    """
+    Fills in every field of a lazy Professor, such as one returned by a search.
+
+    Professors that are already loaded are returned without a request. Until then, reading a field that the
+    search did not fill in, such as courses, raises ValueError rather than block the event loop.
+
+    :param professor: The professor to load.
+    :param transport: The transport to send requests through. Defaults to the one the professor was found with.
+    :return: The same professor.
+    :raises ValueError: If there is no professor with that id.
+    """
+    transport = _async_transport(professor, transport)
+    if not professor._loaded:
+        professor_data = memo.get((transport._stand_in, "professor", professor.id))
+        if professor_data is None:
+            professor_data = _offline_data(professor.id)
+        if professor_data is None:
+            professor_data = await _fetch_professor_data(professor.id, transport)
+        professor._load(professor_data)
+    return professor
+
+
+async def _fetch_professor_data(professor_id: int, transport: AsyncTransport):
+    """Requests one professor's Teacher node, and keeps it in memo."""
+    query, request_headers = Professor._professor_request(professor_id)
+    text = await transport.post("/graphql", json=query, headers=request_headers)
+    professor_data = Professor._professor_data(text)
+    memo.set((transport._stand_in, "professor", professor_id), professor_data)
+    return professor_data
+
+
+async def get_ratings(professor: Professor, course_name=None, raw_comments: bool = False,
+                      transport: AsyncTransport = None):
+    """
+    Gets the ratings of a professor, optionally only those for one course name.
+
+    :param professor: The professor. Lazy professors are loaded first.
+    :param course_name: The course name to get the ratings for, or None for every rating.
+    :param raw_comments: If true, the comments are left exactly as RateMyProfessor sent them.
+    :param transport: The transport to send requests through. Defaults to the one the professor was found with.
+    :return: A list of the professor's ratings. This is empty if there are no ratings.
+    """
+    await load_professor(professor, transport=transport)
+    return [rating async for rating in iter_ratings(professor, page_size=professor.num_ratings,
+                                                    course_name=course_name, raw_comments=raw_comments,
+                                                    transport=transport)]
+
+
+async def iter_ratings(professor: Professor, page_size: int = 100, since: datetime.datetime = None,
+                       course_name=None, raw_comments: bool = False, transport: AsyncTransport = None):
+    """
+    Yields the ratings of a professor, newest first, fetching them one page at a time.
+
+    :param professor: The professor. Lazy professors are loaded first.
+    :param page_size: The number of ratings to request at once.
+    :param since: If given, stop at the first rating that is older than this date. A date without a
+                  timezone is taken to be in UTC, like the rating dates.
+    :param course_name: If given, only yield the ratings for this course name.
+    :param raw_comments: If true, the comments are left exactly as RateMyProfessor sent them.
+    :param transport: The transport to send requests through. Defaults to the one the professor was found with.
+    :return: An asynchronous generator of the professor's ratings.
+    """
+    transport = _async_transport(professor, transport)
+    if since is not None:
+        since = _utc(since)
+    await load_professor(professor, transport=transport)
+    ratings = professor._offline_ratings(course_name)
+    if ratings is not None:
+        for rating_fields in ratings:
+            if since is not None and rating_fields["date"] < since:
+                return
+            yield Rating(**rating_fields, raw_comments=raw_comments)
+        return
+
+    cursor = None
+    while True:
+        request = professor._ratings_request(course_name, count=page_size, cursor=cursor)
+        if request is None:
+            return
+
+        query, request_headers = request
+        ratings, page_info = await _fetch_ratings_page(query, request_headers, transport)
+        for rating_fields in ratings:
+            if since is not None and rating_fields["date"] < since:
+                return
+            yield Rating(**rating_fields, raw_comments=raw_comments)
+
+        if not ratings or page_info is None or not page_info["hasNextPage"]:
+            return
+        cursor = page_info["endCursor"]
+
+
+async def _fetch_ratings_page(query: dict, request_headers: dict, transport: AsyncTransport):
+    """Requests a page of ratings, and gets the Rating arguments of each rating and the page info."""
+    return Professor._ratings_page(await transport.post("/graphql", json=query, headers=request_headers))
@@ -0,0 +1,326 @@
+"""
+Department statistics over many professors.
+
+The professors are read once into column arrays, one per field, with each department dictionary-encoded
+as a number. Every statistic is then computed for all departments at once, with grouped sums and sorts
+instead of a Python loop per department, so the same code handles one school or a whole country.
+
+The column arrays are NumPy arrays when NumPy is installed, which can be done with
+``pip install RateMyProfessorAPI[analytics]``. Without it the same statistics are computed in plain Python,
+which gives the same results, only slower.
+
+department_statistics gives the same document analyze_departments_for_article.py writes to
+department_statistics.json.
+"""
+
+import datetime
+import math
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_PERCENTILES = (25, 50, 75)
+
+
+class ProfessorColumns:
+    """
+    Professors stored column by column.
+
+    Departments are stored as their position in departments, or -1 for a professor without one.
+    Ratings, difficulties and would take again percentages that are missing are stored as NaN,
+    and kept as they are otherwise, including the 0 and -1 RateMyProfessor uses for "not rated yet".
+    """
+
+    def __init__(self, department, departments: list, rating, difficulty, num_ratings, would_take_again):
+        """
+        Initializes the columns. Use from_records to read them from professor records.
+
+        :param department: The department code of each professor.
+        :param departments: The department names, in the order of their codes.
+        :param rating: The average rating of each professor.
+        :param difficulty: The average difficulty of each professor.
+        :param num_ratings: The number of ratings of each professor.
+        :param would_take_again: The would take again percentage of each professor.
+        """
+        self.department = department
+        self.departments = departments
+        self.rating = rating
+        self.difficulty = difficulty
+        self.num_ratings = num_ratings
+        self.would_take_again = would_take_again
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Reads professor records into columns, in one pass.
+
+        :param records: Snapshot records like those of professors_school_1448_complete.json, with rating and
+                        difficulty, or crawl records, with avgRating and avgDifficulty.
+        :return: The ProfessorColumns.
+        """
+        department, codes, departments = array('q'), {}, []
+        rating, difficulty, would_take_again = array('d'), array('d'), array('d')
+        num_ratings = array('q')
+        for record in records:
+            name = record.get("department", "Unknown")
+            if name and name != "Unknown":
+                code = codes.get(name)
+                if code is None:
+                    code = codes[name] = len(departments)
+                    departments.append(name)
+                department.append(code)
+            else:
+                department.append(-1)
+            rating.append(_float(record.get("rating", record.get("avgRating"))))
+            difficulty.append(_float(record.get("difficulty", record.get("avgDifficulty"))))
+            would_take_again.append(_float(record.get("wouldTakeAgainPercent")))
+            num_ratings.append(record.get("numRatings") or 0)
+
+        if numpy is not None:
+            department, rating, difficulty, num_ratings, would_take_again = (
+                numpy.frombuffer(column, dtype=dtype) for column, dtype in
+                ((department, numpy.int64), (rating, numpy.float64), (difficulty, numpy.float64),
+                 (num_ratings, numpy.int64), (would_take_again, numpy.float64)))
+        return cls(department, departments, rating, difficulty, num_ratings, would_take_again)
+
+    def __len__(self):
+        return len(self.department)
+
+
+def _float(value):
+    return math.nan if value is None else float(value)
+
+
+def department_stats(columns: ProfessorColumns, extended: bool = False, percentiles=DEFAULT_PERCENTILES):
+    """
+    Computes the statistics of every department with at least one rated professor.
+
+    Like analyze_departments_for_article.py, only professors with ratings count towards the averages,
+    ratings and difficulties of 0 are left out, and would take again percentages are averaged as
+    RateMyProfessor reports them.
+
+    :param columns: The professors.
+    :param extended: If true, also compute weighted_rating, the average rating weighted by number of ratings,
+                     and rating_percentiles.
+    :param percentiles: The percentiles of the ratings to compute when extended is true, from 0 to 100.
+    :return: A dict from department name to its statistics. top_prof and most_reviewed are the positions
+             of those professors in the columns.
+    """
+    aggregate = _aggregate_numpy if numpy is not None else _aggregate
+    groups = aggregate(columns, percentiles if extended else ())
+
+    stats = {}
+    for code, name in enumerate(columns.departments):
+        group = groups[code]
+        if group is None:
+            continue
+        stats[name] = {key: group[key] for key in ("total_professors", "rated_professors", "avg_rating",
+                                                   "avg_difficulty", "total_reviews", "avg_reviews_per_prof",
+                                                   "avg_would_take_again", "rating_std_dev", "top_prof",
+                                                   "most_reviewed")}
+        if extended:
+            stats[name]["weighted_rating"] = group["weighted_rating"]
+            stats[name]["rating_percentiles"] = {str(q): value for q, value in zip(percentiles, group["percentiles"])}
+    return stats
+
+
+def department_statistics(professors, extended: bool = False, percentiles=DEFAULT_PERCENTILES,
+                          analysis_date: datetime.datetime = None):
+    """
+    Computes the department statistics document that analyze_departments_for_article.py saves as
+    department_statistics.json.
+
+    :param professors: The professor records. If they can be iterated twice, like a list or a Snapshot, only the
+                       records of each department's top and most reviewed professors are kept in memory.
+    :param extended: If true, also compute each department's weighted_rating and rating_percentiles.
+    :param percentiles: The percentiles of the ratings to compute when extended is true.
+    :param analysis_date: The date to report. Defaults to now.
+    :return: A dict with analysis_date, total_professors, total_departments and department_stats.
+    """
+    kept = None
+    if iter(professors) is professors:
+        # A one-shot iterator cannot be read again, so keep its records while reading them.
+        kept = professors = list(professors)
+
+    columns = ProfessorColumns.from_records(professors)
+    stats = department_stats(columns, extended, percentiles)
+
+    wanted = {row for department in stats.values() for row in (department["top_prof"], department["most_reviewed"])}
+    if kept is not None:
+        records = {row: kept[row] for row in wanted}
+    else:
+        records = {row: record for row, record in enumerate(professors) if row in wanted}
+    for department in stats.values():
+        department["top_prof"] = records[department["top_prof"]]
+        department["most_reviewed"] = records[department["most_reviewed"]]
+
+    return {
+        "analysis_date": (analysis_date or datetime.datetime.now()).isoformat(),
+        "total_professors": len(columns),
+        "total_departments": len(columns.departments),
+        "department_stats": stats,
+    }
+
+
+def _aggregate_numpy(columns: ProfessorColumns, percentiles):
+    """Computes every department's statistics at once with grouped NumPy operations."""
+    np = numpy
+    k = len(columns.departments)
+    codes = np.asarray(columns.department)
+    total = np.bincount(codes[codes >= 0], minlength=k)
+
+    rated = (codes >= 0) & (np.asarray(columns.num_ratings) > 0)
+    rows = np.flatnonzero(rated)
+    c = codes[rated]
+    rating = np.asarray(columns.rating)[rated]
+    difficulty = np.asarray(columns.difficulty)[rated]
+    num_ratings = np.asarray(columns.num_ratings)[rated]
+    would_take_again = np.asarray(columns.would_take_again)[rated]
+    rated_count = np.bincount(c, minlength=k)
+
+    def counts_and_sums(values, mask):
+        return np.bincount(c[mask], minlength=k), np.bincount(c[mask], weights=values[mask], minlength=k)
+
+    def mean(values, mask):
+        counts, sums = counts_and_sums(values, mask)
+        return np.divide(sums, counts, out=np.zeros(k), where=counts > 0)
+
+    # 0 and NaN count as missing, like falsy values did in the original analysis.
+    has_rating = (rating != 0) & ~np.isnan(rating)
+    rating_count, _ = counts_and_sums(rating, has_rating)
+    avg_rating = mean(rating, has_rating)
+    avg_difficulty = mean(difficulty, (difficulty != 0) & ~np.isnan(difficulty))
+    avg_would_take_again = mean(would_take_again, (would_take_again != 0) & ~np.isnan(would_take_again))
+    total_reviews = np.bincount(c, weights=num_ratings, minlength=k)
+    avg_reviews = np.divide(total_reviews, rated_count, out=np.zeros(k), where=rated_count > 0)
+
+    # Two passes, like statistics.stdev, rather than the less accurate sum of squares.
+    _, squares = counts_and_sums((rating - avg_rating[c]) ** 2, has_rating)
+    std_dev = np.sqrt(np.divide(squares, rating_count - 1, out=np.zeros(k), where=rating_count > 1))
+
+    _, weighted_sums = counts_and_sums(rating * num_ratings, has_rating)
+    _, weights = counts_and_sums(num_ratings.astype(np.float64), has_rating)
+    weighted_rating = np.divide(weighted_sums, weights, out=np.zeros(k), where=weights > 0)
+
+    def first_max(scores):
+        # The professor with the highest score of each department, the first one on ties, like max() does.
+        order = np.lexsort((rows, -scores, c))
+        starts = np.r_[True, c[order][1:] != c[order][:-1]]
+        best = np.full(k, -1)
+        best[c[order][starts]] = rows[order][starts]
+        return best
+
+    top_prof = first_max(np.nan_to_num(rating) * num_ratings)
+    most_reviewed = first_max(num_ratings)
+
+    values = []
+    if percentiles:
+        order = np.lexsort((rating[has_rating], c[has_rating]))
+        ordered = rating[has_rating][order]
+        starts = np.cumsum(rating_count) - rating_count
+        present = rating_count > 0
+        for q in percentiles:
+            position = q / 100 * (rating_count[present] - 1)
+            low, high = np.floor(position).astype(np.int64), np.ceil(position).astype(np.int64)
+            low_values, high_values = ordered[starts[present] + low], ordered[starts[present] + high]
+            value = np.zeros(k)
+            value[present] = low_values + (high_values - low_values) * (position - low)
+            values.append(value)
+
+    groups = [None] * k
+    for code in np.flatnonzero(rated_count):
+        groups[code] = {
+            "total_professors": int(total[code]),
+            "rated_professors": int(rated_count[code]),
+            "avg_rating": float(avg_rating[code]),
+            "avg_difficulty": float(avg_difficulty[code]),
+            "total_reviews": int(total_reviews[code]),
+            "avg_reviews_per_prof": float(avg_reviews[code]),
+            "avg_would_take_again": float(avg_would_take_again[code]),
+            "rating_std_dev": float(std_dev[code]),
+            "top_prof": int(top_prof[code]),
+            "most_reviewed": int(most_reviewed[code]),
+            "weighted_rating": float(weighted_rating[code]),
+            "percentiles": [float(value[code]) for value in values],
+        }
+    return groups
+
+
+def _aggregate(columns: ProfessorColumns, percentiles):
+    """Computes every department's statistics in one pass over the columns, without NumPy."""
+    k = len(columns.departments)
+    groups = [None] * k
+    total = [0] * k
+    for row, code in enumerate(columns.department):
+        if code < 0:
+            continue
+        total[code] += 1
+        num_ratings = columns.num_ratings[row]
+        if num_ratings <= 0:
+            continue
+
+        group = groups[code]
+        if group is None:
+            group = groups[code] = {"rated_professors": 0, "ratings": [], "difficulties": [], "would_take_again": [],
+                                    "total_reviews": 0, "weights": 0, "weighted_sum": 0.0,
+                                    "top_prof": row, "top_score": -math.inf, "most_reviewed": row}
+        rating = columns.rating[row]
+        difficulty = columns.difficulty[row]
+        would_take_again = columns.would_take_again[row]
+        group["rated_professors"] += 1
+        group["total_reviews"] += num_ratings
+        if rating == rating and rating != 0:
+            group["ratings"].append(rating)
+            group["weights"] += num_ratings
+            group["weighted_sum"] += rating * num_ratings
+        if difficulty == difficulty and difficulty != 0:
+            group["difficulties"].append(difficulty)
+        if would_take_again == would_take_again and would_take_again != 0:
+            group["would_take_again"].append(would_take_again)
+
+        score = (rating if rating == rating else 0) * num_ratings
+        if score > group["top_score"]:
+            group["top_prof"], group["top_score"] = row, score
+        if num_ratings > columns.num_ratings[group["most_reviewed"]]:
+            group["most_reviewed"] = row
+
+    for code, group in enumerate(groups):
+        if group is None:
+            continue
+        ratings = group["ratings"]
+        avg_rating = _mean(ratings)
+        std_dev = 0.0
+        if len(ratings) > 1:
+            std_dev = math.sqrt(sum((rating - avg_rating) ** 2 for rating in ratings) / (len(ratings) - 1))
+        ordered = sorted(ratings)
+        groups[code] = {
+            "total_professors": total[code],
+            "rated_professors": group["rated_professors"],
+            "avg_rating": avg_rating,
+            "avg_difficulty": _mean(group["difficulties"]),
+            "total_reviews": group["total_reviews"],
+            "avg_reviews_per_prof": group["total_reviews"] / group["rated_professors"],
+            "avg_would_take_again": _mean(group["would_take_again"]),
+            "rating_std_dev": std_dev,
+            "top_prof": group["top_prof"],
+            "most_reviewed": group["most_reviewed"],
+            "weighted_rating": group["weighted_sum"] / group["weights"] if group["weights"] else 0.0,
+            "percentiles": [_percentile(ordered, q) for q in percentiles],
+        }
+    return groups
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def _percentile(ordered: list, q: float):
+    """Interpolates a percentile of sorted values linearly, like numpy.percentile does by default."""
+    if not ordered:
+        return 0.0
+    position = q / 100 * (len(ordered) - 1)
+    low, high = math.floor(position), math.ceil(position)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
@@ -0,0 +1,283 @@
+"""
+Response caches.
+
+SQLiteCache persists responses for the transport under a key built from the normalized request, with a
+time to live that depends on what kind of data the response holds. Schools rarely change, while ratings
+change often. The in-process memo sits above it and keeps recent lookup results for a few minutes, so a warm
+process answers repeated lookups without any I/O and still sees changes once its entries expire.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# Time to live, in seconds, of each kind of response.
+DEFAULT_TTLS = {
+    "school": 7 * 24 * 60 * 60,
+    "search": 24 * 60 * 60,
+    "professor": 24 * 60 * 60,
+    "ratings": 60 * 60,
+}
+
+
+def cache_key(method: str, url: str, params: dict = None, body: dict = None):
+    """
+    Builds the cache key of a request.
+
+    Whitespace in GraphQL queries is collapsed and variables and parameters are sorted,
+    so requests that only differ in formatting share one key.
+
+    :param method: The HTTP method.
+    :param url: The absolute url.
+    :param params: The query string parameters, if any.
+    :param body: The JSON body, if any.
+    :return: The key as a string.
+    """
+    if body is not None and "query" in body:
+        body = dict(body, query=re.sub(r"\s+", " ", body["query"]).strip())
+    return json.dumps([method, url, params or {}, body], sort_keys=True, separators=(',', ':'))
+
+
+class CachedResponse:
+    """A response read back from the cache. It has the parts of a requests response the package uses."""
+
+    def __init__(self, status_code: int, text: str, headers: dict = None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class CacheEntry:
+    """A response stored in the cache, with the times it stays fresh and stale until."""
+
+    def __init__(self, response: CachedResponse, fresh_until: float, stale_until: float):
+        self.response = response
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+    @property
+    def fresh(self):
+        return time.time() < self.fresh_until
+
+    @property
+    def usable(self):
+        return time.time() < self.stale_until
+
+
+class SQLiteCache:
+    """Stores responses in a SQLite database, evicting the least recently used ones beyond a size limit."""
+
+    def __init__(self, path: str, max_entries: int = 100000, ttls: dict = None, stale_ttl: float = 24 * 60 * 60):
+        """
+        Initializes a cache, creating the database file if needed.
+
+        :param path: The database file, or ":memory:" for a cache that only lasts as long as the process.
+        :param max_entries: The maximum number of responses kept. The least recently used ones are evicted first.
+        :param ttls: Time to live in seconds for each kind of response, overriding DEFAULT_TTLS.
+        :param stale_ttl: How long after expiring a response may still be served while it is refreshed
+                          in the background, in seconds. 0 turns stale-while-revalidate off.
+        """
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, kind TEXT, status INTEGER, text TEXT, "
+            "headers TEXT, fresh_until REAL, stale_until REAL, accessed REAL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._connection.commit()
+
+    def ttl(self, kind: str):
+        """
+        Gets the time to live of a kind of response.
+
+        :param kind: The kind of response, such as "school" or "ratings".
+        :return: The time to live in seconds.
+        """
+        return self.ttls.get(kind, 0)
+
+    def get(self, key: str):
+        """
+        Looks up a response.
+
+        :param key: The request's cache key.
+        :return: The CacheEntry, or None if there is no usable response for the key.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT status, text, headers, fresh_until, stale_until FROM responses WHERE key = ?",
+                (key,)).fetchone()
+            if row is None:
+                return None
+            if time.time() >= row[4]:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._connection.commit()
+                return None
+            self._connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._connection.commit()
+
+        return CacheEntry(CachedResponse(row[0], row[1], json.loads(row[2])), row[3], row[4])
+
+    def set(self, key: str, kind: str, response):
+        """
+        Stores a response.
+
+        :param key: The request's cache key.
+        :param kind: The kind of response, which decides its time to live.
+        :param response: A requests response or a CachedResponse.
+        """
+        ttl = self.ttl(kind)
+        if ttl <= 0:
+            return
+
+        now = time.time()
+        headers = {name: response.headers[name] for name in ("ETag", "Last-Modified") if name in response.headers}
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, response.status_code, response.text, json.dumps(headers), now + ttl,
+                 now + ttl + self.stale_ttl, now))
+            excess = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (excess,))
+            self._connection.commit()
+
+    def touch(self, key: str, kind: str):
+        """
+        Marks a stored response as fresh again, after the site confirmed it has not changed.
+
+        :param key: The request's cache key.
+        :param kind: The kind of response, which decides its time to live.
+        """
+        now = time.time()
+        ttl = self.ttl(kind)
+        with self._lock:
+            self._connection.execute(
+                "UPDATE responses SET fresh_until = ?, stale_until = ?, accessed = ? WHERE key = ?",
+                (now + ttl, now + ttl + self.stale_ttl, now, key))
+            self._connection.commit()
+
+    def clear(self):
+        """Removes every stored response."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def normalize_query(query: str):
+    """
+    Normalizes a search string, so searches that only differ in case or spacing share one memo entry.
+
+    :param query: The search string.
+    :return: The normalized search string.
+    """
+    return " ".join(query.casefold().split())
+
+
+class LRUMemo:
+    """
+    Keeps recent lookup results in memory, dropping the least recently used ones beyond a size limit,
+    and any result once it is older than the time to live.
+
+    Lookups key their results with the transport they were sent through, so a result fetched from one
+    server, such as a local fake, is never handed to a lookup on another.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 10 * 60):
+        """
+        Initializes an empty memo.
+
+        :param maxsize: The maximum number of results kept.
+        :param ttl: How long a result is kept, in seconds. It should not be longer than the response cache keeps
+                    the responses it was built from, or the memo would hide their updates.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Looks up a result and counts the hit or miss.
+
+        :param key: The lookup's key.
+        :return: The result, or None if it is not in the memo or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() >= entry[1]:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        """
+        Stores a result.
+
+        :param key: The lookup's key.
+        :param value: The result. None is not stored.
+        """
+        if value is None or self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def cache_info(self):
+        """
+        Gets the memo's statistics, in the same shape as functools.lru_cache.
+
+        :return: A CacheInfo of hits, misses, maxsize and currsize.
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def cache_clear(self):
+        """Removes every result and resets the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# The memo shared by the whole process.
+memo = LRUMemo()
@@ -0,0 +1,410 @@
+"""
+Bulk crawler for whole schools.
+
+Every professor of every school is downloaded with all of their ratings, by a bounded pool of worker threads.
+Progress is checkpointed after each page of the school search and each page of a professor's ratings,
+so a crawl that is stopped or crashes picks up where it left off when it is run again.
+
+Finished professors are appended to a JSON Lines file as soon as they are done, so memory use does not grow
+with the size of the school. The output directory holds one directory per school::
+
+    <output>/<school id>/index.json                 the school's professors, from the search
+    <output>/<school id>/professors.jsonl           one line per finished professor, with every rating
+    <output>/<school id>/ratings.jsonl              with split_ratings, one line per rating instead
+    <output>/<school id>/partial/<professor id>.*   a professor whose ratings are still being fetched
+
+Run it from the command line with ``python -m ratemyprofessor.crawl 1448 186 --output crawl``.
+
+With ``--sync``, an existing crawl is brought up to date instead: the school search is run again, and only
+professors whose number of ratings changed are fetched, newest ratings first, until a rating that is already
+in the crawl. Each finished professor keeps the numRatings and newest rating id and date it was last seen with.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from . import _teacher_search_request
+from .fulltext import CommentIndex
+from .jsonl import JSONLWriter, read_at, read_jsonl
+from .professor import Professor, _teacher_id
+from .queries import RATINGS_QUERY, graphql_request, professor_headers
+from .school import get_school
+from .store import Store
+from .transport import Transport, get_transport
+
+logger = logging.getLogger(__name__)
+
+
+def write_json(path: str, data):
+    """
+    Writes JSON to a file atomically, so a crash leaves either the old file or the new one and never half of one.
+
+    :param path: The file to write.
+    :param data: The data to write.
+    """
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def read_json(path: str):
+    """
+    Reads a JSON file written by write_json.
+
+    :param path: The file to read.
+    :return: The data, or None if the file does not exist.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class Crawler:
+    """Downloads schools' professors and ratings into a directory, resuming from its checkpoints."""
+
+    def __init__(self, output_dir: str, concurrency: int = 8, page_size: int = 100, transport: Transport = None,
+                 sync: bool = False, split_ratings: bool = False, fsync_every: int = 100,
+                 comment_index: CommentIndex = None, store: Store = None):
+        """
+        Initializes a crawler.
+
+        :param output_dir: The directory the crawl is written to. Run again with the same directory to resume.
+        :param concurrency: The number of professors downloaded at once.
+        :param page_size: The number of professors or ratings requested at once.
+        :param transport: The transport to send requests through. Defaults to the shared transport.
+        :param sync: If true, update professors that were already crawled when their number of ratings changed.
+        :param split_ratings: If true, write each rating as its own line of ratings.jsonl, with a professorId,
+                              instead of inside its professor's line.
+        :param fsync_every: Force the output to disk after this many lines.
+        :param comment_index: If given, the ratings of every finished professor are added to this full-text index.
+        :param store: If given, every finished professor is added to this store, with its ratings.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1.")
+
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.transport = transport
+        self.sync = sync
+        self.split_ratings = split_ratings
+        self.fsync_every = fsync_every
+        self.comment_index = comment_index
+        self.store = store
+
+    def _school_dir(self, school_id: int):
+        return os.path.join(self.output_dir, str(school_id))
+
+    def professors_path(self, school_id: int):
+        """
+        Gets the JSON Lines file a school's finished professors are appended to.
+
+        :param school_id: The school's id.
+        :return: The file's path.
+        """
+        return os.path.join(self._school_dir(school_id), "professors.jsonl")
+
+    def ratings_path(self, school_id: int):
+        """
+        Gets the JSON Lines file a school's ratings are appended to when they are split from their professors.
+
+        :param school_id: The school's id.
+        :return: The file's path.
+        """
+        return os.path.join(self._school_dir(school_id), "ratings.jsonl")
+
+    def professors(self, school_id: int):
+        """
+        Reads a school's finished professors lazily, one line at a time.
+
+        A professor that was updated by a sync is only yielded in its latest version.
+
+        :param school_id: The school's id.
+        :return: A generator of the professor records.
+        """
+        latest = {offset for offset, _ in self._finished(school_id).values()}
+        for offset, record in read_jsonl(self.professors_path(school_id), offsets=True):
+            if offset in latest:
+                yield record
+
+    def ratings(self, school_id: int):
+        """
+        Reads a school's ratings lazily from ratings.jsonl, when they are split from their professors.
+
+        :param school_id: The school's id.
+        :return: A generator of the rating records, each with the professorId it belongs to.
+        """
+        # A crash between writing a professor's ratings and the professor itself makes them written again.
+        seen = set()
+        for rating in read_jsonl(self.ratings_path(school_id)):
+            if rating["id"] not in seen:
+                seen.add(rating["id"])
+                yield rating
+
+    def _finished(self, school_id: int):
+        """Maps the id of every finished professor to the offset of its latest line and its lastSeen."""
+        finished = {}
+        for offset, record in read_jsonl(self.professors_path(school_id), offsets=True):
+            finished[record["legacyId"]] = (offset, record.get("lastSeen"))
+        return finished
+
+    def crawl(self, school_ids):
+        """
+        Crawls every professor of every school, skipping the work a previous run already finished.
+
+        A professor that fails is logged and left with its checkpoint, and the crawl goes on with the others.
+
+        :param school_ids: The schools' ids.
+        :return: The ids of the professors that failed, as (school id, professor id) tuples.
+        """
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for school_id in school_ids:
+                school_id = int(school_id)
+                professors = self.crawl_index(school_id)
+                finished = self._finished(school_id)
+                pending = [node for node in professors if self._needs_crawl(node, finished.get(node["legacyId"]))]
+                logger.info("School %s: %s professors, %s left to crawl", school_id, len(professors), len(pending))
+
+                with JSONLWriter(self.professors_path(school_id), fsync_every=self.fsync_every) as professors_out, \
+                        self._ratings_writer(school_id) as ratings_out:
+                    futures = {node["legacyId"]: executor.submit(self._crawl_professor, school_id, node,
+                                                                 finished.get(node["legacyId"]), professors_out,
+                                                                 ratings_out)
+                               for node in pending}
+                    for professor_id, future in futures.items():
+                        try:
+                            future.result()
+                        except Exception:
+                            logger.exception("Professor %s of school %s failed", professor_id, school_id)
+                            failed.append((school_id, professor_id))
+
+                if any(node["legacyId"] in finished for node in pending):
+                    self.compact(school_id)
+        return failed
+
+    def _ratings_writer(self, school_id: int):
+        if self.split_ratings:
+            return JSONLWriter(self.ratings_path(school_id), fsync_every=self.fsync_every)
+        return contextlib.nullcontext()
+
+    def _needs_crawl(self, node: dict, finished):
+        """Tells whether a professor is missing from the crawl, or in sync mode, has a new number of ratings."""
+        if finished is None:
+            return True
+        if not self.sync:
+            return False
+        last_seen = finished[1]
+        return last_seen is None or last_seen["numRatings"] != node["numRatings"]
+
+    def compact(self, school_id: int):
+        """
+        Rewrites a school's professors.jsonl with only the latest line of each professor.
+
+        :param school_id: The school's id.
+        """
+        path = self.professors_path(school_id)
+        with JSONLWriter(path + ".tmp", fsync_every=self.fsync_every) as out:
+            for record in self.professors(school_id):
+                out.write(record)
+        os.replace(path + ".tmp", path)
+
+    def crawl_index(self, school_id: int):
+        """
+        Lists every professor of a school, resuming the search from its last checkpointed page.
+
+        In sync mode, a search that already finished is run again to get the current numbers of ratings.
+
+        :param school_id: The school's id.
+        :return: The search nodes of the school's professors.
+        """
+        os.makedirs(os.path.join(self._school_dir(school_id), "partial"), exist_ok=True)
+        index_path = os.path.join(self._school_dir(school_id), "index.json")
+        index = read_json(index_path)
+        if index is None or (self.sync and index["complete"]):
+            index = {"school_id": school_id, "cursor": None, "complete": False, "professors": []}
+
+        transport = self.transport or get_transport()
+        school = get_school(school_id, transport=self.transport, lazy=True)
+        while not index["complete"]:
+            query, request_headers = _teacher_search_request(school, "", self.page_size, index["cursor"])
+            data = transport.post("/graphql", json=query, headers=request_headers, kind="search")
+            teachers = json.loads(data.text)["data"]["search"]["teachers"]
+            # A school without professors gets other schools' professors as a fallback.
+            edges = [] if teachers.get("didFallback") else teachers["edges"]
+            page_info = teachers.get("pageInfo")
+
+            index["professors"].extend(edge["node"] for edge in edges)
+            if not edges or page_info is None or not page_info["hasNextPage"]:
+                index["complete"] = True
+            else:
+                index["cursor"] = page_info["endCursor"]
+            write_json(index_path, index)
+
+        return index["professors"]
+
+    def _crawl_professor(self, school_id: int, node: dict, finished, professors_out: JSONLWriter,
+                         ratings_out: JSONLWriter = None):
+        """
+        Downloads one professor and every rating, checkpointing after each page of ratings.
+
+        The ratings fetched so far are appended to the professor's partial JSON Lines file, and its state file
+        records how many of them were checkpointed. If the professor was crawled before, only the ratings newer
+        than the newest one already in the crawl are downloaded, and they are added in front of the others.
+
+        The state also records the lastSeen of the line it started from. A state whose lastSeen is not the one
+        of the professor's latest line was left by a crash after that line was written, so it is started over
+        instead of merging the same ratings in a second time.
+        """
+        professor_id = node["legacyId"]
+        state_path = os.path.join(self._school_dir(school_id), "partial", "%s.json" % professor_id)
+        partial_path = os.path.join(self._school_dir(school_id), "partial", "%s.jsonl" % professor_id)
+        transport = self.transport or get_transport()
+
+        last_seen = finished[1] if finished is not None else None
+        state = read_json(state_path)
+        if state is not None and state.get("lastSeen", state["since"]) != last_seen:
+            state = None
+        if state is None:
+            since = last_seen
+            if since is not None and node["numRatings"] < since["numRatings"]:
+                # Ratings were removed, and there is no telling which, so fetch them all again.
+                since = None
+
+            query, request_headers = Professor._professor_request(professor_id)
+            data = transport.post("/graphql", json=query, headers=request_headers, kind="professor")
+            state = {"professor": dict(node, **Professor._professor_data(data.text)), "cursor": None,
+                     "complete": False, "since": since, "lastSeen": last_seen, "written": 0}
+            write_json(state_path, state)
+
+        # Drop the ratings of a page that was written but never checkpointed.
+        _truncate_lines(partial_path, state["written"])
+
+        since = state["since"]
+        page_size = self.page_size
+        if since is not None:
+            # Just enough to reach the first known rating, if nothing was removed in between.
+            page_size = max(1, min(page_size, state["professor"]["numRatings"] - since["numRatings"] + 1))
+
+        with JSONLWriter(partial_path, fsync_every=self.fsync_every) as partial:
+            while not state["complete"] and state["professor"]["numRatings"] > 0:
+                query = graphql_request(RATINGS_QUERY, id=_teacher_id(professor_id), count=page_size,
+                                        cursor=state["cursor"])
+                data = transport.post("/graphql", json=query, headers=professor_headers(professor_id),
+                                      kind="ratings")
+                connection = json.loads(data.text)["data"]["node"]["ratings"]
+                edges = connection["edges"] or []
+                page_info = connection.get("pageInfo")
+
+                for edge in edges:
+                    rating = edge["node"]
+                    if since is not None and (rating["id"] == since["newestRatingId"]
+                                              or rating["date"] < since["newestRatingDate"]):
+                        state["complete"] = True
+                        break
+                    partial.write(rating)
+                    state["written"] += 1
+
+                if not edges or page_info is None or not page_info["hasNextPage"]:
+                    state["complete"] = True
+                elif not state["complete"]:
+                    state["cursor"] = page_info["endCursor"]
+                partial.sync()
+                write_json(state_path, state)
+
+        newest = next(read_jsonl(partial_path), None)
+        if newest is not None:
+            newest_id, newest_date = newest["id"], newest["date"]
+        elif since is not None:
+            newest_id, newest_date = since["newestRatingId"], since["newestRatingDate"]
+        else:
+            newest_id, newest_date = None, ""
+        professor = dict(state["professor"], lastSeen={"numRatings": state["professor"]["numRatings"],
+                                                       "newestRatingId": newest_id,
+                                                       "newestRatingDate": newest_date})
+
+        if self.comment_index is not None:
+            # Ratings from before a sync are already in the index.
+            self.comment_index.add(professor, read_jsonl(partial_path), school_id)
+        if self.store is not None:
+            # Likewise for the store, which keeps the ratings it already has.
+            self.store.add(professor, read_jsonl(partial_path), school_id)
+
+        if ratings_out is not None:
+            for rating in read_jsonl(partial_path):
+                ratings_out.write(dict(rating, professorId=professor_id))
+            ratings_out.sync()
+        else:
+            professor["ratings"] = list(read_jsonl(partial_path))
+            if since is not None:
+                new = {rating["id"] for rating in professor["ratings"]}
+                professor["ratings"] += [rating for rating in
+                                         read_at(self.professors_path(school_id), finished[0])["ratings"]
+                                         if rating["id"] not in new]
+
+        professors_out.write(professor)
+        professors_out.sync()
+        os.remove(state_path)
+        os.remove(partial_path)
+
+
+def _truncate_lines(path: str, lines: int):
+    """Cuts a JSON Lines file down to its first lines, if it has more."""
+    for count, (offset, _) in enumerate(read_jsonl(path, offsets=True)):
+        if count == lines:
+            with open(path, "rb+") as f:
+                f.truncate(offset)
+            return
+
+
+def main(argv=None):
+    """
+    Runs the crawler from the command line.
+
+    :param argv: The command line arguments, without the program name. Defaults to sys.argv.
+    :return: The exit status: 0 if every professor was crawled, 1 if some failed.
+    """
+    parser = argparse.ArgumentParser(prog="ratemyprofessor-crawl",
+                                     description="Download every professor and rating of one or more schools.")
+    parser.add_argument("school_ids", nargs="+", type=int, help="the ids of the schools to crawl")
+    parser.add_argument("-o", "--output", default="crawl", help="the directory to write to and resume from")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="the number of professors crawled at once")
+    parser.add_argument("--page-size", type=int, default=100, help="the number of items requested at once")
+    parser.add_argument("--sync", action="store_true",
+                        help="update an existing crawl, fetching only the ratings added since")
+    parser.add_argument("--split-ratings", action="store_true",
+                        help="write every rating as its own line of ratings.jsonl")
+    parser.add_argument("--index", metavar="PATH", help="add the rating comments to a full-text index in this file")
+    parser.add_argument("--store", metavar="PATH", help="add the professors and ratings to a store in this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    comment_index = CommentIndex(args.index) if args.index else None
+    store = Store(args.store) if args.store else None
+    crawler = Crawler(args.output, concurrency=args.concurrency, page_size=args.page_size, sync=args.sync,
+                      split_ratings=args.split_ratings, comment_index=comment_index, store=store)
+    try:
+        failed = crawler.crawl(args.school_ids)
+    finally:
+        if comment_index is not None:
+            comment_index.close()
+        if store is not None:
+            store.close()
+    if failed:
+        logger.error("%s professors failed. Run the same command again to retry them.", len(failed))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,552 @@
+"""
+Columnar export of professors and ratings.
+
+Professor records, from a crawl or a snapshot file, and their ratings are turned into typed rows and written
+column by column in row groups, so analytics can read back only the columns and rows they need instead of
+loading whole JSON files. Repeated strings such as departments, schools, courses and grades are
+dictionary-encoded.
+
+Files ending in .parquet are written as Parquet, and files ending in .arrow, .feather or .ipc as Arrow IPC.
+Both need pyarrow, which can be installed with ``pip install RateMyProfessorAPI[arrow]``. Any other file is
+written in a small column format that only needs the standard library: typed arrays compressed with zlib, one
+chunk per column and row group, and a JSON footer with the minimum and maximum of every chunk.
+
+When reading back, rows can be filtered by school, department and date. Row groups whose statistics rule them
+out are skipped without being decompressed, and pyarrow does the same with Parquet files.
+"""
+
+import datetime
+import json
+import math
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from .professor import _EPOCH, _flag, _timestamp, _unflag
+from .school import parse_school_id
+
+PROFESSOR_COLUMNS = (
+    ("id", "int"),
+    ("name", "str"),
+    ("department", "dict"),
+    ("school_id", "int"),
+    ("school_name", "dict"),
+    ("rating", "float"),
+    ("difficulty", "float"),
+    ("num_ratings", "int"),
+    ("would_take_again", "float"),
+)
+
+RATING_COLUMNS = (
+    ("id", "str"),
+    ("professor_id", "int"),
+    ("school_id", "int"),
+    ("department", "dict"),
+    ("date", "timestamp"),
+    ("class_name", "dict"),
+    ("grade", "dict"),
+    ("rating", "float"),
+    ("difficulty", "float"),
+    ("take_again", "flag"),
+    ("online_class", "flag"),
+    ("credit", "flag"),
+    ("attendance_mandatory", "flag"),
+    ("thumbs_up", "int"),
+    ("thumbs_down", "int"),
+    ("comment", "str"),
+)
+
+_MAGIC = b"RMPCOL1\n"
+_ARROW_EXTENSIONS = {".parquet": "parquet", ".arrow": "ipc", ".feather": "ipc", ".ipc": "ipc"}
+
+
+def professor_rows(records, school_id: int = None):
+    """
+    Turns professor records into rows of PROFESSOR_COLUMNS.
+
+    :param records: Professor records, either crawl records, with legacyId and avgRating, or snapshot records like
+                    those of professors_school_1448_complete.json, with id, name and rating.
+    :param school_id: The id of the school of records that do not have it, like snapshot records.
+    :return: A generator of the rows, as dicts.
+    """
+    for record in records:
+        school = record.get("school")
+        if not isinstance(school, dict):
+            school = {"name": school, "id": school_id}
+        name = record.get("name")
+        if name is None:
+            name = ("%s %s" % (record.get("firstName", ""), record.get("lastName", ""))).strip()
+
+        yield {
+            "id": record["legacyId"] if "legacyId" in record else record["id"],
+            "name": name,
+            "department": record.get("department"),
+            "school_id": parse_school_id(school.get("id", school_id)),
+            "school_name": school.get("name"),
+            "rating": _unknown_zero(record.get("avgRating", record.get("rating"))),
+            "difficulty": _unknown_zero(record.get("avgDifficulty", record.get("difficulty"))),
+            "num_ratings": record.get("numRatings", 0),
+            "would_take_again": _unknown_negative(record.get("wouldTakeAgainPercent")),
+        }
+
+
+def rating_rows(professors, ratings=None):
+    """
+    Turns ratings into rows of RATING_COLUMNS, with the school and department of their professor.
+
+    :param professors: Crawl records of the professors.
+    :param ratings: Ratings that each have a professorId, like the lines of a crawl's ratings.jsonl.
+                    Defaults to the ratings inside the professor records.
+    :return: A generator of the rows, as dicts.
+    """
+    if ratings is None:
+        for professor in professors:
+            for rating in professor.get("ratings", ()):
+                yield _rating_row(rating, professor)
+    else:
+        # Only the few fields the rows need are kept for each professor, so a whole school fits in memory.
+        owners = {professor["legacyId"]: {"legacyId": professor["legacyId"], "school": professor.get("school"),
+                                          "department": professor.get("department")}
+                  for professor in professors}
+        for rating in ratings:
+            yield _rating_row(rating, owners.get(rating["professorId"], {"legacyId": rating["professorId"]}))
+
+
+def _rating_row(rating: dict, professor: dict):
+    school = professor.get("school") or {}
+    return {
+        "id": rating["id"],
+        "professor_id": professor["legacyId"],
+        "school_id": parse_school_id(school.get("id")),
+        "department": professor.get("department"),
+        "date": datetime.datetime.fromisoformat(rating["date"][0:19]),
+        "class_name": rating.get("class"),
+        "grade": rating.get("grade"),
+        "rating": rating.get("helpfulRating"),
+        "difficulty": rating.get("difficultyRating"),
+        "take_again": None if rating.get("wouldTakeAgain") is None else rating["wouldTakeAgain"] == 1,
+        "online_class": None if rating.get("isForOnlineClass") is None else bool(rating["isForOnlineClass"]),
+        "credit": None if rating.get("isForCredit") is None else bool(rating["isForCredit"]),
+        "attendance_mandatory": {"mandatory": True, "non mandatory": False}.get(rating.get("attendanceMandatory")),
+        "thumbs_up": rating.get("thumbsUpTotal") or 0,
+        "thumbs_down": rating.get("thumbsDownTotal") or 0,
+        "comment": rating.get("comment"),
+    }
+
+
+def _unknown_zero(value):
+    # RateMyProfessor reports 0 for a rating or difficulty nobody gave yet.
+    return None if not value else value
+
+
+def _unknown_negative(value):
+    # RateMyProfessor reports -1 for a would take again percentage nobody answered.
+    return None if value is None or value < 0 else value
+
+
+def write_table(rows, path: str, columns, row_group_size: int = 10000, format: str = None):
+    """
+    Writes rows to a columnar file, one row group at a time.
+
+    :param rows: The rows, as dicts with a value for every column. An iterator is only read one row group at a time.
+    :param path: The file to write.
+    :param columns: PROFESSOR_COLUMNS, RATING_COLUMNS or another sequence of (name, type) pairs.
+    :param row_group_size: The number of rows in each row group.
+    :param format: "parquet", "ipc" or "columns". Defaults to the format that goes with the file's extension.
+    :return: The number of rows written.
+    """
+    if row_group_size < 1:
+        raise ValueError("row_group_size must be at least 1.")
+    format = format or _format(path)
+    if format == "columns":
+        writer = ColumnWriter(path, columns)
+    elif format in ("parquet", "ipc"):
+        writer = _ArrowWriter(path, columns, format)
+    else:
+        raise ValueError("Unknown format: %s" % format)
+
+    count = 0
+    with writer:
+        group = []
+        for row in rows:
+            group.append(row)
+            if len(group) == row_group_size:
+                writer.write_row_group(group)
+                count += len(group)
+                group = []
+        if group:
+            writer.write_row_group(group)
+            count += len(group)
+    return count
+
+
+def export_professors(records, path: str, school_id: int = None, row_group_size: int = 10000, format: str = None):
+    """
+    Writes professor records to a columnar file with PROFESSOR_COLUMNS.
+
+    :param records: Crawl or snapshot professor records, as taken by professor_rows.
+    :param path: The file to write.
+    :param school_id: The id of the school of records that do not have it.
+    :param row_group_size: The number of rows in each row group.
+    :param format: The file's format, as taken by write_table.
+    :return: The number of professors written.
+    """
+    return write_table(professor_rows(records, school_id), path, PROFESSOR_COLUMNS, row_group_size, format)
+
+
+def export_ratings(professors, path: str, ratings=None, row_group_size: int = 10000, format: str = None):
+    """
+    Writes ratings to a columnar file with RATING_COLUMNS.
+
+    :param professors: Crawl records of the professors.
+    :param path: The file to write.
+    :param ratings: Ratings with a professorId, as taken by rating_rows. Defaults to the ratings inside professors.
+    :param row_group_size: The number of rows in each row group.
+    :param format: The file's format, as taken by write_table.
+    :return: The number of ratings written.
+    """
+    return write_table(rating_rows(professors, ratings), path, RATING_COLUMNS, row_group_size, format)
+
+
+def read_table(path: str, columns=None, school_id: int = None, department: str = None,
+               since: datetime.datetime = None, until: datetime.datetime = None):
+    """
+    Reads the rows of a columnar file lazily, one row group at a time.
+
+    :param path: The file to read, in any of the formats write_table writes.
+    :param columns: The names of the columns to read. Defaults to all of them.
+    :param school_id: If given, only read the rows of this school.
+    :param department: If given, only read the rows of this department.
+    :param since: If given, only read the rows dated on or after this date. The file needs a date column.
+    :param until: If given, only read the rows dated before this date. The file needs a date column.
+    :return: A generator of the rows, as dicts.
+    """
+    predicates = _predicates(school_id, department, since, until)
+    if _is_column_file(path):
+        return ColumnReader(path).read(columns, predicates)
+    return _read_arrow(path, columns, predicates)
+
+
+def _predicates(school_id, department, since, until):
+    predicates = []
+    if school_id is not None:
+        predicates.append(("school_id", "==", int(school_id)))
+    if department is not None:
+        predicates.append(("department", "==", department))
+    if since is not None:
+        predicates.append(("date", ">=", since))
+    if until is not None:
+        predicates.append(("date", "<", until))
+    return predicates
+
+
+def _format(path: str):
+    return _ARROW_EXTENSIONS.get(os.path.splitext(path)[1].lower(), "columns")
+
+
+def _is_column_file(path: str):
+    with open(path, "rb") as f:
+        return f.read(len(_MAGIC)) == _MAGIC
+
+
+class ColumnWriter:
+    """Writes the standard library column format, one row group at a time."""
+
+    def __init__(self, path: str, columns):
+        """
+        Creates the file.
+
+        :param path: The file to write.
+        :param columns: The (name, type) pairs of the columns.
+        """
+        self.columns = [tuple(column) for column in columns]
+        self._row_groups = []
+        self._file = open(path, "wb")
+        self._file.write(_MAGIC)
+
+    def write_row_group(self, rows):
+        """
+        Writes one row group.
+
+        :param rows: The rows of the group, as dicts.
+        """
+        chunks = {}
+        for name, kind in self.columns:
+            values = [row.get(name) for row in rows]
+            data = zlib.compress(_encode(kind, values))
+            chunks[name] = {"offset": self._file.tell(), "length": len(data)}
+            chunks[name].update(_statistics(kind, values))
+            self._file.write(data)
+        self._row_groups.append({"rows": len(rows), "columns": chunks})
+
+    def close(self):
+        """Writes the footer and closes the file."""
+        if self._file.closed:
+            return
+        footer = json.dumps({"columns": self.columns, "byteorder": sys.byteorder, "row_groups": self._row_groups},
+                            ensure_ascii=False).encode("utf-8")
+        self._file.write(footer)
+        self._file.write(struct.pack("<Q", len(footer)))
+        self._file.write(_MAGIC)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ColumnReader:
+    """Reads the standard library column format."""
+
+    def __init__(self, path: str):
+        """
+        Reads the file's footer.
+
+        :param path: The file to read.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            f.seek(-8 - len(_MAGIC), os.SEEK_END)
+            length, = struct.unpack("<Q", f.read(8))
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError("%s is not a complete column file." % path)
+            f.seek(-8 - len(_MAGIC) - length, os.SEEK_END)
+            footer = json.loads(f.read(length))
+        self.columns = dict((name, kind) for name, kind in footer["columns"])
+        self.row_groups = footer["row_groups"]
+        self._swap = footer["byteorder"] != sys.byteorder
+
+    def __len__(self):
+        return sum(group["rows"] for group in self.row_groups)
+
+    def matching_row_groups(self, predicates):
+        """
+        Picks the row groups whose statistics do not rule out every row.
+
+        :param predicates: (column, operator, value) tuples, with "==", ">=" or "<" as the operator.
+        :return: The indexes of the row groups that may have matching rows.
+        """
+        for name, _, _ in predicates:
+            if name not in self.columns:
+                raise ValueError("%s has no %s column." % (self.path, name))
+        return [index for index, group in enumerate(self.row_groups)
+                if all(_may_match(group["columns"][name], self.columns[name], operator, value)
+                       for name, operator, value in predicates)]
+
+    def read(self, columns=None, predicates=()):
+        """
+        Reads rows lazily, one row group at a time, skipping the row groups the predicates rule out.
+
+        :param columns: The names of the columns to read. Defaults to all of them.
+        :param predicates: (column, operator, value) tuples the rows have to match.
+        :return: A generator of the rows, as dicts.
+        """
+        columns = list(self.columns) if columns is None else list(columns)
+        for name in columns:
+            if name not in self.columns:
+                raise ValueError("%s has no %s column." % (self.path, name))
+        groups = self.matching_row_groups(predicates)
+        return self._read(columns, predicates, groups)
+
+    def _read(self, columns, predicates, groups):
+        with open(self.path, "rb") as f:
+            for index in groups:
+                group = self.row_groups[index]
+                values = {}
+                keep = range(group["rows"])
+                for name, operator, value in predicates:
+                    values[name] = self._column(f, group, name)
+                    keep = [row for row in keep if _compare(values[name][row], operator, value)]
+                if not keep:
+                    continue
+                for name in columns:
+                    if name not in values:
+                        values[name] = self._column(f, group, name)
+                for row in keep:
+                    yield {name: values[name][row] for name in columns}
+
+    def _column(self, f, group: dict, name: str):
+        chunk = group["columns"][name]
+        f.seek(chunk["offset"])
+        return _decode(self.columns[name], zlib.decompress(f.read(chunk["length"])), group["rows"], self._swap)
+
+
+_TYPECODES = {"int": "q", "float": "d", "timestamp": "q", "flag": "b"}
+# Stands for an unknown value in an int column, like NaN does in a float column.
+_NULL_INT = -2 ** 63
+
+
+def _encode(kind: str, values: list):
+    """Encodes a chunk of a column. Dictionary and string columns lead with their dictionary or their ends."""
+    if kind == "int":
+        return array("q", (_NULL_INT if value is None else value for value in values)).tobytes()
+    if kind == "float":
+        return array("d", (math.nan if value is None else value for value in values)).tobytes()
+    if kind == "timestamp":
+        return array("q", (_timestamp(value) for value in values)).tobytes()
+    if kind == "flag":
+        return array("b", (_flag(value) for value in values)).tobytes()
+    if kind == "dict":
+        strings, codes = {}, array("i")
+        for value in values:
+            codes.append(-1 if value is None else strings.setdefault(value, len(strings)))
+        return json.dumps(list(strings), ensure_ascii=False).encode("utf-8") + b"\n" + codes.tobytes()
+    if kind == "str":
+        # Unknown strings are stored as empty ones, like the comments of a RatingBatch.
+        encoded = [(value or "").encode("utf-8") for value in values]
+        ends, end = array("q"), 0
+        for value in encoded:
+            end += len(value)
+            ends.append(end)
+        return ends.tobytes() + b"".join(encoded)
+    raise ValueError("Unknown column type: %s" % kind)
+
+
+def _decode(kind: str, data: bytes, rows: int, swap: bool):
+    if kind == "dict":
+        dictionary, data = data.split(b"\n", 1)
+        strings = json.loads(dictionary)
+        codes = _array("i", data, swap)
+        return [None if code == -1 else strings[code] for code in codes]
+    if kind == "str":
+        ends = _array("q", data[:rows * 8], swap)
+        text = data[rows * 8:]
+        starts = [0] + list(ends[:-1])
+        return [text[start:end].decode("utf-8") for start, end in zip(starts, ends)]
+
+    values = _array(_TYPECODES[kind], data, swap)
+    if kind == "int":
+        return [None if value == _NULL_INT else value for value in values]
+    if kind == "float":
+        return [None if value != value else value for value in values]
+    if kind == "timestamp":
+        return [_EPOCH + datetime.timedelta(seconds=value) for value in values]
+    if kind == "flag":
+        return [_unflag(value) for value in values]
+    raise ValueError("Unknown column type: %s" % kind)
+
+
+def _array(typecode: str, data: bytes, swap: bool):
+    values = array(typecode)
+    values.frombytes(data)
+    if swap:
+        values.byteswap()
+    return values
+
+
+def _statistics(kind: str, values: list):
+    """Gets the minimum and maximum of a chunk, in the form they are compared in, for skipping row groups."""
+    if kind == "flag":
+        return {}
+    if kind == "timestamp":
+        values = [_timestamp(value) for value in values]
+    present = [value for value in values if value is not None and value == value]
+    if not present:
+        return {"min": None, "max": None}
+    return {"min": min(present), "max": max(present)}
+
+
+def _may_match(chunk: dict, kind: str, operator: str, value):
+    if "min" not in chunk:
+        return True
+    if chunk["min"] is None:
+        return False
+    if kind == "timestamp":
+        value = _timestamp(value)
+    if operator == "==":
+        return chunk["min"] <= value <= chunk["max"]
+    if operator == ">=":
+        return chunk["max"] >= value
+    return chunk["min"] < value
+
+
+def _compare(row_value, operator: str, value):
+    if row_value is None:
+        return False
+    if operator == "==":
+        return row_value == value
+    if operator == ">=":
+        return row_value >= value
+    return row_value < value
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Parquet and Arrow files require pyarrow. "
+                          "Install it with: pip install RateMyProfessorAPI[arrow]") from e
+    return pyarrow
+
+
+def _arrow_schema(pa, columns):
+    types = {"int": pa.int64(), "float": pa.float64(), "timestamp": pa.timestamp("s"), "flag": pa.bool_(),
+             "dict": pa.dictionary(pa.int32(), pa.string()), "str": pa.string()}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+class _ArrowWriter:
+    """Writes row groups to a Parquet or Arrow IPC file with pyarrow."""
+
+    def __init__(self, path: str, columns, format: str):
+        pa = _pyarrow()
+        self._pa = pa
+        self._format = format
+        self.columns = [tuple(column) for column in columns]
+        self.schema = _arrow_schema(pa, self.columns)
+        if format == "parquet":
+            import pyarrow.parquet
+            self._writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        else:
+            import pyarrow.ipc
+            self._writer = pyarrow.ipc.new_file(path, self.schema)
+
+    def write_row_group(self, rows):
+        pa = self._pa
+        arrays = []
+        for (name, kind), field in zip(self.columns, self.schema):
+            values = [row.get(name) for row in rows]
+            if kind == "dict":
+                arrays.append(pa.array(values, pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, field.type))
+        table = pa.Table.from_arrays(arrays, schema=self.schema)
+        if self._format == "ipc":
+            for batch in table.to_batches():
+                self._writer.write_batch(batch)
+        else:
+            self._writer.write_table(table, row_group_size=len(rows))
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _read_arrow(path: str, columns, predicates):
+    if _format(path) == "columns":
+        raise ValueError("%s is not a column, Parquet or Arrow file." % path)
+    pa = _pyarrow()
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format=_format(path))
+    expression = None
+    for name, operator, value in predicates:
+        if name not in dataset.schema.names:
+            raise ValueError("%s has no %s column." % (path, name))
+        if name == "date":
+            value = pa.scalar(value, pa.timestamp("s"))
+        field = ds.field(name)
+        condition = field == value if operator == "==" else field >= value if operator == ">=" else field < value
+        expression = condition if expression is None else expression & condition
+
+    for batch in dataset.to_batches(columns=columns, filter=expression):
+        yield from batch.to_pylist()
@@ -0,0 +1,166 @@
+"""
+Full-text search over rating comments.
+
+Comments are kept in a SQLite database with an FTS5 index, so finding every review that mentions "curve"
+takes a query to a local file instead of a request per professor. The crawler fills the index as it
+finishes each professor when it is given one, and professors that were crawled before can be added later.
+
+Queries are lists of words that all have to appear, in any order. Words in double quotes have to appear
+together as a phrase, and a word ending in * matches every word that starts with it. Matches are ranked
+by relevance and can be filtered by school, department, course and date.
+"""
+
+import datetime
+import os
+import re
+import sqlite3
+import threading
+from collections import namedtuple
+
+from .professor import _utc, clean_comment
+from .school import parse_school_id
+
+SearchHit = namedtuple("SearchHit", ["rating_id", "professor_id", "school_id", "department", "course", "date",
+                                     "comment", "score"])
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS ratings (rowid INTEGER PRIMARY KEY, id TEXT UNIQUE, professor_id INTEGER, "
+    "school_id INTEGER, department TEXT, course TEXT COLLATE NOCASE, date TEXT, comment TEXT)",
+    "CREATE INDEX IF NOT EXISTS ratings_school ON ratings (school_id, department)",
+    "CREATE INDEX IF NOT EXISTS ratings_course ON ratings (course)",
+    "CREATE INDEX IF NOT EXISTS ratings_date ON ratings (date)",
+    # The index only keeps the words of each comment. The comments themselves are read from the ratings table,
+    # which these triggers keep the index in step with.
+    "CREATE VIRTUAL TABLE IF NOT EXISTS comments USING fts5(comment, content='ratings', content_rowid='rowid', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS ratings_insert AFTER INSERT ON ratings BEGIN "
+    "INSERT INTO comments (rowid, comment) VALUES (new.rowid, new.comment); END",
+    "CREATE TRIGGER IF NOT EXISTS ratings_delete AFTER DELETE ON ratings BEGIN "
+    "INSERT INTO comments (comments, rowid, comment) VALUES ('delete', old.rowid, old.comment); END",
+    "CREATE TRIGGER IF NOT EXISTS ratings_update AFTER UPDATE ON ratings BEGIN "
+    "INSERT INTO comments (comments, rowid, comment) VALUES ('delete', old.rowid, old.comment); "
+    "INSERT INTO comments (rowid, comment) VALUES (new.rowid, new.comment); END",
+)
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+class CommentIndex:
+    """A full-text index of rating comments in a SQLite database. Several threads may share one index."""
+
+    def __init__(self, path: str):
+        """
+        Opens an index, creating the database file if needed.
+
+        :param path: The database file, or ":memory:" for an index that only lasts as long as the process.
+        """
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._connection.execute(statement)
+        self._connection.commit()
+
+    def add(self, professor: dict, ratings=None, school_id: int = None):
+        """
+        Adds a professor's ratings to the index, replacing the ones that are already in it.
+
+        :param professor: A crawl record of the professor, with its legacyId and department.
+        :param ratings: The ratings, as RateMyProfessor sends them. Defaults to the ratings inside the record.
+        :param school_id: The professor's school. Defaults to the school in the record.
+        :return: The number of ratings added.
+        """
+        if ratings is None:
+            ratings = professor.get("ratings", ())
+        if school_id is None:
+            school_id = parse_school_id((professor.get("school") or {}).get("id"))
+
+        rows = [(rating["id"], professor["legacyId"], school_id, professor.get("department"), rating.get("class"),
+                 rating["date"][0:19], clean_comment(rating.get("comment")) or "")
+                for rating in ratings]
+        with self._lock:
+            self._connection.executemany(
+                "INSERT INTO ratings (id, professor_id, school_id, department, course, date, comment) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET professor_id = excluded.professor_id, "
+                "school_id = excluded.school_id, department = excluded.department, course = excluded.course, "
+                "date = excluded.date, comment = excluded.comment", rows)
+            self._connection.commit()
+        return len(rows)
+
+    def search(self, query: str, school_id: int = None, department: str = None, course: str = None,
+               since: datetime.datetime = None, until: datetime.datetime = None, limit: int = 20):
+        """
+        Finds the comments that match a query, most relevant first.
+
+        :param query: The words to look for. Put words in double quotes to look for them as a phrase,
+                      and end a word with * to look for every word that starts with it.
+        :param school_id: If given, only search the ratings of this school.
+        :param department: If given, only search the ratings of professors of this department.
+        :param course: If given, only search the ratings of this course. Case does not matter.
+        :param since: If given, only search the ratings made on or after this date. A date without a timezone is
+                      taken to be in UTC, like the rating dates.
+        :param until: If given, only search the ratings made before this date, taken the same way.
+        :param limit: The maximum number of matches returned.
+        :return: A list of SearchHit. The lower the score, the better the match.
+        """
+        conditions, parameters = ["comments MATCH ?"], [match_expression(query)]
+        for condition, value in (("ratings.school_id = ?", school_id), ("ratings.department = ?", department),
+                                 ("ratings.course = ?", course)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        if since is not None:
+            conditions.append("ratings.date >= ?")
+            parameters.append(_utc(since).isoformat(sep=" "))
+        if until is not None:
+            conditions.append("ratings.date < ?")
+            parameters.append(_utc(until).isoformat(sep=" "))
+        parameters.append(limit)
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT ratings.id, ratings.professor_id, ratings.school_id, ratings.department, ratings.course, "
+                "ratings.date, ratings.comment, bm25(comments) AS score FROM comments "
+                "JOIN ratings ON ratings.rowid = comments.rowid WHERE %s ORDER BY score LIMIT ?"
+                % " AND ".join(conditions), parameters).fetchall()
+        return [SearchHit(row[0], row[1], row[2], row[3], row[4], datetime.datetime.fromisoformat(row[5]), row[6],
+                          row[7]) for row in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM ratings").fetchone()[0]
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def match_expression(query: str):
+    """
+    Turns a search query into an FTS5 match expression, quoting every word so nothing in it is taken as syntax.
+
+    :param query: The words to look for, with phrases in double quotes and prefixes ending in *.
+    :return: The match expression.
+    """
+    terms = []
+    for phrase, word in _TERM.findall(query):
+        prefix = False
+        if word:
+            word = word.strip('"')
+            prefix = word.endswith("*")
+            phrase = word.rstrip("*")
+        if phrase.strip():
+            terms.append('"%s"%s' % (phrase.replace('"', '""'), "*" if prefix else ""))
+    if not terms:
+        raise ValueError("The query has no words to look for.")
+    return " ".join(terms)
@@ -0,0 +1,135 @@
+"""
+Streaming JSON Lines files.
+
+Records are appended one compact JSON object per line as soon as they are ready, and read back lazily one at a time,
+so neither side ever holds a whole file in memory. The writer fsyncs every few records and every few seconds,
+and a line cut short by a crash is dropped when the file is opened again.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+class JSONLWriter:
+    """Appends records to a JSON Lines file. Several threads may share one writer."""
+
+    def __init__(self, path: str, fsync_every: int = 100, fsync_interval: float = 5.0):
+        """
+        Opens a file for appending, creating it if needed.
+
+        :param path: The file to append to.
+        :param fsync_every: Force the records to disk after this many records.
+        :param fsync_interval: Force the records to disk when this many seconds passed since the last time.
+        """
+        _repair(path)
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._file = open(path, "ab")
+        self._pending = 0
+        self._synced = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        """
+        Appends one record.
+
+        :param record: A JSON serializable record.
+        :return: The byte offset the record starts at, which read_at accepts.
+        """
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b"\n"
+        with self._lock:
+            offset = self._file.tell()
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= self.fsync_every or time.monotonic() - self._synced >= self.fsync_interval:
+                self._sync()
+        return offset
+
+    def sync(self):
+        """Forces every record written so far to disk."""
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._synced = time.monotonic()
+
+    def close(self):
+        """Forces the records to disk and closes the file."""
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _repair(path: str):
+    """Cuts off a last line that a crash left without its newline."""
+    try:
+        with open(path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+
+            # Look backwards for the end of the last complete line.
+            end = size
+            while end > 0:
+                start = max(0, end - 65536)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b"\n")
+                if newline != -1:
+                    f.truncate(start + newline + 1)
+                    return
+                end = start
+            f.truncate(0)
+    except FileNotFoundError:
+        pass
+
+
+def read_jsonl(path: str, offsets: bool = False):
+    """
+    Reads the records of a JSON Lines file lazily, skipping a last line that was cut short.
+
+    :param path: The file to read.
+    :param offsets: If true, yield (offset, record) tuples instead of records.
+    :return: A generator of the records. Nothing is yielded if the file does not exist.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+
+    with f:
+        offset = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            record = json.loads(line)
+            yield (offset, record) if offsets else record
+            offset += len(line)
+
+
+def read_at(path: str, offset: int):
+    """
+    Reads the one record that starts at an offset.
+
+    :param path: The file to read.
+    :param offset: The record's offset, as returned by JSONLWriter.write or read_jsonl.
+    :return: The record.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return json.loads(f.readline())
@@ -0,0 +1,237 @@
+"""
+Fuzzy lookup of schools and professors by name.
+
+A NameIndex is built once from known schools or professors, for example from a crawl, and then resolves
+misspelled, partial or differently accented names without a search request. Names are compared after
+normalizing case, accents and punctuation, by the trigrams they share and by how many of the searched words
+appear in them, so "daly" finds "Kevin Daly" and "Universite de Montreal" finds "Université de Montréal".
+
+Every entry keeps the key it was added with, usually a legacyId, so two schools or professors with the same
+name stay two different results.
+"""
+
+import heapq
+import json
+import os
+import re
+import unicodedata
+from array import array
+from collections import Counter, namedtuple
+
+from .school import parse_school_id
+
+NameMatch = namedtuple("NameMatch", ["key", "name", "score", "value"])
+
+# How close a name in a NameIndex has to be to be used, from 0 to 1, both instead of searching and to pick
+# among search results.
+INDEX_MIN_SCORE = 0.6
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+# Trigrams found in more entries than this are only counted when there are too few rarer ones.
+_COMMON = 2000
+
+# The most postings counted for one lookup. Past it, the earliest added entries of a common trigram are counted.
+_MAX_COUNTED = 2000
+
+# The number of names that share the most trigrams with a searched name, which are then scored in full.
+_CANDIDATES = 50
+
+
+def normalize_name(name: str):
+    """
+    Normalizes a name for comparison: accents are removed, case is folded and punctuation becomes spaces.
+
+    :param name: The name.
+    :return: The normalized name.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(character for character in decomposed if not unicodedata.combining(character))
+    return " ".join(_NON_WORD.sub(" ", stripped.casefold()).split())
+
+
+def _trigrams(normalized: str):
+    padded = " %s " % normalized
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class NameIndex:
+    """An in-memory trigram index of names, each with a stable key and an optional group, such as a school id."""
+
+    def __init__(self):
+        """Initializes an empty index."""
+        self._keys = []
+        self._names = []
+        self._groups = []
+        self._values = []
+        self._trigrams = []
+        self._tokens = []
+        # Postings of every entry, and of the entries of each group, so that lookups in a group only count its own.
+        self._postings = {}
+        self._group_postings = {}
+        self._positions = {}
+
+    def add(self, key, name: str, group=None, value=None):
+        """
+        Adds a name, replacing the one that was added with the same key.
+
+        :param key: The name's key, such as a school or professor id, which resolve gives back.
+        :param name: The name.
+        :param group: What the name belongs to, such as a professor's school id, to limit resolve to.
+        :param value: Anything to keep along with the name, which resolve gives back too.
+        """
+        if not name:
+            return
+        previous = self._positions.get(key)
+        if previous is not None:
+            # The old entry stays in the postings, but is skipped from now on.
+            self._keys[previous] = None
+
+        position = len(self._keys)
+        normalized = normalize_name(name)
+        trigrams = _trigrams(normalized)
+        self._keys.append(key)
+        self._names.append(name)
+        self._groups.append(group)
+        self._values.append(value)
+        self._trigrams.append(trigrams)
+        self._tokens.append(frozenset(normalized.split()))
+        self._positions[key] = position
+        group_postings = None if group is None else self._group_postings.setdefault(group, {})
+        for postings in (self._postings, group_postings):
+            if postings is None:
+                continue
+            for trigram in trigrams:
+                posting = postings.get(trigram)
+                if posting is None:
+                    posting = postings[trigram] = array('i')
+                posting.append(position)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def resolve(self, name: str, limit: int = 5, group=None, min_score: float = 0.0):
+        """
+        Finds the names closest to a name.
+
+        :param name: The name to look for.
+        :param limit: The maximum number of matches returned.
+        :param group: If given, only names added with this group are matched.
+        :param min_score: The lowest score a match may have, from 0 to 1.
+        :return: A list of NameMatch, best first. Matches with the same score keep the order they were added in.
+        """
+        normalized = normalize_name(name)
+        if not normalized:
+            return []
+        trigrams = _trigrams(normalized)
+        tokens = normalized.split()
+
+        postings = self._postings if group is None else self._group_postings.get(group, {})
+
+        # Rarest trigrams first. A name that shares more than half of the trigrams shares one of the rarest half
+        # and one, so common trigrams past those are skipped.
+        ordered = sorted(trigrams, key=lambda trigram: len(postings.get(trigram, ())))
+        shared = Counter()
+        counted = 0
+        for count, trigram in enumerate(ordered):
+            posting = postings.get(trigram, ())
+            if len(posting) > _COMMON and count > len(ordered) // 2:
+                break
+            if counted + len(posting) > _MAX_COUNTED:
+                shared.update(posting[:_MAX_COUNTED - counted])
+                break
+            shared.update(posting)
+            counted += len(posting)
+
+        # Only the names that share the most trigrams are scored in full, the earliest added first among equals.
+        candidates = shared.items()
+        if len(self._positions) < len(self._keys):
+            candidates = [(position, count) for position, count in candidates if self._keys[position] is not None]
+        matches = []
+        for position, _ in heapq.nlargest(max(_CANDIDATES, 4 * limit), candidates,
+                                          key=lambda candidate: (candidate[1], -candidate[0])):
+            score = _score(trigrams, tokens, self._trigrams[position], self._tokens[position])
+            if score >= min_score:
+                matches.append((-score, position))
+        matches.sort()
+        return [NameMatch(self._keys[position], self._names[position], -score, self._values[position])
+                for score, position in matches[:limit]]
+
+    @classmethod
+    def from_schools(cls, schools):
+        """
+        Builds an index of schools, keyed by school id.
+
+        :param schools: School objects, or school records with a legacyId or id and a name.
+        :return: The NameIndex.
+        """
+        index = cls()
+        for school in schools:
+            if isinstance(school, dict):
+                index.add(int(school.get("legacyId", school.get("id"))), school["name"])
+            else:
+                index.add(school.id, school.name)
+        return index
+
+    @classmethod
+    def from_professors(cls, professors, school_id: int = None):
+        """
+        Builds an index of professors, keyed by legacyId and grouped by school id.
+
+        :param professors: Crawl records of the professors, such as the professors of a crawl's index.json,
+                           or snapshot records with an id and a name.
+        :param school_id: The school of records that do not have it, like snapshot records.
+        :return: The NameIndex.
+        """
+        index = cls()
+        for professor in professors:
+            name = professor.get("name") or ("%s %s" % (professor.get("firstName", ""),
+                                                        professor.get("lastName", ""))).strip()
+            school = professor.get("school")
+            group = parse_school_id(school.get("id")) if isinstance(school, dict) else school_id
+            index.add(int(professor.get("legacyId", professor.get("id"))), name, group)
+        return index
+
+    def save(self, path: str):
+        """
+        Saves the keys, names and groups to a JSON file. The values are not saved.
+
+        :param path: The file to write.
+        """
+        entries = [[self._keys[position], self._names[position], self._groups[position]]
+                   for position in sorted(self._positions.values())]
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"entries": entries}, f, ensure_ascii=False)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Loads an index saved with save.
+
+        :param path: The file to read.
+        :return: The NameIndex.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)["entries"]
+        index = cls()
+        for key, name, group in entries:
+            index.add(key, name, group)
+        return index
+
+
+def _score(trigrams: frozenset, tokens: list, other_trigrams: frozenset, other_tokens: frozenset):
+    """Scores how close two names are, from 0 to 1."""
+    dice = 2 * len(trigrams & other_trigrams) / (len(trigrams) + len(other_trigrams))
+    # How many of the searched words the name has, allowing a searched word to be the start of one of its words.
+    found = 0.0
+    for token in tokens:
+        if token in other_tokens:
+            found += 1
+        elif len(token) > 1 and any(other.startswith(token) for other in other_tokens):
+            found += 0.9
+    return max(dice, (dice + found / len(tokens)) / 2)
@@ -0,0 +1,60 @@
+"""
+Offline mode.
+
+While a Store is set with set_offline, schools, professors, ratings and searches are answered from it before
+anything is requested. What the store does not have is requested as usual, or with fallback=False, treated as
+not found: lookups by id raise ValueError and searches find nothing. A batch job over data that was crawled
+shortly before then runs at the speed of the local disk.
+"""
+
+import threading
+
+_store = None
+_fallback = True
+_lock = threading.Lock()
+
+
+def set_offline(store, fallback: bool = True):
+    """
+    Sets the store the whole process reads from before going to RateMyProfessor.
+
+    :param store: The Store to read from, or None to turn offline mode off.
+    :param fallback: If true, what the store does not have is requested from RateMyProfessor.
+                     If false, nothing is requested at all.
+    :return: The store that was previously set, if any.
+    """
+    global _store, _fallback
+    with _lock:
+        previous = _store
+        _store = store
+        _fallback = fallback
+    return previous
+
+
+def get_offline():
+    """
+    Gets the store set with set_offline.
+
+    :return: The store, or None if offline mode is off.
+    """
+    return _store
+
+
+def allows_network():
+    """
+    Tells whether what the store does not have may be requested from RateMyProfessor.
+
+    :return: True unless a store was set with fallback=False.
+    """
+    return _store is None or _fallback
+
+
+def miss(what: str):
+    """
+    Reports that the store does not have something that was looked up by id.
+
+    :param what: What was looked up, such as "Professor 1658282".
+    :raises ValueError: If what the store does not have may not be requested.
+    """
+    if not allows_network():
+        raise ValueError("%s is not in the offline store." % what)
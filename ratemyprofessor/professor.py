@@ -1,48 +1,115 @@
-import requests
 import json
 import base64
-import os
 import datetime
-from bs4 import BeautifulSoup
+import html
+import re
+import sys
+import threading
+from array import array
 
 from functools import total_ordering
-from .school import School
-
-current_path = os.path.dirname(__file__)
-with open(os.path.join(current_path, "json/ratingsquery.json"), 'r') as f:
-    ratings_query = json.load(f)
-
-with open(os.path.join(current_path, "json/professorquery.json"), 'r') as f:
-    professor_query = json.load(f)
-
-with open(os.path.join(current_path, "json/header.json"), 'r') as f:
-    headers = json.load(f)
+from .cache import memo
+from .offline import allows_network, get_offline, miss
+from .queries import PROFESSOR_FIELDS, PROFESSOR_QUERY, RATINGS_QUERY, graphql_headers, graphql_request, \
+    professor_headers
+from .school import School, get_school
+from .transport import Transport, get_transport
 
 
 @total_ordering
 class Professor:
     """Represents a professor."""
 
-    def __init__(self, professor_id: int):
+    # Attributes that are filled in by _load, and that a lazy professor fetches on first read.
+    _fields = ("courses", "name", "department", "difficulty", "rating", "would_take_again", "num_ratings", "school")
+
+    def __init__(self, professor_id: int, transport: Transport = None, lazy: bool = False):
         """
         Initializes a professor to the professor id.
 
         :param professor_id: The professor's id.
+        :param transport: The transport to send requests through. Defaults to the shared transport.
+        :param lazy: If true, nothing is requested until an attribute other than the id is first read.
+                     An invalid id then raises ValueError on that first read instead of here.
         """
 
         self.id = professor_id
-        self._get_rating_info(professor_id)
+        self._transport = transport
+        self._loaded = False
+        self._lock = threading.Lock()
+        if not lazy:
+            self._get_rating_info(professor_id)
+
+    def __getattr__(self, name):
+        # Only called for attributes that have not been set yet, so each field is fetched at most once.
+        if name not in Professor._fields:
+            raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, name))
+        self._hydrate()
+        return self.__dict__[name]
+
+    def _hydrate(self):
+        # Concurrent first reads wait on the lock and reuse the result of the one request.
+        with self._lock:
+            if not self._loaded:
+                self._get_rating_info(self.id)
 
     def _get_rating_info(self, professor_id: int):
-        headers["Referer"] = "https://www.ratemyprofessors.com/ShowRatings.jsp?tid=%s" % professor_id
-        professor_query["variables"]["id"] = base64.b64encode(("Teacher-%s" % professor_id)
-                                                              .encode('ascii')).decode('ascii')
-        data = requests.post(url="https://www.ratemyprofessors.com/graphql", json=professor_query, headers=headers)
+        professor_data = memo.get((self._transport or get_transport(), "professor", professor_id))
+        if professor_data is None:
+            professor_data = _offline_data(professor_id)
+        if professor_data is None:
+            professor_data = self._fetch_professor_data(professor_id)
+
+        self._load(professor_data)
+
+    def _fetch_professor_data(self, professor_id: int):
+        """Requests one professor's Teacher node, and keeps it in memo."""
+        transport = self._transport or get_transport()
+        query, request_headers = self._professor_request(professor_id)
+        data = transport.post("/graphql", json=query, headers=request_headers, kind="professor")
 
-        if data is None or json.loads(data.text)["data"]["node"] is None:
+        if data is None:
             raise ValueError("Professor not found with that id or bad request.")
 
-        professor_data = json.loads(data.text)["data"]["node"]
+        professor_data = self._professor_data(data.text)
+        memo.set((transport, "professor", professor_id), professor_data)
+        return professor_data
+
+    @staticmethod
+    def _professor_request(professor_id: int):
+        """Builds the query and headers that fetch one professor."""
+        return graphql_request(PROFESSOR_QUERY, id=_teacher_id(professor_id)), professor_headers(professor_id)
+
+    @staticmethod
+    def _professor_data(text: str):
+        """Gets the Teacher node out of a professor query response."""
+        professor_data = json.loads(text)["data"]["node"]
+        if professor_data is None:
+            raise ValueError("Professor not found with that id or bad request.")
+        return professor_data
+
+    @classmethod
+    def _from_data(cls, professor_id: int, professor_data: dict, transport: Transport = None):
+        """Builds a professor from a Teacher node that has already been fetched."""
+        professor = cls(professor_id, transport=transport, lazy=True)
+        professor._load(professor_data)
+        return professor
+
+    @classmethod
+    def _from_search(cls, record: dict, school: School, transport: Transport = None):
+        """Builds a lazy professor from a search result, keeping the fields the search already returned."""
+        professor = cls(int(record["legacyId"]), transport=transport, lazy=True)
+        professor.name = record["firstName"] + ' ' + record["lastName"]
+        professor.department = record["department"]
+        professor.difficulty = record["avgDifficulty"]
+        professor.rating = record["avgRating"]
+        professor.would_take_again = _would_take_again(record["wouldTakeAgainPercent"])
+        professor.num_ratings = record["numRatings"]
+        if school is not None:
+            professor.school = school
+        return professor
+
+    def _load(self, professor_data: dict):
         courses_data = professor_data["courseCodes"]
 
         self.courses = []
@@ -54,15 +121,68 @@ class Professor:
         self.department = professor_data["department"]
         self.difficulty = professor_data["avgDifficulty"]
         self.rating = professor_data["avgRating"]
-        if professor_data["wouldTakeAgainPercent"] == 0:
-            self.would_take_again = None
-        else:
-            self.would_take_again = professor_data["wouldTakeAgainPercent"]
+        self.would_take_again = _would_take_again(professor_data["wouldTakeAgainPercent"])
         self.num_ratings = professor_data["numRatings"]
-        self.school = School(int(base64.b64decode(
-            professor_data["school"]["id"].encode('ascii')).decode('ascii')[7:]))
+        school_id = int(base64.b64decode(professor_data["school"]["id"].encode('ascii')).decode('ascii')[7:])
+        self.school = get_school(school_id, name=professor_data["school"].get("name"), transport=self._transport)
+        self._loaded = True
+
+    @staticmethod
+    def _batch_request(professor_ids):
+        """Builds one query, and its headers, that fetches every professor id in professor_ids under its own alias."""
+        parameters = []
+        selections = []
+        variables = {}
+        for i, professor_id in enumerate(professor_ids):
+            parameters.append("$id%s: ID!" % i)
+            selections.append("p%s: node(id: $id%s) {...ProfessorFields}" % (i, i))
+            variables["id%s" % i] = _teacher_id(professor_id)
+
+        query = "query BatchProfessorsQuery(%s) {%s} %s" % (" ".join(parameters), " ".join(selections),
+                                                            PROFESSOR_FIELDS)
+        return graphql_request(query, **variables), graphql_headers()
+
+    @classmethod
+    def _split_offline(cls, professor_ids, transport: Transport = None):
+        """
+        Builds the professors the offline store has.
 
-    def get_ratings(self, course_name=None):
+        :return: The professors that were found, by id, and the ids that have to be requested.
+        """
+        store = get_offline()
+        found = {}
+        if store is not None:
+            for professor_id in professor_ids:
+                professor_data = store.professor_data(professor_id)
+                if professor_data is not None:
+                    found[professor_id] = cls._from_data(professor_id, professor_data, transport=transport)
+        missing = [professor_id for professor_id in professor_ids if professor_id not in found]
+        return found, missing if allows_network() else []
+
+    @classmethod
+    def _get_many(cls, professor_ids, transport: Transport = None):
+        """Fetches up to one chunk of professors in a single request, skipping ids that are not found."""
+        query, request_headers = cls._batch_request(professor_ids)
+        data = (transport or get_transport()).post("/graphql", json=query, headers=request_headers, kind="professor")
+        if data is None:
+            raise ValueError("Bad request.")
+        return cls._from_batch(professor_ids, data.text, transport=transport)
+
+    @classmethod
+    def _from_batch(cls, professor_ids, text: str, transport: Transport = None):
+        """Builds the professors out of a batch query response, skipping ids that are not found."""
+        nodes = json.loads(text).get("data")
+        if nodes is None:
+            raise ValueError("Bad request.")
+
+        professors = []
+        for i, professor_id in enumerate(professor_ids):
+            if nodes.get("p%s" % i) is not None:
+                memo.set((transport or get_transport(), "professor", professor_id), nodes["p%s" % i])
+                professors.append(cls._from_data(professor_id, nodes["p%s" % i], transport=transport))
+        return professors
+
+    def get_ratings(self, course_name=None, raw_comments: bool = False, bulk: bool = False):
         """
         Returns a list of strings that represent the courses that have ratings for that particular course name.
 
@@ -71,15 +191,92 @@ class Professor:
         If no course name is given, this method finds all the course names.
 
 
+        :param course_name: If given, only return the ratings for this course name.
+        :param raw_comments: If true, the comments are left exactly as RateMyProfessor sent them.
+        :param bulk: If true, return a compact RatingBatch instead of a list of Rating objects.
         :return: A list of the professor's courses for that course name.
         """
-        if self.num_ratings == 0:
-            return []
+        # Ask for every rating in one page. Further pages are only followed if the site caps the page size.
+        fields = self._iter_rating_fields(page_size=self.num_ratings, course_name=course_name)
+        if bulk:
+            return RatingBatch(fields, raw_comments=raw_comments)
+        return [Rating(**rating_fields, raw_comments=raw_comments) for rating_fields in fields]
+
+    def iter_ratings(self, page_size: int = 100, since: datetime.datetime = None, course_name=None,
+                     raw_comments: bool = False):
+        """
+        Yields the professor's ratings, newest first, fetching them one page at a time.
 
-        headers["Referer"] = "https://www.ratemyprofessors.com/ShowRatings.jsp?tid=%s" % self.id
-        ratings_query["variables"]["id"] = base64.b64encode(("Teacher-%s" % self.id).encode('ascii')).decode('ascii')
-        ratings_query["variables"]["count"] = self.num_ratings
+        Each page is only requested once the ratings of the previous page have been consumed,
+        so stopping early saves the requests for the remaining pages.
+
+        :param page_size: The number of ratings to request at once.
+        :param since: If given, stop at the first rating that is older than this date. A date without a
+                      timezone is taken to be in UTC, like the rating dates.
+        :param course_name: If given, only yield the ratings for this course name.
+        :param raw_comments: If true, the comments are left exactly as RateMyProfessor sent them.
+        :return: A generator of the professor's ratings.
+        """
+        for rating_fields in self._iter_rating_fields(page_size, since, course_name):
+            yield Rating(**rating_fields, raw_comments=raw_comments)
+
+    def _iter_rating_fields(self, page_size: int = 100, since: datetime.datetime = None, course_name=None):
+        """Yields the Rating arguments of every rating, fetching them one page at a time."""
+        if since is not None:
+            since = _utc(since)
+        ratings = self._offline_ratings(course_name)
+        if ratings is not None:
+            for rating_fields in ratings:
+                if since is not None and rating_fields["date"] < since:
+                    return
+                yield rating_fields
+            return
+
+        cursor = None
+        while True:
+            request = self._ratings_request(course_name, count=page_size, cursor=cursor)
+            if request is None:
+                return
+
+            query, request_headers = request
+            page = self._fetch_ratings_page(query, request_headers)
+            if page is None:
+                return
+
+            ratings, page_info = page
+            for rating_fields in ratings:
+                if since is not None and rating_fields["date"] < since:
+                    return
+                yield rating_fields
+
+            if not ratings or page_info is None or not page_info["hasNextPage"]:
+                return
+            cursor = page_info["endCursor"]
+
+    def _fetch_ratings_page(self, query: dict, request_headers: dict):
+        """Requests a page of ratings, and gets the Rating arguments of each rating and the page info."""
+        data = (self._transport or get_transport()).post("/graphql", json=query, headers=request_headers,
+                                                         kind="ratings")
+        if data is None:
+            return None
+        return self._ratings_page(data.text)
+
+    def _offline_ratings(self, course_name=None):
+        """Gets the Rating arguments of every rating from the offline store, or None if they have to be requested."""
+        store = get_offline()
+        if store is None:
+            return None
+        ratings = store.professor_ratings(self.id, course_name)
+        if ratings is None:
+            miss("The ratings of professor %s" % self.id)
+        return ratings
 
+    def _ratings_request(self, course_name=None, count: int = None, cursor: str = None):
+        """Builds the query and headers that fetch a page of ratings, or returns None if there can be no ratings."""
+        if self.num_ratings == 0:
+            return None
+
+        course_filter = None
         if course_name is not None:
             course_found = False
             for course in self.courses:
@@ -87,58 +284,24 @@ class Professor:
                     course_found = True
 
             if course_found is False:
-                return []
-            else:
-                ratings_query["variables"]["courseFilter"] = course_name
-
-        data = requests.post(url="https://www.ratemyprofessors.com/graphql", json=ratings_query, headers=headers)
-
-        if data is None or json.loads(data.text)["data"]["node"]["ratings"]["edges"] is None:
-            return []
-
-        ratings_data = json.loads(data.text)["data"]["node"]["ratings"]["edges"]
-        ratings = []
-
-        for rating_data in ratings_data:
-            rating = rating_data["node"]
-
-            if rating["attendanceMandatory"] == "non mandatory":
-                attendance_mandatory = False
-            elif rating["attendanceMandatory"] == "mandatory":
-                attendance_mandatory = True
+                return None
             else:
-                attendance_mandatory = None
+                course_filter = course_name
 
-            if bool(rating["isForCredit"]) is False:
-                credit = False
-            elif bool(rating["isForCredit"]) is True:
-                credit = True
-            else:
-                credit = None
+        query = graphql_request(RATINGS_QUERY, id=_teacher_id(self.id),
+                                count=count if count is not None else self.num_ratings,
+                                courseFilter=course_filter, cursor=cursor)
+        return query, professor_headers(self.id)
 
-            if bool(rating["isForOnlineClass"]) is False:
-                online_class = False
-            elif bool(rating["isForOnlineClass"]) is True:
-                online_class = True
-            else:
-                online_class = None
+    @staticmethod
+    def _ratings_page(text: str):
+        """Gets the Rating arguments of every rating in a ratings query response, and the page info."""
+        ratings_connection = json.loads(text)["data"]["node"]["ratings"]
+        if ratings_connection["edges"] is None:
+            return [], None
 
-            if rating["wouldTakeAgain"] == 1:
-                take_again = True
-            elif rating["wouldTakeAgain"] == 0:
-                take_again = False
-            else:
-                take_again = None
-
-            date = datetime.datetime.strptime(rating["date"][0:19], '%Y-%m-%d %H:%M:%S')
-
-            ratings.append(Rating(rating=rating["helpfulRating"], difficulty=rating["difficultyRating"],
-                                  comment=rating["comment"], class_name=rating["class"], date=date,
-                                  take_again=take_again, grade=rating["grade"], thumbs_up=rating["thumbsUpTotal"],
-                                  thumbs_down=rating["thumbsDownTotal"], online_class=online_class, credit=credit,
-                                  attendance_mandatory=attendance_mandatory))
-
-        return ratings
+        ratings = [_rating_fields(rating_data["node"]) for rating_data in ratings_connection["edges"]]
+        return ratings, ratings_connection.get("pageInfo")
 
     def __repr__(self):
         return self.name
@@ -150,9 +313,106 @@ class Professor:
         return (self.name, self.department, self.school) == (other.name, other.department, other.school)
 
 
+def _teacher_id(professor_id: int):
+    return base64.b64encode(("Teacher-%s" % professor_id).encode('ascii')).decode('ascii')
+
+
+def _rating_fields(rating: dict):
+    """Gets the Rating arguments of a Rating node, as RateMyProfessor sends it."""
+    if rating["attendanceMandatory"] == "non mandatory":
+        attendance_mandatory = False
+    elif rating["attendanceMandatory"] == "mandatory":
+        attendance_mandatory = True
+    else:
+        attendance_mandatory = None
+
+    if bool(rating["isForCredit"]) is False:
+        credit = False
+    elif bool(rating["isForCredit"]) is True:
+        credit = True
+    else:
+        credit = None
+
+    if bool(rating["isForOnlineClass"]) is False:
+        online_class = False
+    elif bool(rating["isForOnlineClass"]) is True:
+        online_class = True
+    else:
+        online_class = None
+
+    if rating["wouldTakeAgain"] == 1:
+        take_again = True
+    elif rating["wouldTakeAgain"] == 0:
+        take_again = False
+    else:
+        take_again = None
+
+    date = datetime.datetime.fromisoformat(rating["date"][0:19])
+
+    # Course names and grades repeat a lot, so share one string object for each distinct value.
+    class_name = sys.intern(rating["class"]) if rating["class"] is not None else None
+    grade = sys.intern(rating["grade"]) if rating["grade"] is not None else None
+
+    return dict(rating=rating["helpfulRating"], difficulty=rating["difficultyRating"],
+                comment=rating["comment"], class_name=class_name, date=date,
+                take_again=take_again, grade=grade, thumbs_up=rating["thumbsUpTotal"],
+                thumbs_down=rating["thumbsDownTotal"], online_class=online_class, credit=credit,
+                attendance_mandatory=attendance_mandatory)
+
+
+def _offline_data(professor_id: int):
+    """Gets a professor's Teacher node from the offline store, or None if it has to be requested."""
+    store = get_offline()
+    if store is None:
+        return None
+    professor_data = store.professor_data(professor_id)
+    if professor_data is None:
+        miss("Professor %s" % professor_id)
+    return professor_data
+
+
+def _would_take_again(percent):
+    if percent == 0:
+        return None
+    return percent
+
+
+# Comments, script and style elements are dropped with their content, any other tag is dropped on its own.
+# An unterminated tag runs to the end of the text, like it does in an HTML parser.
+_markup = re.compile(r"<!--.*?(?:-->|\Z)|<(script|style)\b[^>]*>.*?(?:</\1\s*>|\Z)|<[a-zA-Z/!?][^>]*(?:>|\Z)",
+                     re.S | re.I)
+
+
+def clean_comment(comment: str):
+    """
+    Turns a comment as RateMyProfessor sends it into plain text.
+
+    This gives the same text as parsing the comment as an HTML document and reading its text:
+    leading whitespace and tags are removed, entities such as &quot; are unescaped and line
+    endings become newlines. Comments without markup are returned almost unchanged, so this is cheap.
+
+    :param comment: The raw comment.
+    :return: The comment as plain text.
+    """
+    if not comment:
+        return comment
+    comment = comment.lstrip(' \t\n\r\f')
+    if '<' in comment:
+        comment = _markup.sub('', comment)
+    if '&' in comment:
+        comment = html.unescape(comment)
+    if '\r' in comment:
+        comment = comment.replace('\r\n', '\n').replace('\r', '\n')
+    if '\0' in comment:
+        comment = comment.replace('\0', '\ufffd')
+    return comment
+
+
 class Course:
     """Represents a course."""
 
+    __slots__ = ("professor", "name", "count")
+
     def __init__(self, professor: Professor, count: int, name: str):
         """
         Initializes a course.
@@ -170,9 +430,14 @@ class Course:
 class Rating:
     """Represents a rating."""
 
+    # Slots keep each rating small, and the date is kept as whole seconds since the epoch
+    # rather than as a datetime object.
+    __slots__ = ("rating", "difficulty", "raw_comment", "_comment", "class_name", "_timestamp", "take_again",
+                 "grade", "thumbs_up", "thumbs_down", "online_class", "credit", "attendance_mandatory")
+
     def __init__(self,  rating: int, difficulty: int, comment: str, class_name: str, date: datetime,
                  take_again=None, grade=None, thumbs_up: int = 0, thumbs_down: int = 0, online_class=None, credit=None,
-                 attendance_mandatory=None):
+                 attendance_mandatory=None, raw_comments: bool = False):
         """
         Initializes a rating.
 
@@ -190,10 +455,13 @@ class Rating:
         :param online_class: If the rating is for an online class, if any
         :param credit: If the rating was for credit, if any
         :param attendance_mandatory: If attendance was mandatory for the class, if any
+        :param raw_comments: If true, comment is the comment exactly as RateMyProfessor sent it, markup and all.
+                             Otherwise the markup is removed the first time the comment is read.
         """
         self.rating = rating
         self.difficulty = difficulty
-        self.comment = BeautifulSoup(comment, "lxml").text
+        self.raw_comment = comment
+        self._comment = comment if raw_comments else None
         self.class_name = class_name
         self.date = date
         self.take_again = take_again
@@ -204,5 +472,216 @@ class Rating:
         self.credit = credit
         self.attendance_mandatory = attendance_mandatory
 
+    @property
+    def comment(self):
+        """The rating comment as plain text. The raw text is always available as raw_comment."""
+        if self._comment is None:
+            self._comment = clean_comment(self.raw_comment)
+        return self._comment
+
+    @comment.setter
+    def comment(self, comment):
+        self._comment = comment
+
+    @property
+    def date(self):
+        """The date the rating was made, in UTC and without a timezone, like RateMyProfessor sends it."""
+        return _EPOCH + datetime.timedelta(seconds=self._timestamp)
+
+    @date.setter
+    def date(self, date: datetime.datetime):
+        self._timestamp = _timestamp(date)
+
     def __lt__(self, other):
-        return self.date > other.date
+        return self._timestamp > other._timestamp
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _utc(date: datetime.datetime):
+    """Converts a date with a timezone to UTC without one. Dates without a timezone are already taken to be UTC."""
+    if date.tzinfo is None:
+        return date
+    return date.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _timestamp(date: datetime.datetime):
+    return (_utc(date) - _EPOCH) // datetime.timedelta(seconds=1)
+
+
+class RatingBatch:
+    """
+    Holds many ratings in a compact, column by column form.
+
+    The numbers, flags and dates are kept in typed arrays, the course names and grades are
+    dictionary-encoded, and all the comments share one string. Each column can be read directly,
+    for example batch.rating or batch.timestamp, and indexing or iterating gives Rating objects.
+
+    Flags that may be unknown (take_again, online_class, credit and attendance_mandatory) are stored as
+    1 for True, 0 for False and -1 for None. Ratings and difficulties that are unknown are stored as NaN.
+    """
+
+    def __init__(self, ratings=(), raw_comments: bool = False):
+        """
+        Initializes a batch.
+
+        :param ratings: Rating objects, or dicts of Rating arguments, to add to the batch.
+        :param raw_comments: If true, the comments are left exactly as RateMyProfessor sent them.
+        """
+        self.raw_comments = raw_comments
+        self.rating = array('f')
+        self.difficulty = array('f')
+        self.timestamp = array('q')
+        self.thumbs_up = array('i')
+        self.thumbs_down = array('i')
+        self.take_again = array('b')
+        self.online_class = array('b')
+        self.credit = array('b')
+        self.attendance_mandatory = array('b')
+        self.class_code = array('i')
+        self.grade_code = array('i')
+        self._strings = []
+        self._string_codes = {}
+        self._comment_ends = array('q')
+        self._comments = ""
+        self._pending_comments = []
+        self._pending_length = 0
+        for rating in ratings:
+            self.append(rating)
+
+    def append(self, rating):
+        """
+        Adds a rating to the end of the batch.
+
+        :param rating: A Rating, or a dict of Rating arguments.
+        """
+        if isinstance(rating, Rating):
+            self._append(rating.rating, rating.difficulty, rating.raw_comment, rating.class_name, rating.date,
+                         rating.take_again, rating.grade, rating.thumbs_up, rating.thumbs_down, rating.online_class,
+                         rating.credit, rating.attendance_mandatory)
+        else:
+            self._append(**rating)
+
+    def _append(self, rating, difficulty, comment, class_name, date, take_again=None, grade=None, thumbs_up=0,
+                thumbs_down=0, online_class=None, credit=None, attendance_mandatory=None):
+        self.rating.append(_NAN if rating is None else rating)
+        self.difficulty.append(_NAN if difficulty is None else difficulty)
+        self.timestamp.append(_timestamp(date))
+        self.thumbs_up.append(thumbs_up or 0)
+        self.thumbs_down.append(thumbs_down or 0)
+        self.take_again.append(_flag(take_again))
+        self.online_class.append(_flag(online_class))
+        self.credit.append(_flag(credit))
+        self.attendance_mandatory.append(_flag(attendance_mandatory))
+        self.class_code.append(self._string_code(class_name))
+        self.grade_code.append(self._string_code(grade))
+
+        comment = comment or ""
+        self._pending_comments.append(comment)
+        self._pending_length += len(comment)
+        self._comment_ends.append(len(self._comments) + self._pending_length)
+
+    def _string_code(self, value):
+        if value is None:
+            return -1
+        code = self._string_codes.get(value)
+        if code is None:
+            code = self._string_codes[value] = len(self._strings)
+            self._strings.append(value)
+        return code
+
+    def _string(self, code):
+        return None if code == -1 else self._strings[code]
+
+    def raw_comment(self, index: int):
+        """
+        Gets the comment of one rating exactly as RateMyProfessor sent it.
+
+        :param index: The rating's position in the batch.
+        :return: The raw comment.
+        """
+        if self._pending_comments:
+            self._comments += "".join(self._pending_comments)
+            self._pending_comments = []
+            self._pending_length = 0
+        index = range(len(self))[index]
+        start = self._comment_ends[index - 1] if index > 0 else 0
+        return self._comments[start:self._comment_ends[index]]
+
+    def comment(self, index: int):
+        """
+        Gets the comment of one rating.
+
+        :param index: The rating's position in the batch.
+        :return: The comment as plain text, or as RateMyProfessor sent it if the batch keeps raw comments.
+        """
+        if self.raw_comments:
+            return self.raw_comment(index)
+        return clean_comment(self.raw_comment(index))
+
+    def class_name(self, index: int):
+        """
+        Gets the class one rating was for.
+
+        :param index: The rating's position in the batch.
+        :return: The class name.
+        """
+        return self._string(self.class_code[index])
+
+    def grade(self, index: int):
+        """
+        Gets the grade of the person who made one rating.
+
+        :param index: The rating's position in the batch.
+        :return: The grade, if any.
+        """
+        return self._string(self.grade_code[index])
+
+    def date(self, index: int):
+        """
+        Gets the date one rating was made.
+
+        :param index: The rating's position in the batch.
+        :return: The date.
+        """
+        return _EPOCH + datetime.timedelta(seconds=self.timestamp[index])
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def __getitem__(self, index: int):
+        rating = self.rating[index]
+        difficulty = self.difficulty[index]
+        return Rating(rating=None if rating != rating else _number(rating),
+                      difficulty=None if difficulty != difficulty else _number(difficulty),
+                      comment=self.raw_comment(index), class_name=self.class_name(index), date=self.date(index),
+                      take_again=_unflag(self.take_again[index]), grade=self.grade(index),
+                      thumbs_up=self.thumbs_up[index], thumbs_down=self.thumbs_down[index],
+                      online_class=_unflag(self.online_class[index]), credit=_unflag(self.credit[index]),
+                      attendance_mandatory=_unflag(self.attendance_mandatory[index]),
+                      raw_comments=self.raw_comments)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+_NAN = float("nan")
+
+
+def _flag(value):
+    if value is None:
+        return -1
+    return 1 if value else 0
+
+
+def _unflag(value):
+    if value == -1:
+        return None
+    return value == 1
+
+
+def _number(value: float):
+    # Whole numbers come back as ints, like they are in the GraphQL response.
+    return int(value) if value.is_integer() else value
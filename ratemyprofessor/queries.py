@@ -0,0 +1,60 @@
+"""
+Read-only GraphQL query templates, and the builders that make a fresh request out of them.
+
+The templates are loaded once from the json directory and are never modified. Every request gets
+its own variables and headers dicts, so concurrent requests cannot see each other's ids or filters.
+"""
+
+import json
+import os
+from types import MappingProxyType
+
+current_path = os.path.dirname(__file__)
+
+
+def _load(name: str):
+    with open(os.path.join(current_path, "json", name), 'r') as f:
+        return json.load(f)
+
+
+PROFESSOR_QUERY = _load("professorquery.json")["query"]
+PROFESSOR_FIELDS = _load("professorsquery.json")["query"]
+RATINGS_QUERY = _load("ratingsquery.json")["query"]
+SCHOOL_SEARCH_QUERY = _load("schoolquery.json")["query"]
+TEACHER_SEARCH_QUERY = _load("teacherquery.json")["query"]
+
+HEADERS = MappingProxyType(_load("header.json"))
+
+
+def graphql_request(query: str, /, **variables):
+    """
+    Builds a GraphQL request body.
+
+    :param query: One of the query templates.
+    :param variables: The query's variables. Variables that are None are left out.
+    :return: A new dict that is safe to send, or to change, without affecting other requests.
+    """
+    return {"query": query, "variables": {name: value for name, value in variables.items() if value is not None}}
+
+
+def graphql_headers(referer: str = None):
+    """
+    Builds the headers for a GraphQL request.
+
+    :param referer: The page the request appears to come from, if any.
+    :return: A new dict of headers.
+    """
+    request_headers = dict(HEADERS)
+    if referer is not None:
+        request_headers["Referer"] = referer
+    return request_headers
+
+
+def professor_headers(professor_id: int):
+    """
+    Builds the headers for a GraphQL request about one professor.
+
+    :param professor_id: The professor's id.
+    :return: A new dict of headers.
+    """
+    return graphql_headers("https://www.ratemyprofessors.com/ShowRatings.jsp?tid=%s" % professor_id)
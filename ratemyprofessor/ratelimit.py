@@ -0,0 +1,206 @@
+"""
+Client-side rate limiting and retries.
+
+Every request first takes a token from the bucket of its endpoint, GraphQL or HTML pages.
+When RateMyProfessor answers 429 or a server error, the bucket's rate is cut in half and it honors
+any Retry-After; each success raises the rate again a little, up to its configured maximum.
+Failed requests are retried after a jittered exponential backoff.
+
+The limiter only computes how long to wait, so the same limiter serves threads and asyncio tasks.
+"""
+
+import email.utils
+import random
+import threading
+import time
+
+# Responses that mean the site is overloaded or throttling us, and that are worth retrying.
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+class TokenBucket:
+    """Hands out tokens at an adjustable rate, allowing bursts of up to burst requests."""
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = None, increase: float = None,
+                 decrease: float = 0.5):
+        """
+        Initializes a full bucket.
+
+        :param rate: The maximum number of requests per second.
+        :param burst: The number of requests that can be sent at once after a quiet period.
+        :param min_rate: The lowest the rate is cut to when throttled. Defaults to a twentieth of rate.
+        :param increase: How much the rate grows after each success. Defaults to a fiftieth of rate.
+        :param decrease: The factor the rate is multiplied by when throttled.
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate if min_rate is not None else rate / 20
+        self.increase = increase if increase is not None else rate / 50
+        self.decrease = decrease
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token, possibly one that only becomes available in the future.
+
+        :return: How many seconds the caller has to wait before sending its request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def on_success(self):
+        """Raises the rate additively after a request went through."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: float = None):
+        """
+        Cuts the rate multiplicatively after the site throttled a request.
+
+        :param retry_after: The number of seconds the site asked us to wait, if it did.
+        """
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+
+class RateLimiter:
+    """Keeps one token bucket per endpoint."""
+
+    def __init__(self, graphql: TokenBucket = None, html: TokenBucket = None):
+        """
+        Initializes a limiter.
+
+        :param graphql: The bucket for GraphQL requests, or None to leave them unlimited.
+        :param html: The bucket for HTML pages, or None to leave them unlimited.
+        """
+        self.graphql = graphql
+        self.html = html
+
+    def bucket(self, url: str):
+        """
+        Gets the bucket of the endpoint a url belongs to.
+
+        :param url: The request's url.
+        :return: The TokenBucket, or None if the endpoint is unlimited.
+        """
+        return self.graphql if url.split("?", 1)[0].endswith("/graphql") else self.html
+
+
+class RetryPolicy:
+    """Decides whether and when a failed request is sent again."""
+
+    def __init__(self, retries: int = 4, backoff: float = 0.5, max_backoff: float = 30, max_retry_after: float = 60):
+        """
+        Initializes a retry policy.
+
+        :param retries: The number of times a request is retried, so it is sent at most retries + 1 times.
+        :param backoff: The backoff of the first retry in seconds. It doubles with every retry.
+        :param max_backoff: The longest backoff in seconds.
+        :param max_retry_after: The longest Retry-After that is waited for, in seconds. When the site asks for a
+                                longer wait, the throttled response is returned instead of sleeping, and the rate
+                                limiter only holds back other requests for this long.
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+
+    def delay(self, attempt: int, retry_after: float = None):
+        """
+        Gets how long to wait before a retry.
+
+        The wait is drawn uniformly up to the exponential backoff, so clients that failed together
+        do not all retry at the same moment. A Retry-After from the site is honored up to max_retry_after.
+
+        :param attempt: The number of the retry, starting at 0.
+        :param retry_after: The number of seconds the site asked us to wait, if it did.
+        :return: The wait in seconds.
+        """
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, self.throttle(retry_after))
+        return delay
+
+    def throttle(self, retry_after: float = None):
+        """
+        Gets how long a throttled endpoint is held back.
+
+        :param retry_after: The number of seconds the site asked us to wait, if it did.
+        :return: The wait in seconds, at most max_retry_after, or None if the site did not ask for one.
+        """
+        if retry_after is None:
+            return None
+        return min(retry_after, self.max_retry_after)
+
+    def gives_up(self, attempt: int, retry_after: float = None):
+        """
+        Tells whether a throttled or failed request is no longer retried.
+
+        :param attempt: The number of the retry that would come next, starting at 0.
+        :param retry_after: The number of seconds the site asked us to wait, if it did.
+        :return: True once every retry is used up, or if the site asked for a wait longer than max_retry_after.
+        """
+        return attempt >= self.retries or (retry_after is not None and retry_after > self.max_retry_after)
+
+
+def retry_after(response):
+    """
+    Reads a response's Retry-After header.
+
+    :param response: The response.
+    :return: The number of seconds to wait, or None if the header is missing or unreadable.
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """
+    Gets the rate limiter shared by the whole process, creating it on first use.
+
+    :return: The shared rate limiter.
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(graphql=TokenBucket(10, burst=20), html=TokenBucket(2, burst=5))
+    return _limiter
+
+
+def set_limiter(limiter: RateLimiter):
+    """
+    Replaces the rate limiter shared by the whole process.
+
+    :param limiter: The limiter to use, or None to go back to a default limiter on next use.
+    :return: The limiter that was previously in use, if any.
+    """
+    global _limiter
+    with _limiter_lock:
+        previous = _limiter
+        _limiter = limiter
+    return previous
@@ -1,33 +1,128 @@
+import base64
 import re
-import requests
+import threading
+
+from .cache import LRUMemo, memo
+from .offline import get_offline, miss
+from .transport import Transport, get_transport
 
 
 class School:
     """Represents a school."""
 
-    def __init__(self, school_id: int):
+    # Filled in when the school comes from a search. A school built from its id alone leaves them as None.
+    city = None
+    state = None
+    departments = None
+
+    def __init__(self, school_id: int, transport: Transport = None, name: str = None, lazy: bool = False):
         """
         Initializes a school to the school id.
 
         :param school_id: The school's id.
+        :param transport: The transport to send requests through. Defaults to the shared transport.
+        :param name: The school's name, if it is already known. The school page is only requested when this is None.
+        :param lazy: If true, the school page is not requested until the name is first read.
+                     An invalid id then raises ValueError on that first read instead of here.
         """
 
         self.id = school_id
-        self.name = self._get_name()
+        self._transport = transport
+        self._lock = threading.Lock()
+        if name is not None:
+            self.name = name
+        elif not lazy:
+            self.name = self._get_name()
+
+    def __getattr__(self, name):
+        # Only called while the name has not been set yet.
+        if name != "name":
+            raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, name))
+        with self._lock:
+            if "name" not in self.__dict__:
+                self.name = self._get_name()
+        return self.__dict__["name"]
+
+    @classmethod
+    def _from_search(cls, node: dict, transport: Transport = None):
+        """Gets the school of a School node from a search, filling in the fields the search returned."""
+        school = get_school(int(node["legacyId"]), name=node["name"], transport=transport, lazy=True)
+        school.city = node.get("city")
+        school.state = node.get("state")
+        school.departments = [department["name"] for department in node.get("departments") or []]
+        return school
 
     def _get_name(self):
-        url = "https://www.ratemyprofessors.com/school/%s" % self.id
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36"
-        }
-        page = requests.get(url, headers=headers)
+        transport = self._transport or get_transport()
+        school_name = memo.get((transport, "school", self.id))
+        if school_name is not None:
+            return school_name
+
+        store = get_offline()
+        if store is not None:
+            school_name = store.school_name(self.id)
+            if school_name is not None:
+                return school_name
+            miss("School %s" % self.id)
+
+        page = transport.get("/school/%s" % self.id, kind="school")
         school_names = re.findall(r'"legacyId":%s,"name":"(.*?)"' % self.id, page.text)
         if school_names:
             school_name = str(school_names[0])
         else:
             raise ValueError('Invalid school id or bad request.')
 
+        memo.set((transport, "school", self.id), school_name)
         return school_name
 
     def __eq__(self, other):
         return (self.name, self.id) == (other.name, other.id)
+
+
+# The School objects resolved recently, keyed by the transport they were resolved through and their id, like memo.
+_schools = LRUMemo()
+_schools_lock = threading.Lock()
+
+
+def get_school(school_id: int, name: str = None, transport: Transport = None, lazy: bool = False):
+    """
+    Gets the School with the specified id, reusing the one recently resolved through the same transport if there
+    is one.
+
+    :param school_id: The school's id.
+    :param name: The school's name, if it is already known. The school page is only requested when the school
+                 has not been resolved before and this is None.
+    :param transport: The transport to send requests through. Defaults to the shared transport.
+    :param lazy: If true, a school that is not known yet only requests its page when its name is first read.
+    :return: The school with that id.
+    """
+    key = (transport or get_transport(), school_id)
+    if name is not None:
+        memo.set((key[0], "school", school_id), name)
+
+    school = _schools.get(key)
+    if school is not None:
+        if name is not None and "name" not in school.__dict__:
+            school.name = name
+        return school
+
+    school = School(school_id, transport=transport, name=name, lazy=lazy)
+    with _schools_lock:
+        registered = _schools.get(key)
+        if registered is not None:
+            return registered
+        _schools.set(key, school)
+        return school
+
+
+def parse_school_id(school_id):
+    """
+    Gets a school's numeric id from any of the forms RateMyProfessor and the package's records give it in.
+
+    :param school_id: A base64 GraphQL id, like the one of School-186 in search results, a number, a string of
+                      digits or None.
+    :return: The id as an int, or None if school_id is None.
+    """
+    if isinstance(school_id, str) and not school_id.isdigit():
+        school_id = base64.b64decode(school_id).decode("ascii").rpartition("-")[2]
+    return None if school_id is None else int(school_id)
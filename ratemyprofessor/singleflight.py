@@ -0,0 +1,141 @@
+"""
+Request coalescing.
+
+When several callers ask for the same thing at the same moment, like a burst of lookups of one popular
+professor, only the first one does the work. The others wait for it and get the same result, or the same
+exception, instead of sending duplicate requests. Nothing is kept once the call is done, so this only
+merges calls that overlap in time. Keeping results around afterwards is what memo and the caches are for.
+
+SingleFlight is for threads and AsyncSingleFlight for coroutines. Calls are keyed by what they ask for,
+usually the GraphQL operation and its variables as built by cache_key.
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    """A call in flight, which the callers that join it wait on."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Merges concurrent calls with the same key, across threads, into one."""
+
+    def __init__(self):
+        """Initializes a group with no calls in flight."""
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args, **kwargs):
+        """
+        Calls a function, unless a call with the same key is already in flight, in which case its result is used.
+
+        :param key: What the call asks for. Calls with equal keys have to give the same result.
+        :param function: The function to call.
+        :param args: The function's arguments.
+        :param kwargs: The function's keyword arguments.
+        :return: The function's result, from this call or the one that was in flight.
+        :raises Exception: Whatever the function raised, in every caller that shared the call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        """
+        Counts the calls in flight.
+
+        :return: The number of distinct keys being called right now.
+        """
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """Merges concurrent calls with the same key, across the coroutines of an event loop, into one."""
+
+    def __init__(self):
+        """Initializes a group with no calls in flight."""
+        self.shared = 0
+        self._calls = {}
+
+    async def do(self, key, function, *args, **kwargs):
+        """
+        Awaits a coroutine function, unless a call with the same key is already in flight, in which case its
+        result is used.
+
+        Cancelling one of the callers that joined a call does not cancel the call for the others. If the caller
+        that makes the call is cancelled, one of those waiting on it makes the call again for the rest.
+
+        :param key: What the call asks for. Calls with equal keys have to give the same result.
+        :param function: The coroutine function to call.
+        :param args: The function's arguments.
+        :param kwargs: The function's keyword arguments.
+        :return: The function's result, from this call or the one that was in flight.
+        :raises Exception: Whatever the function raised, in every caller that shared the call.
+        """
+        loop = asyncio.get_running_loop()
+        # Futures belong to one event loop, so calls from different loops are kept apart.
+        key = (loop, key)
+        while key in self._calls:
+            future = self._calls[key]
+            self.shared += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only the caller that made the call was cancelled, so take it over.
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = self._calls[key] = loop.create_future()
+        try:
+            result = await function(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved, so a call nobody joined does not log it a second time.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def in_flight(self):
+        """
+        Counts the calls in flight.
+
+        :return: The number of distinct keys being called right now.
+        """
+        return len(self._calls)
@@ -0,0 +1,281 @@
+"""
+Lazy reader for large snapshot files.
+
+A snapshot is either a JSON document like professors_school_1448_complete.json, an object whose "professors"
+array holds one record per professor (or just that array), or a JSON Lines file like a crawl's
+professors.jsonl. The file is memory-mapped and its professors are decoded one at a time, so even
+snapshots of many schools can be walked in constant memory.
+
+To look professors up by legacyId without reading the whole file, a sidecar index is built next to it the
+first time it is needed, and rebuilt whenever the snapshot changes. The index is an open-addressing hash
+table of fixed-width slots, so it is memory-mapped too and each lookup reads only a slot or two.
+"""
+
+import json
+import mmap
+import os
+import struct
+
+_INDEX_MAGIC = b"RMPIDX1\n"
+_INDEX_HEADER = struct.Struct("<qqqq")  # snapshot size, snapshot mtime_ns, capacity, count
+_SLOT = struct.Struct("<qqq")  # legacyId, offset, length
+_EMPTY = -2 ** 63
+_WHITESPACE = " \t\r\n"
+
+
+class Snapshot:
+    """
+    A memory-mapped snapshot of professor records.
+
+    Iterating walks every record in file order and never needs the sidecar index. Looking a professor up
+    by legacyId, with get, [] or in, and counting the professors go through the index.
+    """
+
+    def __init__(self, path: str, index_path: str = None, chunk_size: int = 1 << 20):
+        """
+        Opens a snapshot.
+
+        :param path: The snapshot file. Files ending in .jsonl are read as JSON Lines, others as a JSON document.
+        :param index_path: The sidecar index file. Defaults to the snapshot's path with .idx added.
+        :param chunk_size: How many bytes are decoded at once while walking a JSON document.
+        """
+        self.path = path
+        self.index_path = index_path if index_path is not None else path + ".idx"
+        self.chunk_size = chunk_size
+        self.lines = path.endswith(".jsonl")
+        self._file = open(path, "rb")
+        # An empty file cannot be mapped.
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._index = None
+
+    def __iter__(self):
+        for _, _, record in self._records():
+            yield record
+
+    def _records(self):
+        """Walks the professors, yielding the offset and length of each one's bytes along with the record."""
+        if self.lines:
+            return self._lines()
+        return self._document()
+
+    def _lines(self):
+        position = 0
+        while True:
+            end = self._map.find(b"\n", position)
+            # A last line without its newline was cut short, like JSON Lines readers elsewhere treat it.
+            if end == -1:
+                return
+            if end > position:
+                yield position, end - position, json.loads(self._map[position:end])
+            position = end + 1
+
+    def _document(self):
+        cursor = _Cursor(self._map, self.chunk_size)
+        character = cursor.peek()
+        if character == "{":
+            cursor.advance()
+            while True:
+                character = cursor.peek()
+                if character == "}" or character is None:
+                    return
+                if character == ",":
+                    cursor.advance()
+                    continue
+                key = cursor.value()
+                if cursor.peek() != ":":
+                    raise ValueError("%s is not a valid snapshot." % self.path)
+                cursor.advance()
+                if key == "professors":
+                    break
+                cursor.value()
+        if cursor.peek() != "[":
+            raise ValueError("%s is not a valid snapshot." % self.path)
+
+        cursor.advance()
+        while True:
+            character = cursor.peek()
+            if character == "]":
+                return
+            if character is None:
+                raise ValueError("%s ends in the middle of its professors." % self.path)
+            if character == ",":
+                cursor.advance()
+                continue
+            start = cursor.position
+            record = cursor.value()
+            yield start, cursor.position - start, record
+
+    def count(self):
+        """
+        Counts the professors through the sidecar index, building the index first if needed.
+
+        :return: The number of distinct legacyIds in the snapshot.
+        """
+        return self._load_index()[2]
+
+    def get(self, legacy_id: int):
+        """
+        Looks a professor up by legacyId through the sidecar index, building the index first if needed.
+
+        If a professor appears more than once, like in a crawl that was synced but not compacted,
+        the last record is the one found.
+
+        :param legacy_id: The professor's legacyId.
+        :return: The professor record, or None if the snapshot has no such professor.
+        """
+        index, capacity, _ = self._load_index()
+        legacy_id = int(legacy_id)
+        slot = _slot(legacy_id, capacity)
+        while True:
+            key, offset, length = _SLOT.unpack_from(index, _INDEX_HEADER.size + len(_INDEX_MAGIC) + slot * _SLOT.size)
+            if key == _EMPTY:
+                return None
+            if key == legacy_id:
+                return json.loads(self._map[offset:offset + length])
+            slot = (slot + 1) & (capacity - 1)
+
+    def __getitem__(self, legacy_id: int):
+        record = self.get(legacy_id)
+        if record is None:
+            raise KeyError(legacy_id)
+        return record
+
+    def __contains__(self, legacy_id: int):
+        return self.get(legacy_id) is not None
+
+    def _load_index(self):
+        if self._index is None:
+            stat = os.stat(self.path)
+            index = _open_index(self.index_path, stat)
+            if index is None:
+                self.build_index()
+                index = _open_index(self.index_path, stat)
+            self._index = index
+        return self._index
+
+    def build_index(self):
+        """Writes the sidecar index, replacing one that is out of date."""
+        if self._index is not None:
+            self._index[0].close()
+            self._index = None
+        stat = os.stat(self.path)
+        entries = {}
+        for offset, length, record in self._records():
+            legacy_id = record.get("legacyId", record.get("id"))
+            if isinstance(legacy_id, int) or isinstance(legacy_id, str) and legacy_id.isdigit():
+                entries[int(legacy_id)] = (offset, length)
+
+        # Keep the table at most half full, so probes stay short.
+        capacity = 1
+        while capacity < 2 * len(entries):
+            capacity *= 2
+        table = bytearray(_SLOT.pack(_EMPTY, 0, 0) * capacity)
+        for legacy_id, (offset, length) in entries.items():
+            slot = _slot(legacy_id, capacity)
+            while _SLOT.unpack_from(table, slot * _SLOT.size)[0] != _EMPTY:
+                slot = (slot + 1) & (capacity - 1)
+            _SLOT.pack_into(table, slot * _SLOT.size, legacy_id, offset, length)
+
+        temporary = self.index_path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(_INDEX_MAGIC)
+            f.write(_INDEX_HEADER.pack(stat.st_size, stat.st_mtime_ns, capacity, len(entries)))
+            f.write(table)
+        os.replace(temporary, self.index_path)
+
+    def close(self):
+        """Unmaps the snapshot and its index."""
+        if self._index is not None:
+            self._index[0].close()
+            self._index = None
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _slot(legacy_id: int, capacity: int):
+    # Fibonacci hashing spreads the mostly consecutive legacyIds over the table.
+    return ((legacy_id * 0x9E3779B97F4A7C15) >> 16) & (capacity - 1)
+
+
+def _open_index(path: str, stat):
+    """Maps a sidecar index, or returns None if it is missing or was built for another version of the snapshot."""
+    try:
+        with open(path, "rb") as f:
+            index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+    if index[:len(_INDEX_MAGIC)] == _INDEX_MAGIC:
+        size, mtime_ns, capacity, count = _INDEX_HEADER.unpack_from(index, len(_INDEX_MAGIC))
+        if size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+            return index, capacity, count
+    index.close()
+    return None
+
+
+class _Cursor:
+    """Decodes a memory-mapped JSON document a chunk at a time, keeping track of the byte position."""
+
+    def __init__(self, data, chunk_size: int):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.position = 0
+        self._decoder = json.JSONDecoder()
+        self._text = ""
+        self._index = 0
+        self._end = 0
+
+    def _fill(self, size: int):
+        """Decodes the next size bytes, or a little less so that no character is split."""
+        end = min(len(self.data), self.position + size)
+        # Back up to the start of a UTF-8 character.
+        while self.position < end < len(self.data) and self.data[end] & 0xC0 == 0x80:
+            end -= 1
+        self._text = self.data[self.position:end].decode("utf-8")
+        self._index = 0
+        self._end = end
+
+    def peek(self):
+        """Skips whitespace and gets the next character, or None at the end of the document."""
+        while True:
+            while self._index < len(self._text) and self._text[self._index] in _WHITESPACE:
+                self._index += 1
+                self.position += 1
+            if self._index < len(self._text):
+                return self._text[self._index]
+            if self._end >= len(self.data):
+                return None
+            self._fill(self.chunk_size)
+
+    def advance(self):
+        """Moves past the next character, which has to be ASCII punctuation."""
+        self.peek()
+        self._index += 1
+        self.position += 1
+
+    def value(self):
+        """Decodes the next JSON value and moves past it."""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._text, self._index)
+            except json.JSONDecodeError:
+                if self._end >= len(self.data):
+                    raise
+            else:
+                # A number at the very end of the chunk may go on in the next one.
+                if end < len(self._text) or self._end >= len(self.data):
+                    self.position += len(self._text[self._index:end].encode("utf-8"))
+                    self._index = end
+                    return value
+            # The value goes on past the decoded chunk, so decode a bigger one from where it starts.
+            size *= 2
+            self._fill(size)
@@ -0,0 +1,450 @@
+"""
+Local store of schools, professors, courses, tags and ratings.
+
+The store is a SQLite database with an index on everything professors and ratings are usually looked up by:
+legacyId, school and department, course name and rating date. Looking up a professor, or every rating of a
+course since some date, is then an indexed read of a local file instead of a scan over a crawl or a snapshot.
+
+The crawler fills the store as it finishes each professor when it is given one, and crawls or snapshots
+that were made before can be added later. Reads give back the library's own Professor, Rating and School
+objects, filled in from the store, so they make no requests.
+"""
+
+import base64
+import datetime
+import os
+import sqlite3
+import threading
+from collections import Counter
+
+from .names import INDEX_MIN_SCORE, NameIndex
+from .professor import Course, Professor, Rating, RatingBatch, _rating_fields, _utc, _would_take_again
+from .school import get_school, parse_school_id
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS schools (id INTEGER PRIMARY KEY, name TEXT, city TEXT, state TEXT)",
+    "CREATE TABLE IF NOT EXISTS professors (id INTEGER PRIMARY KEY, name TEXT, school_id INTEGER, department TEXT, "
+    "rating NUMERIC, difficulty NUMERIC, num_ratings INTEGER, would_take_again NUMERIC, has_ratings INTEGER)",
+    "CREATE INDEX IF NOT EXISTS professors_school ON professors (school_id, department)",
+    "CREATE INDEX IF NOT EXISTS professors_department ON professors (department)",
+    "CREATE TABLE IF NOT EXISTS courses (professor_id INTEGER, name TEXT, count INTEGER, "
+    "PRIMARY KEY (professor_id, name))",
+    "CREATE INDEX IF NOT EXISTS courses_name ON courses (name COLLATE NOCASE)",
+    "CREATE TABLE IF NOT EXISTS tags (professor_id INTEGER, name TEXT, count INTEGER, "
+    "PRIMARY KEY (professor_id, name))",
+    "CREATE INDEX IF NOT EXISTS tags_name ON tags (name COLLATE NOCASE)",
+    # Numbers are NUMERIC so whole ratings come back as ints, like they are in the GraphQL response.
+    "CREATE TABLE IF NOT EXISTS ratings (id TEXT PRIMARY KEY, professor_id INTEGER, class_name TEXT, date TEXT, "
+    "rating NUMERIC, difficulty NUMERIC, comment TEXT, grade TEXT, take_again INTEGER, online_class INTEGER, "
+    "credit INTEGER, attendance_mandatory INTEGER, thumbs_up INTEGER, thumbs_down INTEGER, tags TEXT)",
+    "CREATE INDEX IF NOT EXISTS ratings_professor ON ratings (professor_id, date)",
+    "CREATE INDEX IF NOT EXISTS ratings_class ON ratings (class_name COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS ratings_date ON ratings (date)",
+)
+
+_RATING_COLUMNS = ("rating", "difficulty", "comment", "class_name", "date", "take_again", "grade", "thumbs_up",
+                   "thumbs_down", "online_class", "credit", "attendance_mandatory")
+
+# SQLite limits how many values one statement can take, so long lists of ids are read in chunks.
+_CHUNK = 500
+
+
+class Store:
+    """A SQLite database of schools, professors, courses, tags and ratings. Several threads may share one store."""
+
+    def __init__(self, path: str):
+        """
+        Opens a store, creating the database file if needed.
+
+        :param path: The database file, or ":memory:" for a store that only lasts as long as the process.
+        """
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._connection.execute(statement)
+        self._connection.commit()
+        # Name indexes for searches, built when first searched and dropped when what they index changes.
+        self._school_names = None
+        self._professor_names = {}
+
+    def add(self, professor: dict, ratings=None, school_id: int = None):
+        """
+        Adds a professor, with its school, courses, tags and ratings, replacing what the store had for it.
+
+        Ratings are matched by id, so ratings the store already has and that are not given are kept.
+        This way the few new ratings of a synced professor can be added on their own.
+
+        :param professor: A crawl record of the professor, with its legacyId, or a snapshot record like those
+                          of professors_school_1448_complete.json, with its id.
+        :param ratings: The ratings, as RateMyProfessor sends them. Defaults to the ratings inside the record.
+        :param school_id: The professor's school, for records that do not have it, like snapshot records.
+        """
+        with self._lock:
+            self._add(professor, ratings, school_id)
+            self._connection.commit()
+
+    def add_all(self, professors, school_id: int = None):
+        """
+        Adds many professors at once, in one transaction, like the records of a crawl or a snapshot.
+
+        :param professors: The professor records, each with its ratings if it has any.
+        :param school_id: The school of records that do not have it, like snapshot records.
+        :return: The number of professors added.
+        """
+        count = 0
+        with self._lock:
+            for professor in professors:
+                self._add(professor, None, school_id)
+                count += 1
+            self._connection.commit()
+        return count
+
+    def _add(self, professor: dict, ratings, school_id):
+        school = professor.get("school")
+        if not isinstance(school, dict):
+            school = {"name": school}
+        school_id = parse_school_id(school.get("id", school_id))
+        legacy_id = int(professor["legacyId"] if "legacyId" in professor else professor["id"])
+        name = professor.get("name")
+        if name is None:
+            name = professor["firstName"] + ' ' + professor["lastName"]
+
+        if school_id is not None:
+            self._connection.execute(
+                "INSERT INTO schools (id, name, city, state) VALUES (?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+                "name = coalesce(excluded.name, name), city = coalesce(excluded.city, city), "
+                "state = coalesce(excluded.state, state)",
+                (school_id, school.get("name"), school.get("city"), school.get("state")))
+            self._school_names = None
+        self._professor_names.clear()
+        if ratings is None:
+            ratings = professor.get("ratings")
+        # A professor whose ratings were given once has every rating from then on, since ratings are only added.
+        self._connection.execute(
+            "INSERT INTO professors (id, name, school_id, department, rating, difficulty, num_ratings, "
+            "would_take_again, has_ratings) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+            "name = excluded.name, school_id = excluded.school_id, department = excluded.department, "
+            "rating = excluded.rating, difficulty = excluded.difficulty, num_ratings = excluded.num_ratings, "
+            "would_take_again = excluded.would_take_again, has_ratings = max(has_ratings, excluded.has_ratings)",
+            (legacy_id, name, school_id, professor.get("department"),
+             professor.get("avgRating", professor.get("rating")),
+             professor.get("avgDifficulty", professor.get("difficulty")), professor.get("numRatings", 0),
+             professor.get("wouldTakeAgainPercent"), int(ratings is not None)))
+
+        courses = professor.get("courseCodes")
+        if courses is not None:
+            courses = [(course["courseName"], course["courseCount"]) for course in courses]
+        elif professor.get("courses") is not None:
+            courses = [(course["name"], course.get("count", course.get("review_count")))
+                       for course in professor["courses"]]
+        if courses is not None:
+            self._connection.execute("DELETE FROM courses WHERE professor_id = ?", (legacy_id,))
+            self._connection.executemany("INSERT OR REPLACE INTO courses (professor_id, name, count) VALUES (?, ?, ?)",
+                                         [(legacy_id, name, count) for name, count in courses])
+
+        rows = []
+        for rating in ratings or ():
+            fields = _rating_fields(rating)
+            fields["date"] = fields["date"].isoformat(sep=" ")
+            rows.append((rating["id"], legacy_id, rating.get("ratingTags") or "")
+                        + tuple(fields[column] for column in _RATING_COLUMNS))
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO ratings (id, professor_id, tags, %s) VALUES (?, ?, ?, %s)"
+            % (", ".join(_RATING_COLUMNS), ", ".join("?" * len(_RATING_COLUMNS))), rows)
+
+        tags = professor.get("teacherRatingTags")
+        if tags is not None:
+            tags = [(tag["tagName"], tag["tagCount"]) for tag in tags]
+        elif professor.get("rating_tags", professor.get("tags")) is not None:
+            tags = [(tag["name"], tag["count"]) for tag in professor.get("rating_tags", professor.get("tags"))]
+        else:
+            # Crawl records have no tag counts of their own, so they are counted from all the stored ratings.
+            counts = Counter()
+            for (rating_tags,) in self._connection.execute("SELECT tags FROM ratings WHERE professor_id = ?",
+                                                           (legacy_id,)):
+                counts.update(tag.strip() for tag in rating_tags.split("--") if tag.strip())
+            tags = counts.items()
+        self._connection.execute("DELETE FROM tags WHERE professor_id = ?", (legacy_id,))
+        self._connection.executemany("INSERT OR REPLACE INTO tags (professor_id, name, count) VALUES (?, ?, ?)",
+                                     [(legacy_id, name, count) for name, count in tags])
+
+    def professor(self, professor_id: int):
+        """
+        Gets a professor by legacyId.
+
+        :param professor_id: The professor's legacyId.
+        :return: The Professor, with its courses, or None if the store does not have it.
+        """
+        professors = self._professors(["professors.id = ?"], [professor_id])
+        return professors[0] if professors else None
+
+    def professors(self, school_id: int = None, department: str = None, course: str = None, tag: str = None,
+                   limit: int = None):
+        """
+        Gets the professors that match every filter that is given, in legacyId order.
+
+        :param school_id: If given, only professors of this school.
+        :param department: If given, only professors of this department.
+        :param course: If given, only professors who teach this course. Case does not matter.
+        :param tag: If given, only professors with this tag. Case does not matter.
+        :param limit: The maximum number of professors returned.
+        :return: A list of Professor, with their courses.
+        """
+        conditions, parameters = [], []
+        for condition, value in (("professors.school_id = ?", school_id), ("professors.department = ?", department),
+                                 ("professors.id IN (SELECT professor_id FROM courses "
+                                  "WHERE name = ? COLLATE NOCASE)", course),
+                                 ("professors.id IN (SELECT professor_id FROM tags "
+                                  "WHERE name = ? COLLATE NOCASE)", tag)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        return self._professors(conditions, parameters, limit)
+
+    def _professors(self, conditions: list, parameters: list, limit: int = None):
+        query = "SELECT professors.id, professors.name, professors.department, professors.rating, " \
+                "professors.difficulty, professors.num_ratings, professors.would_take_again, professors.school_id, " \
+                "schools.name FROM professors LEFT JOIN schools ON schools.id = professors.school_id"
+        if conditions:
+            query += " WHERE %s" % " AND ".join(conditions)
+        query += " ORDER BY professors.id"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters = parameters + [limit]
+
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+            courses = {}
+            ids = [row[0] for row in rows]
+            for start in range(0, len(ids), _CHUNK):
+                chunk = ids[start:start + _CHUNK]
+                for professor_id, name, count in self._connection.execute(
+                        "SELECT professor_id, name, count FROM courses WHERE professor_id IN (%s) "
+                        "ORDER BY professor_id, name" % ", ".join("?" * len(chunk)), chunk):
+                    courses.setdefault(professor_id, []).append((name, count))
+
+        professors = []
+        for professor_id, name, department, rating, difficulty, num_ratings, would_take_again, school_id, \
+                school_name in rows:
+            professor = Professor(professor_id, lazy=True)
+            professor.name = name
+            professor.department = department
+            professor.rating = rating
+            professor.difficulty = difficulty
+            professor.num_ratings = num_ratings
+            professor.would_take_again = _would_take_again(would_take_again)
+            professor.school = get_school(school_id, name=school_name, lazy=True) if school_id is not None else None
+            professor.courses = [Course(professor=professor, count=count, name=course_name)
+                                 for course_name, count in courses.get(professor_id, ())]
+            professors.append(professor)
+        return professors
+
+    def ratings(self, professor_id: int = None, school_id: int = None, department: str = None, course: str = None,
+                since: datetime.datetime = None, until: datetime.datetime = None, limit: int = None,
+                raw_comments: bool = False, bulk: bool = False):
+        """
+        Gets the ratings that match every filter that is given, newest first.
+
+        :param professor_id: If given, only the ratings of this professor.
+        :param school_id: If given, only the ratings of professors of this school.
+        :param department: If given, only the ratings of professors of this department.
+        :param course: If given, only the ratings of this course. Case does not matter.
+        :param since: If given, only the ratings made on or after this date. A date without a timezone is taken to
+                      be in UTC, like the rating dates.
+        :param until: If given, only the ratings made before this date, taken the same way.
+        :param limit: The maximum number of ratings returned.
+        :param raw_comments: If true, the comments are left exactly as RateMyProfessor sent them.
+        :param bulk: If true, return a compact RatingBatch instead of a list of Rating objects.
+        :return: A list of Rating, or a RatingBatch.
+        """
+        conditions, parameters = [], []
+        for condition, value in (("ratings.professor_id = ?", professor_id),
+                                 ("professors.school_id = ?", school_id), ("professors.department = ?", department),
+                                 ("ratings.class_name = ? COLLATE NOCASE", course),
+                                 ("ratings.date >= ?", _utc(since).isoformat(sep=" ") if since is not None else None),
+                                 ("ratings.date < ?", _utc(until).isoformat(sep=" ") if until is not None else None)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        fields = self._rating_fields(conditions, parameters, school_id is not None or department is not None, limit)
+        if bulk:
+            return RatingBatch(fields, raw_comments=raw_comments)
+        return [Rating(**rating_fields, raw_comments=raw_comments) for rating_fields in fields]
+
+    def _rating_fields(self, conditions: list, parameters: list, join: bool = False, limit: int = None):
+        """Gets the Rating arguments of the ratings that match the conditions, newest first."""
+        query = "SELECT %s FROM ratings" % ", ".join("ratings.%s" % column for column in _RATING_COLUMNS)
+        if join:
+            query += " JOIN professors ON professors.id = ratings.professor_id"
+        if conditions:
+            query += " WHERE %s" % " AND ".join(conditions)
+        query += " ORDER BY ratings.date DESC, ratings.id"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters = parameters + [limit]
+
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+        return [_stored_rating_fields(row) for row in rows]
+
+    def professor_data(self, professor_id: int):
+        """
+        Gets a professor in the form RateMyProfessor sends it, which is how Professor is filled in offline.
+
+        :param professor_id: The professor's legacyId.
+        :return: The Teacher node, or None if the store does not have the professor or does not know their school,
+                 like a professor added from a snapshot record without a school_id.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT professors.name, professors.department, professors.rating, professors.difficulty, "
+                "professors.num_ratings, professors.would_take_again, professors.school_id, schools.name "
+                "FROM professors LEFT JOIN schools ON schools.id = professors.school_id WHERE professors.id = ?",
+                (professor_id,)).fetchone()
+            if row is None or row[6] is None:
+                return None
+            courses = self._connection.execute("SELECT name, count FROM courses WHERE professor_id = ? "
+                                               "ORDER BY name", (professor_id,)).fetchall()
+
+        name, department, rating, difficulty, num_ratings, would_take_again, school_id, school_name = row
+        first_name, _, last_name = name.partition(" ")
+        return {"firstName": first_name, "lastName": last_name, "department": department, "avgRating": rating,
+                "avgDifficulty": difficulty, "numRatings": num_ratings, "wouldTakeAgainPercent": would_take_again,
+                "school": {"id": base64.b64encode(("School-%s" % school_id).encode("ascii")).decode("ascii"),
+                           "name": school_name},
+                "courseCodes": [{"courseName": course, "courseCount": count} for course, count in courses]}
+
+    def professor_ratings(self, professor_id: int, course_name: str = None):
+        """
+        Gets every rating of a professor, if the store has them.
+
+        :param professor_id: The professor's legacyId.
+        :param course_name: If given, only the ratings for this course name.
+        :return: A list of the Rating arguments of each rating, newest first, or None if the ratings of the
+                 professor were never added to the store.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT has_ratings FROM professors WHERE id = ?",
+                                           (professor_id,)).fetchone()
+        if row is None or not row[0]:
+            return None
+        conditions, parameters = ["ratings.professor_id = ?"], [professor_id]
+        if course_name is not None:
+            conditions.append("ratings.class_name = ?")
+            parameters.append(course_name)
+        return self._rating_fields(conditions, parameters)
+
+    def search_schools(self, school_name: str, limit: int = 20):
+        """
+        Finds the schools whose names are close to a name, like a school search does.
+
+        :param school_name: The school's name.
+        :param limit: The maximum number of schools returned.
+        :return: A list of School, the closest first.
+        """
+        with self._lock:
+            if self._school_names is None:
+                self._school_names = NameIndex()
+                for school_id, name in self._connection.execute("SELECT id, name FROM schools WHERE name IS NOT NULL"):
+                    self._school_names.add(school_id, name)
+            matches = self._school_names.resolve(school_name, limit=limit, min_score=INDEX_MIN_SCORE)
+        return [self.school(match.key) for match in matches]
+
+    def search_professors(self, school_id: int, professor_name: str, limit: int = 20):
+        """
+        Finds the professors of a school whose names are close to a name, like a professor search does.
+
+        :param school_id: The professors' school.
+        :param professor_name: The professor's name.
+        :param limit: The maximum number of professors returned.
+        :return: A list of Professor, with their courses, the closest first.
+        """
+        with self._lock:
+            names = self._professor_names.get(school_id)
+            if names is None:
+                names = self._professor_names[school_id] = NameIndex()
+                for professor_id, name in self._connection.execute("SELECT id, name FROM professors "
+                                                                   "WHERE school_id = ?", (school_id,)):
+                    names.add(professor_id, name)
+            matches = names.resolve(professor_name, limit=limit, min_score=INDEX_MIN_SCORE)
+        if not matches:
+            return []
+        found = {professor.id: professor for professor in
+                 self._professors(["professors.id IN (%s)" % ", ".join("?" * len(matches))],
+                                  [match.key for match in matches])}
+        return [found[match.key] for match in matches]
+
+    def tags(self, professor_id: int):
+        """
+        Gets a professor's tags.
+
+        :param professor_id: The professor's legacyId.
+        :return: A list of (tag, count) tuples, the most common first.
+        """
+        with self._lock:
+            return self._connection.execute("SELECT name, count FROM tags WHERE professor_id = ? "
+                                            "ORDER BY count DESC, name", (professor_id,)).fetchall()
+
+    def school(self, school_id: int):
+        """
+        Gets a school by id.
+
+        :param school_id: The school's id.
+        :return: The School, or None if the store does not have it.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT name, city, state FROM schools WHERE id = ?",
+                                           (school_id,)).fetchone()
+        if row is None:
+            return None
+        school = get_school(school_id, name=row[0], lazy=True)
+        if school.city is None:
+            school.city = row[1]
+        if school.state is None:
+            school.state = row[2]
+        return school
+
+    def school_name(self, school_id: int):
+        """
+        Gets a school's name.
+
+        :param school_id: The school's id.
+        :return: The name, or None if the store does not have it.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT name FROM schools WHERE id = ?", (school_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM professors").fetchone()[0]
+
+    def __contains__(self, professor_id: int):
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM professors WHERE id = ?",
+                                            (professor_id,)).fetchone() is not None
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _stored_rating_fields(row: tuple):
+    """Turns a row of the ratings table back into Rating arguments."""
+    fields = dict(zip(_RATING_COLUMNS, row))
+    fields["date"] = datetime.datetime.fromisoformat(fields["date"])
+    for flag in ("take_again", "online_class", "credit", "attendance_mandatory"):
+        if fields[flag] is not None:
+            fields[flag] = bool(fields[flag])
+    return fields
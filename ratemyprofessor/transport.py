@@ -0,0 +1,240 @@
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cache import cache_key
+from .ratelimit import RETRY_STATUSES, RateLimiter, RetryPolicy, get_limiter, retry_after
+from .singleflight import SingleFlight
+
+BASE_URL = "https://www.ratemyprofessors.com"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) " \
+             "Chrome/87.0.4280.88 Safari/537.36"
+
+
+class Transport:
+    """Owns the keep-alive connection pool that every RateMyProfessor request goes through."""
+
+    def __init__(self, base_url: str = BASE_URL, pool_connections: int = 4, pool_maxsize: int = 10,
+                 pool_block: bool = False, timeout=(5, 30), session: requests.Session = None, cache=None,
+                 limiter: RateLimiter = None, retry: RetryPolicy = None, coalesce: bool = True):
+        """
+        Initializes a transport.
+
+        Connections are kept alive and reused between requests, so repeated lookups only pay for the
+        TCP and TLS handshakes once per pooled connection.
+
+        :param base_url: The site root that relative paths are resolved against.
+                         Point this at a local server to run against a fake RateMyProfessor.
+        :param pool_connections: The number of hosts to keep a connection pool for.
+        :param pool_maxsize: The maximum number of connections kept open per host.
+        :param pool_block: If true, never open more than pool_maxsize connections to one host
+                           and make extra requests wait for a free connection instead.
+        :param timeout: The connect and read timeout in seconds, either a number or a (connect, read) tuple.
+        :param session: An existing requests session to use instead of creating a new one.
+        :param cache: A response cache, such as a SQLiteCache, or None to always go to the network.
+                      Any object with the get, set and touch methods of SQLiteCache can be used.
+        :param limiter: The rate limiter requests wait on. Defaults to the limiter shared by the whole process.
+        :param retry: When to retry requests that fail or are throttled. Defaults to RetryPolicy().
+        :param coalesce: If true, identical requests sent while one is already in flight share its response
+                         instead of going to the network again.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cache = cache
+        self.limiter = limiter
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.flights = SingleFlight() if coalesce else None
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        self.session = session if session is not None else requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, path: str):
+        """
+        Returns the absolute url for a path on the site.
+
+        :param path: A path such as "/graphql", or an absolute url which is returned unchanged.
+        :return: The absolute url.
+        """
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return self.base_url + path
+
+    def get(self, path: str, headers: dict = None, params: dict = None, kind: str = None):
+        """
+        Sends a GET request through the connection pool.
+
+        :param path: The path or url to request.
+        :param headers: Extra headers for this request.
+        :param params: Query string parameters for this request.
+        :param kind: The kind of data requested, such as "school" or "search", which decides how long the
+                     response is cached. Requests without a kind are never cached.
+        :return: The requests response, or a CachedResponse.
+        """
+        return self._send("GET", self.url(path), headers=headers, params=params, kind=kind)
+
+    def post(self, path: str, json: dict = None, headers: dict = None, kind: str = None):
+        """
+        Sends a POST request with a JSON body through the connection pool.
+
+        :param path: The path or url to request.
+        :param json: The JSON body to send.
+        :param headers: Extra headers for this request.
+        :param kind: The kind of data requested, such as "professor" or "ratings", which decides how long the
+                     response is cached. Requests without a kind are never cached.
+        :return: The requests response, or a CachedResponse.
+        """
+        return self._send("POST", self.url(path), headers=headers, json=json, kind=kind)
+
+    def _send(self, method: str, url: str, headers: dict = None, params: dict = None, json: dict = None,
+              kind: str = None):
+        key = cache_key(method, url, params, json)
+        if self.cache is None or kind is None:
+            return self._coalesce(key, self._request, method, url, headers=headers, params=params, json=json)
+
+        entry = self.cache.get(key)
+        if entry is None:
+            return self._coalesce(key, self._fetch, key, kind, method, url, headers, params, json)
+
+        if not entry.fresh:
+            # Serve the stale response now and refresh it for the next caller.
+            with self._refreshing_lock:
+                refresh = key not in self._refreshing
+                self._refreshing.add(key)
+            if refresh:
+                threading.Thread(target=self._refresh, args=(key, kind, method, url, headers, params, json, entry),
+                                 daemon=True).start()
+        return entry.response
+
+    def _coalesce(self, key, function, *args, **kwargs):
+        """Calls function, or joins the identical request that is already in flight."""
+        if self.flights is None:
+            return function(*args, **kwargs)
+        return self.flights.do(key, function, *args, **kwargs)
+
+    def _fetch(self, key, kind, method, url, headers, params, json, entry=None):
+        """Sends a request and caches a usable response, revalidating entry if there is one."""
+        if entry is not None:
+            conditional = {}
+            if "ETag" in entry.response.headers:
+                conditional["If-None-Match"] = entry.response.headers["ETag"]
+            if "Last-Modified" in entry.response.headers:
+                conditional["If-Modified-Since"] = entry.response.headers["Last-Modified"]
+            headers = dict(headers or {}, **conditional)
+
+        response = self._request(method, url, headers=headers, params=params, json=json)
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(key, kind)
+            return entry.response
+        if _cacheable(response):
+            self.cache.set(key, kind, response)
+        return response
+
+    def _request(self, method: str, url: str, **kwargs):
+        """Sends a request once its endpoint's rate limit allows it, retrying failures and throttled responses."""
+        bucket = (self.limiter or get_limiter()).bucket(url)
+        attempt = 0
+        while True:
+            if bucket is not None:
+                _sleep(bucket.reserve())
+
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retry.retries:
+                    raise
+                _sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code not in RETRY_STATUSES:
+                if bucket is not None:
+                    bucket.on_success()
+                return response
+
+            wait = retry_after(response)
+            if bucket is not None:
+                bucket.on_throttle(self.retry.throttle(wait))
+            if self.retry.gives_up(attempt, wait):
+                return response
+            _sleep(self.retry.delay(attempt, wait))
+            attempt += 1
+
+    def _refresh(self, key, kind, method, url, headers, params, json, entry):
+        try:
+            self._fetch(key, kind, method, url, headers, params, json, entry)
+        except requests.RequestException:
+            pass
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.discard(key)
+
+    def close(self):
+        """Closes every pooled connection."""
+        self.session.close()
+
+
+def _cacheable(response):
+    """
+    Tells whether a response can be cached.
+
+    GraphQL answers 200 to queries that failed, with their errors, and to ids it has no node for, with null.
+    Both may only last a moment, like an error on the site's side or a professor that was just added,
+    so only responses with every node they asked for are kept.
+    """
+    if response.status_code != 200:
+        return False
+    if not response.text.lstrip().startswith("{"):
+        return True
+    try:
+        body = json.loads(response.text)
+    except ValueError:
+        return False
+    data = body.get("data")
+    return not body.get("errors") and isinstance(data, dict) and None not in data.values()
+
+
+def _sleep(seconds: float):
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    Gets the transport shared by the whole process, creating it on first use.
+
+    :return: The shared transport.
+    """
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = Transport()
+    return _transport
+
+
+def set_transport(transport: Transport):
+    """
+    Replaces the transport shared by the whole process.
+
+    Every School, Professor and search function that is not given its own transport uses this one.
+
+    :param transport: The transport to use, or None to go back to a default transport on next use.
+    :return: The transport that was previously in use, if any.
+    """
+    global _transport
+    with _transport_lock:
+        previous = _transport
+        _transport = transport
+    return previous
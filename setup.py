@@ -32,6 +32,14 @@ setup(
     python_requires='>=3.12',
     include_package_data=True,
     install_requires=requirements,
+    extras_require={
+        'aio': ['aiohttp'],
+        'arrow': ['pyarrow'],
+        'analytics': ['numpy'],
+    },
+    entry_points={
+        'console_scripts': ['ratemyprofessor-crawl=ratemyprofessor.crawl:main'],
+    },
     project_urls={
         'Issue Tracker': 'https://github.com/sejager/RateMyProfessorAPI/issues',
     }
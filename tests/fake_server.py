@@ -0,0 +1,258 @@
+"""
+A small in-process stand-in for the RateMyProfessor site, used by the offline tests.
+
+It serves the HTML pages and GraphQL queries the package sends, from plain dicts of schools,
+teachers and ratings, and records every request it receives. FakeServerTestCase runs each test
+against a fresh one.
+"""
+
+import base64
+import json
+import re
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import ratemyprofessor
+from ratemyprofessor import school as school_module
+from ratemyprofessor.ratelimit import RateLimiter
+
+
+def encode_id(kind, legacy_id):
+    return base64.b64encode(("%s-%s" % (kind, legacy_id)).encode('ascii')).decode('ascii')
+
+
+def decode_id(node_id):
+    kind, legacy_id = base64.b64decode(node_id.encode('ascii')).decode('ascii').split('-', 1)
+    return kind, int(legacy_id)
+
+
+class FakeRateMyProfessor:
+    def __init__(self):
+        self.schools = {}
+        self.teachers = {}
+        self.ratings = {}
+        self.requests = []
+        # (status, Retry-After) answers for the next requests, before they are served normally again.
+        self.failures = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    def add_school(self, legacy_id, name, city="", state="", departments=()):
+        self.schools[legacy_id] = {"legacyId": legacy_id, "name": name, "city": city, "state": state,
+                                   "departments": list(departments)}
+
+    def add_teacher(self, legacy_id, school_id, first_name, last_name, department="", rating=0, difficulty=0,
+                    would_take_again=-1, courses=None):
+        self.teachers[legacy_id] = {
+            "legacyId": legacy_id, "schoolId": school_id, "firstName": first_name, "lastName": last_name,
+            "department": department, "avgRating": rating, "avgDifficulty": difficulty,
+            "wouldTakeAgainPercent": would_take_again, "courses": courses or {}
+        }
+        self.ratings.setdefault(legacy_id, [])
+
+    def add_rating(self, teacher_id, rating_id, date, comment="", class_name="", rating=5, difficulty=3):
+        self.ratings[teacher_id].append({
+            "id": encode_id("Rating", rating_id), "legacyId": rating_id, "comment": comment, "date": date,
+            "class": class_name, "helpfulRating": rating, "difficultyRating": difficulty,
+            "attendanceMandatory": "non mandatory", "wouldTakeAgain": 1, "grade": "A", "isForOnlineClass": False,
+            "isForCredit": True, "ratingTags": "", "thumbsUpTotal": 0, "thumbsDownTotal": 0, "textbookUse": 0
+        })
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._record("GET", self.path, None)
+                if not self._fail():
+                    status, body, content_type = fake.handle_get(self.path)
+                    self._reply(status, body, content_type)
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fake._record("POST", self.path, payload)
+                if not self._fail():
+                    status, body = fake.handle_graphql(payload)
+                    self._reply(status, json.dumps(body), "application/json")
+
+            def _fail(self):
+                with fake._lock:
+                    failure = fake.failures.pop(0) if fake.failures else None
+                if failure is not None:
+                    status, retry_after = failure
+                    self._reply(status, "Try again later", "text/plain",
+                                {"Retry-After": str(retry_after)} if retry_after is not None else {})
+                return failure is not None
+
+            def _reply(self, status, body, content_type, headers=None):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%s" % self._server.server_address[1]
+
+    def _record(self, method, path, payload):
+        with self._lock:
+            self.requests.append((method, path, payload))
+
+    def count(self, method=None, path=None):
+        return len([r for r in self.requests
+                    if (method is None or r[0] == method) and (path is None or r[1].startswith(path))])
+
+    # HTML pages
+
+    def school_record(self, school):
+        return {"__typename": "School", "id": encode_id("School", school["legacyId"]),
+                "legacyId": school["legacyId"], "name": school["name"], "city": school["city"],
+                "state": school["state"]}
+
+    def page(self, records):
+        store = ",".join('"%s":%s' % (r["id"], json.dumps(r, separators=(',', ':'))) for r in records)
+        return "<html><script>window.__RELAY_STORE__ = {%s};</script></html>" % store
+
+    def handle_get(self, path):
+        url = urlparse(path)
+
+        match = re.fullmatch(r"/school/(\d+)", url.path)
+        if match:
+            school = self.schools.get(int(match.group(1)))
+            records = [self.school_record(school)] if school else []
+            return 200, self.page(records), "text/html"
+
+        return 404, "Not Found", "text/html"
+
+    # GraphQL
+
+    def connection(self, nodes, variables):
+        start = int(variables["cursor"]) if variables.get("cursor") else 0
+        count = variables.get("count") or len(nodes)
+        page = nodes[start:start + count]
+        return {
+            "edges": [{"cursor": str(start + i + 1), "node": node} for i, node in enumerate(page)],
+            "pageInfo": {"hasNextPage": start + len(page) < len(nodes), "endCursor": str(start + len(page))}
+        }
+
+    def school_node(self, school):
+        return {"id": encode_id("School", school["legacyId"]), "legacyId": school["legacyId"],
+                "name": school["name"], "city": school["city"], "state": school["state"],
+                "departments": [{"id": encode_id("Department", i), "name": name}
+                                for i, name in enumerate(school["departments"])]}
+
+    def teacher_search_node(self, teacher):
+        school = self.schools[teacher["schoolId"]]
+        return {"id": encode_id("Teacher", teacher["legacyId"]), "legacyId": teacher["legacyId"],
+                "firstName": teacher["firstName"], "lastName": teacher["lastName"],
+                "department": teacher["department"], "school": {"name": school["name"],
+                                                                "id": encode_id("School", school["legacyId"])},
+                "avgRating": teacher["avgRating"], "numRatings": len(self.ratings[teacher["legacyId"]]),
+                "avgDifficulty": teacher["avgDifficulty"], "wouldTakeAgainPercent": teacher["wouldTakeAgainPercent"]}
+
+    def teacher_node(self, teacher, variables):
+        # Newest first, like the real site.
+        ratings = sorted(self.ratings[teacher["legacyId"]], key=lambda r: r["date"], reverse=True)
+        course_filter = variables.get("courseFilter")
+        if course_filter is not None:
+            ratings = [r for r in ratings if r["class"] == course_filter]
+        start = int(variables["cursor"]) if variables.get("cursor") else 0
+        count = variables.get("count", len(ratings))
+        page = ratings[start:start + count]
+        school = self.schools[teacher["schoolId"]]
+        return {
+            "__typename": "Teacher", "id": encode_id("Teacher", teacher["legacyId"]),
+            "legacyId": teacher["legacyId"], "firstName": teacher["firstName"], "lastName": teacher["lastName"],
+            "department": teacher["department"], "avgRating": teacher["avgRating"],
+            "avgDifficulty": teacher["avgDifficulty"], "numRatings": len(self.ratings[teacher["legacyId"]]),
+            "wouldTakeAgainPercent": teacher["wouldTakeAgainPercent"],
+            "school": {"id": encode_id("School", school["legacyId"]), "name": school["name"]},
+            "courseCodes": [{"courseName": name, "courseCount": count}
+                            for name, count in teacher["courses"].items()],
+            "ratings": {
+                "edges": [{"cursor": str(start + i + 1), "node": r} for i, r in enumerate(page)],
+                "pageInfo": {"hasNextPage": start + len(page) < len(ratings), "endCursor": str(start + len(page))}
+            }
+        }
+
+    def node(self, node_id, variables):
+        kind, legacy_id = decode_id(node_id)
+        if kind == "Teacher" and legacy_id in self.teachers:
+            return self.teacher_node(self.teachers[legacy_id], variables)
+        return None
+
+    def handle_graphql(self, payload):
+        query = payload["query"]
+        variables = payload.get("variables") or {}
+
+        aliases = re.findall(r"(\w+): node\(id: \$(\w+)\)", query)
+        if aliases:
+            return 200, {"data": {alias: self.node(variables[name], {}) for alias, name in aliases}}
+
+        if "schools(query: $query" in query:
+            text = variables["query"].get("text", "").lower()
+            nodes = [self.school_node(s) for s in self.schools.values() if text in s["name"].lower()]
+            return 200, {"data": {"newSearch": {"schools": self.connection(nodes, variables)}}}
+
+        if "teachers(query: $query" in query:
+            text = variables["query"].get("text", "").lower()
+            _, school_id = decode_id(variables["query"]["schoolID"])
+            teachers = [t for t in self.teachers.values() if t["schoolId"] == school_id]
+            matches = [t for t in teachers if text in ("%s %s" % (t["firstName"], t["lastName"])).lower()]
+            # Like the real site, fall back to other professors at the school when nothing matches.
+            connection = self.connection([self.teacher_search_node(t) for t in matches or teachers], variables)
+            connection["didFallback"] = not matches
+            return 200, {"data": {"search": {"teachers": connection}}}
+
+        if "$id" in query:
+            node = self.node(variables["id"], variables)
+            if node is not None and "ratings(" not in query:
+                del node["ratings"]
+            return 200, {"data": {"node": node}}
+
+        return 400, {"errors": [{"message": "Unsupported query"}]}
+
+
+def reset_package():
+    """Forgets the schools and lookups that earlier tests left in the package's process-wide state."""
+    school_module._schools.cache_clear()
+    ratemyprofessor.memo.cache_clear()
+
+
+class FakeServerTestCase(unittest.TestCase):
+    """
+    Runs each test against a fresh FakeRateMyProfessor, with the package's process-wide state reset.
+
+    The server starts out empty, so tests add their schools, teachers and ratings after calling setUp.
+    self.transport sends to it, without rate limiting, and is the shared transport while the test runs.
+    """
+
+    def setUp(self):
+        reset_package()
+        self.server = FakeRateMyProfessor().start()
+        self.addCleanup(self.server.stop)
+        self.transport = self.make_transport()
+        self.addCleanup(self.transport.close)
+        self.addCleanup(ratemyprofessor.set_transport, ratemyprofessor.set_transport(self.transport))
+
+    def make_transport(self):
+        """Builds the transport the test sends its requests through."""
+        return ratemyprofessor.Transport(base_url=self.server.url, limiter=RateLimiter())
@@ -0,0 +1,122 @@
+import asyncio
+import unittest
+
+import ratemyprofessor
+from ratemyprofessor import School, Professor, Store, aio
+from ratemyprofessor import school as school_module
+from ratemyprofessor.ratelimit import RateLimiter
+
+from fake_server import FakeServerTestCase
+
+
+class AsyncTest(FakeServerTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server.add_school(186, "Case Western Reserve University", "Cleveland", "OH")
+        self.server.add_teacher(1658282, 186, "Harold", "Connamacher", "Computer Science", 4.5, 3.2, 80,
+                                courses={"CSDS132": 2, "CSDS233": 1})
+        self.server.add_rating(1658282, 1, "2024-01-02 10:00:00 +0000 UTC", "Great!", "CSDS132")
+        self.server.add_rating(1658282, 2, "2023-05-06 10:00:00 +0000 UTC", "Hard but fair", "CSDS233")
+        for legacy_id in range(100, 110):
+            self.server.add_teacher(legacy_id, 186, "Prof", str(legacy_id))
+        self.async_transport = aio.AsyncTransport(base_url=self.server.url, max_concurrency=4,
+                                                  limiter=RateLimiter())
+        self.previous = aio.set_transport(self.async_transport)
+
+    async def asyncTearDown(self):
+        aio.set_transport(self.previous)
+        await self.async_transport.close()
+
+    async def test_search(self):
+        school = await aio.get_school_by_name("Case Western")
+        self.assertEqual(186, school.id)
+        self.assertEqual("Case Western Reserve University", school.name)
+
+        professor = await aio.get_professor_by_school_and_name(school, "Harold Connamacher")
+        self.assertEqual("Harold Connamacher", professor.name)
+        self.assertEqual(2, self.server.count("POST"))
+
+        self.assertEqual([school], [school async for school in aio.iter_schools("case western", page_size=1)])
+
+    async def test_professors_and_ratings(self):
+        professor = await aio.get_professor(1658282)
+        self.assertEqual(["CSDS132", "CSDS233"], [course.name for course in professor.courses])
+        self.assertIs(professor.school, school_module.get_school(186, transport=self.async_transport._stand_in))
+
+        ratings = await aio.get_ratings(professor)
+        self.assertEqual(["Great!", "Hard but fair"], [rating.comment for rating in ratings])
+        self.assertEqual(1, len(await aio.get_ratings(professor, "CSDS233")))
+
+        comments = [rating.comment async for rating in aio.iter_ratings(professor, page_size=1)]
+        self.assertEqual(["Great!", "Hard but fair"], comments)
+
+        with self.assertRaises(ValueError):
+            await aio.get_professor(1)
+
+    async def test_concurrent_lookups(self):
+        professors = await asyncio.gather(*(aio.get_professor(legacy_id) for legacy_id in range(100, 110)))
+        self.assertEqual(["Prof %s" % legacy_id for legacy_id in range(100, 110)], [p.name for p in professors])
+
+        professors = await aio.get_professors(list(range(100, 110)), chunk_size=3)
+        self.assertEqual(list(range(100, 110)), [professor.id for professor in professors])
+
+    async def test_lazy_search_results_load_asynchronously(self):
+        professors = await aio.get_professors_by_school_and_name(School(186, name="Case Western Reserve University"),
+                                                                 "Connamacher")
+        self.assertIsInstance(professors[0], Professor)
+        # Reading what the search did not return would block the event loop, so it has to be loaded first.
+        with self.assertRaises(ValueError):
+            professors[0].courses
+        self.assertEqual(1, self.server.count("POST"))
+        await aio.load_professor(professors[0])
+        self.assertEqual(2, self.server.count("POST"))
+        self.assertEqual(2, len(professors[0].courses))
+
+    async def test_coalescing(self):
+        professors = await asyncio.gather(*(aio.get_professor(1658282) for _ in range(5)))
+        self.assertEqual(["Harold Connamacher"] * 5, [professor.name for professor in professors])
+        ratings = await asyncio.gather(*(aio.get_ratings(professors[0]) for _ in range(5)))
+        self.assertEqual([2] * 5, [len(found) for found in ratings])
+        # One request for the professor and one for the ratings.
+        self.assertEqual(2, self.server.count("POST"))
+
+    async def test_offline(self):
+        store = Store(":memory:")
+        store.add({"legacyId": 1658282, "firstName": "Harold", "lastName": "Connamacher", "numRatings": 2,
+                   "department": "Computer Science", "school": {"id": 186, "name": "Case Western Reserve University"},
+                   "courseCodes": [{"courseName": "CSDS132", "courseCount": 1}]}, self.server.ratings[1658282])
+        ratemyprofessor.set_offline(store, fallback=False)
+        try:
+            school = await aio.get_school_by_name("Case Western")
+            professor = await aio.get_professor_by_school_and_name(school, "Harold Connamacher")
+            ratings = await aio.get_ratings(professor)
+            self.assertEqual(["Great!", "Hard but fair"], [rating.comment for rating in ratings])
+            self.assertEqual([1658282], [professor.id for professor in await aio.get_professors([1658282, 100])])
+            with self.assertRaises(ValueError):
+                await aio.get_professor(100)
+        finally:
+            ratemyprofessor.set_offline(None)
+            store.close()
+        self.assertEqual(0, self.server.count())
+
+
+class EventLoopTest(FakeServerTestCase):
+    def test_new_loop_closes_old_session(self):
+        self.server.add_school(186, "Case Western Reserve University")
+        transport = aio.AsyncTransport(base_url=self.server.url, limiter=RateLimiter())
+        sessions = []
+
+        async def fetch():
+            await transport.get("/school/186")
+            sessions.append(transport._session)
+
+        asyncio.run(fetch())
+        asyncio.run(fetch())
+        self.assertEqual([True, False], [session.closed for session in sessions])
+        asyncio.run(transport.close())
+        self.assertTrue(sessions[1].closed)
+        self.assertEqual(2, self.server.count("GET"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+from ratemyprofessor import analytics
+from ratemyprofessor.analytics import ProfessorColumns, department_statistics, department_stats
+from ratemyprofessor.snapshot import Snapshot
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+class AnalyticsTest(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(ROOT, "professors_school_1448_complete.json"), encoding="utf-8") as f:
+            self.professors = json.load(f)["professors"]
+
+    def assertStatisticsEqual(self, expected, actual):
+        self.assertEqual(list(expected), list(actual))
+        for name, department in expected.items():
+            for key, value in department.items():
+                if isinstance(value, float):
+                    self.assertAlmostEqual(value, actual[name][key], places=9, msg="%s %s" % (name, key))
+                else:
+                    self.assertEqual(value, actual[name][key], "%s %s" % (name, key))
+
+    def check_saved_statistics(self):
+        with open(os.path.join(ROOT, "department_statistics.json"), encoding="utf-8") as f:
+            expected = json.load(f)
+        with Snapshot(os.path.join(ROOT, "professors_school_1448_complete.json")) as snapshot:
+            actual = department_statistics(snapshot)
+
+        self.assertEqual(expected["total_professors"], actual["total_professors"])
+        self.assertEqual(expected["total_departments"], actual["total_departments"])
+        self.assertStatisticsEqual(expected["department_stats"], actual["department_stats"])
+
+    def test_saved_statistics(self):
+        self.check_saved_statistics()
+
+    def test_saved_statistics_without_numpy(self):
+        with mock.patch.object(analytics, "numpy", None):
+            self.check_saved_statistics()
+
+    def test_extended(self):
+        professors = [
+            {"department": "Biology", "rating": 4.0, "numRatings": 10, "difficulty": 2.0, "wouldTakeAgainPercent": 80},
+            {"department": "Biology", "rating": 2.0, "numRatings": 30, "difficulty": 4.0, "wouldTakeAgainPercent": 20},
+            {"department": "Biology", "rating": 5.0, "numRatings": 0, "difficulty": 0, "wouldTakeAgainPercent": -1},
+            {"department": "Biology", "rating": 3.0, "numRatings": 20, "difficulty": 3.0, "wouldTakeAgainPercent": 0},
+            {"department": "Unknown", "rating": 5.0, "numRatings": 1},
+        ]
+        for numpy in (analytics.numpy, None):
+            with mock.patch.object(analytics, "numpy", numpy):
+                stats = department_stats(ProfessorColumns.from_records(professors), extended=True,
+                                         percentiles=(0, 25, 50, 100))["Biology"]
+                self.assertEqual(4, stats["total_professors"])
+                self.assertEqual(3, stats["rated_professors"])
+                self.assertAlmostEqual(3.0, stats["avg_rating"])
+                self.assertAlmostEqual(50.0, stats["avg_would_take_again"])
+                self.assertAlmostEqual((40 + 60 + 60) / 60, stats["weighted_rating"])
+                self.assertEqual({"0": 2.0, "25": 2.5, "50": 3.0, "100": 4.0}, stats["rating_percentiles"])
+                self.assertEqual(1, stats["top_prof"])
+                self.assertEqual(1, stats["most_reviewed"])
+
+
+if __name__ == '__main__':
+    unittest.main()
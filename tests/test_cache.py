@@ -0,0 +1,93 @@
+import time
+import unittest
+
+import ratemyprofessor
+from ratemyprofessor import School, Professor, SQLiteCache, Transport
+from ratemyprofessor import school as school_module
+from ratemyprofessor.cache import LRUMemo, cache_key
+from ratemyprofessor.ratelimit import RateLimiter
+
+from fake_server import FakeServerTestCase
+
+
+class CacheTest(FakeServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server.add_school(186, "Case Western Reserve University", "Cleveland", "OH")
+        self.server.add_teacher(1658282, 186, "Harold", "Connamacher", "Computer Science", 4.5, 3.2, 80,
+                                courses={"CSDS132": 2})
+        self.server.add_rating(1658282, 1, "2024-01-02 10:00:00 +0000 UTC", "Great!", "CSDS132")
+
+    def make_transport(self):
+        self.cache = SQLiteCache(":memory:")
+        self.addCleanup(self.cache.close)
+        return Transport(base_url=self.server.url, cache=self.cache, limiter=RateLimiter())
+
+    def test_repeated_requests_are_cached(self):
+        self.assertEqual("Case Western Reserve University", School(186).name)
+        school_module._schools.cache_clear()
+        ratemyprofessor.memo.cache_clear()
+        self.assertEqual("Case Western Reserve University", School(186).name)
+        self.assertEqual(1, self.server.count("GET", "/school/"))
+
+        self.assertEqual(["Great!"], [rating.comment for rating in Professor(1658282).get_ratings()])
+        ratemyprofessor.memo.cache_clear()
+        self.assertEqual(["Great!"], [rating.comment for rating in Professor(1658282).get_ratings()])
+        self.assertEqual(2, self.server.count("POST", "/graphql"))
+
+    def test_errors_are_not_cached(self):
+        for _ in range(2):
+            self.assertEqual(400, self.transport.post("/graphql", json={"query": "bad"}, kind="professor").status_code)
+        self.assertEqual(2, self.server.count("POST", "/graphql"))
+        self.assertEqual(0, len(self.cache))
+
+    def test_missing_nodes_are_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                Professor(2)
+        self.assertEqual(2, self.server.count("POST", "/graphql"))
+        self.assertEqual(0, len(self.cache))
+
+    def test_stale_while_revalidate(self):
+        self.cache.ttls["school"] = 0.05
+        School(186)
+        time.sleep(0.1)
+        self.server.schools[186]["name"] = "CWRU"
+
+        school_module._schools.cache_clear()
+        ratemyprofessor.memo.cache_clear()
+        self.assertEqual("Case Western Reserve University", School(186).name)
+        for _ in range(100):
+            if self.server.count("GET", "/school/") == 2 and self.transport._refreshing == set():
+                break
+            time.sleep(0.01)
+
+        school_module._schools.cache_clear()
+        ratemyprofessor.memo.cache_clear()
+        self.assertEqual("CWRU", School(186).name)
+        self.assertEqual(2, self.server.count("GET", "/school/"))
+
+    def test_eviction(self):
+        cache = SQLiteCache(":memory:", max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, "school", self.transport.session.get(self.server.url + "/school/186"))
+            time.sleep(0.01)
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get("a"))
+        cache.close()
+
+    def test_memo_expires(self):
+        memo = LRUMemo(ttl=0.05)
+        memo.set("key", "value")
+        self.assertEqual("value", memo.get("key"))
+        time.sleep(0.1)
+        self.assertIsNone(memo.get("key"))
+        self.assertEqual((1, 1, 0), (memo.cache_info().hits, memo.cache_info().misses, memo.cache_info().currsize))
+
+    def test_key_ignores_query_formatting(self):
+        self.assertEqual(cache_key("POST", "/graphql", body={"query": "query {\n  node }", "variables": {"a": 1}}),
+                         cache_key("POST", "/graphql", body={"variables": {"a": 1}, "query": "query { node }"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
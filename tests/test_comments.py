@@ -0,0 +1,35 @@
+import datetime
+import json
+import os
+import unittest
+
+from ratemyprofessor.professor import Rating, clean_comment
+
+
+class CommentTest(unittest.TestCase):
+    def test_recorded_corpus(self):
+        # Each entry pairs a comment as RateMyProfessor sent it with the text BeautifulSoup(comment, "lxml").text gave.
+        with open(os.path.join(os.path.dirname(__file__), "comments.json"), 'r', encoding='utf-8') as f:
+            corpus = json.load(f)
+
+        for entry in corpus:
+            self.assertEqual(entry["text"], clean_comment(entry["raw"]), entry["raw"])
+
+    def test_raw_and_lazy_comments(self):
+        date = datetime.datetime(2024, 1, 1)
+        rating = Rating(5, 3, "  Q&amp;A<br>sessions", "CS101", date)
+        self.assertIsNone(rating._comment)
+        self.assertEqual("Q&Asessions", rating.comment)
+        self.assertEqual("  Q&amp;A<br>sessions", rating.raw_comment)
+
+        raw = Rating(5, 3, "  Q&amp;A<br>sessions", "CS101", date, raw_comments=True)
+        self.assertEqual("  Q&amp;A<br>sessions", raw.comment)
+
+    def test_aware_date(self):
+        eastern = datetime.timezone(datetime.timedelta(hours=-5))
+        rating = Rating(5, 3, "", "CS101", datetime.datetime(2024, 1, 1, 7, tzinfo=eastern))
+        self.assertEqual(datetime.datetime(2024, 1, 1, 12), rating.date)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from ratemyprofessor import Transport
+from ratemyprofessor.crawl import Crawler, main
+from ratemyprofessor.fulltext import CommentIndex
+from ratemyprofessor.ratelimit import RateLimiter
+
+from fake_server import FakeServerTestCase
+
+
+class FlakyTransport(Transport):
+    """Fails every POST after the first few, like a connection that drops in the middle of a crawl."""
+
+    def __init__(self, base_url, posts):
+        super().__init__(base_url, limiter=RateLimiter())
+        self.posts = posts
+
+    def post(self, *args, **kwargs):
+        if self.posts == 0:
+            raise ConnectionError("Connection dropped.")
+        self.posts -= 1
+        return super().post(*args, **kwargs)
+
+
+class CrawlTest(FakeServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server.add_school(186, "Case Western Reserve University")
+        self.server.add_teacher(1658282, 186, "Harold", "Connamacher", "Computer Science", courses={"CSDS132": 3})
+        for rating_id in range(1, 6):
+            self.server.add_rating(1658282, rating_id, "2024-01-0%s 10:00:00 +0000 UTC" % rating_id, str(rating_id))
+        for legacy_id in range(100, 105):
+            self.server.add_teacher(legacy_id, 186, "Prof", str(legacy_id))
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def read(self, professor_id):
+        crawler = Crawler(self.directory.name)
+        return next(record for record in crawler.professors(186) if record["legacyId"] == professor_id)
+
+    def test_crawl(self):
+        crawler = Crawler(self.directory.name, concurrency=4, page_size=2, transport=self.transport)
+        self.assertEqual([], crawler.crawl([186]))
+
+        professor = self.read(1658282)
+        self.assertEqual(["5", "4", "3", "2", "1"], [rating["comment"] for rating in professor["ratings"]])
+        self.assertEqual([{"courseName": "CSDS132", "courseCount": 3}], professor["courseCodes"])
+        self.assertEqual([], self.read(100)["ratings"])
+        # 3 search pages, 6 professors and 3 pages of ratings.
+        self.assertEqual(12, self.server.count("POST", "/graphql"))
+
+        self.server.requests.clear()
+        self.assertEqual([], crawler.crawl([186]))
+        self.assertEqual(0, self.server.count())
+
+    def test_resume(self):
+        flaky = FlakyTransport(self.server.url, posts=5)
+        failed = Crawler(self.directory.name, concurrency=1, page_size=2, transport=flaky).crawl([186])
+        self.assertEqual(6, len(failed))
+        flaky.close()
+
+        # The search and the first page of ratings were checkpointed, so they are not requested again.
+        self.assertEqual(0, main(["186", "--output", self.directory.name, "--page-size", "2"]))
+
+        self.assertEqual(5, len(self.read(1658282)["ratings"]))
+        self.assertEqual(12, self.server.count("POST", "/graphql"))
+        self.assertEqual([], os.listdir(os.path.join(self.directory.name, "186", "partial")))
+
+    def test_sync(self):
+        crawler = Crawler(self.directory.name, page_size=2, transport=self.transport, sync=True)
+        crawler.crawl([186])
+        self.assertEqual({"numRatings": 5, "newestRatingId": self.read(1658282)["ratings"][0]["id"],
+                          "newestRatingDate": "2024-01-05 10:00:00 +0000 UTC"}, self.read(1658282)["lastSeen"])
+
+        self.server.requests.clear()
+        crawler.crawl([186])
+        # Only the three pages of the search are requested again, since no professor has new ratings.
+        self.assertEqual(3, self.server.count("POST", "/graphql"))
+
+        self.server.add_rating(1658282, 6, "2024-02-01 10:00:00 +0000 UTC", "6")
+        self.server.add_rating(1658282, 7, "2024-02-02 10:00:00 +0000 UTC", "7")
+        self.server.add_rating(101, 8, "2024-02-02 10:00:00 +0000 UTC", "8")
+        self.server.requests.clear()
+        crawler.crawl([186])
+
+        self.assertEqual(["7", "6", "5", "4", "3", "2", "1"],
+                         [rating["comment"] for rating in self.read(1658282)["ratings"]])
+        self.assertEqual(["8"], [rating["comment"] for rating in self.read(101)["ratings"]])
+        self.assertEqual(7, self.read(1658282)["lastSeen"]["numRatings"])
+        # The search, then each professor with the pages of ratings up to the first known one.
+        self.assertEqual(3 + 1 + 2 + 1 + 1, self.server.count("POST", "/graphql"))
+
+        # The updated professors replaced their old lines.
+        self.assertEqual(6, len(list(crawler.professors(186))))
+        with open(crawler.professors_path(186)) as f:
+            self.assertEqual(6, len(f.readlines()))
+
+    def test_sync_after_crash(self):
+        crawler = Crawler(self.directory.name, page_size=2, transport=self.transport, sync=True)
+        crawler.crawl([186])
+        self.server.add_rating(1658282, 6, "2024-02-01 10:00:00 +0000 UTC", "6")
+
+        # Crash after the updated professor is written, but before its state is removed.
+        with mock.patch("ratemyprofessor.crawl.os.remove", side_effect=OSError("Crashed.")):
+            self.assertEqual([(186, 1658282)], crawler.crawl([186]))
+        self.server.add_rating(1658282, 7, "2024-02-02 10:00:00 +0000 UTC", "7")
+        self.assertEqual([], crawler.crawl([186]))
+
+        self.assertEqual(["7", "6", "5", "4", "3", "2", "1"],
+                         [rating["comment"] for rating in self.read(1658282)["ratings"]])
+        self.assertEqual([], os.listdir(os.path.join(self.directory.name, "186", "partial")))
+
+    def test_comment_index(self):
+        index = CommentIndex(":memory:")
+        crawler = Crawler(self.directory.name, page_size=2, transport=self.transport, sync=True, comment_index=index)
+        crawler.crawl([186])
+        self.server.add_rating(1658282, 6, "2024-02-01 10:00:00 +0000 UTC", "Exams were curved")
+        crawler.crawl([186])
+
+        self.assertEqual(6, len(index))
+        self.assertEqual([(1658282, 186)], [(hit.professor_id, hit.school_id) for hit in index.search("curved")])
+        index.close()
+
+    def test_split_ratings(self):
+        crawler = Crawler(self.directory.name, page_size=2, transport=self.transport, split_ratings=True, sync=True)
+        crawler.crawl([186])
+        self.server.add_rating(1658282, 6, "2024-02-01 10:00:00 +0000 UTC", "6")
+        crawler.crawl([186])
+
+        self.assertNotIn("ratings", self.read(1658282))
+        self.assertEqual(["5", "4", "3", "2", "1", "6"], [rating["comment"] for rating in crawler.ratings(186)])
+        self.assertEqual({1658282}, {rating["professorId"] for rating in crawler.ratings(186)})
+
+
+if __name__ == '__main__':
+    unittest.main()
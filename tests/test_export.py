@@ -0,0 +1,107 @@
+import datetime
+import json
+import os
+import tempfile
+import unittest
+
+from ratemyprofessor.export import ColumnReader, export_professors, export_ratings, read_table
+
+SNAPSHOT = os.path.join(os.path.dirname(__file__), "..", "professors_school_1448_complete.json")
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def crawl_records():
+    """Crawl records of two schools' professors, each with a rating in January and one in March."""
+    records = []
+    for school_id, school_name in ((186, "Case Western Reserve University"), (1448, "UNBC")):
+        for legacy_id, department in ((school_id * 10, "Biology"), (school_id * 10 + 1, "English")):
+            records.append({
+                "id": "VGVhY2hlci0x", "legacyId": legacy_id, "firstName": "Prof", "lastName": str(legacy_id),
+                "department": department, "avgRating": 4.5, "avgDifficulty": 0, "numRatings": 2,
+                "wouldTakeAgainPercent": -1,
+                "school": {"id": "U2Nob29sLTE4Ng==" if school_id == 186 else "U2Nob29sLTE0NDg=",
+                           "name": school_name},
+                "ratings": [{"id": "%s-%s" % (legacy_id, month), "date": "2024-0%s-15 10:00:00 +0000 UTC" % month,
+                             "class": "BIO101", "grade": None, "helpfulRating": 5, "difficultyRating": 2,
+                             "wouldTakeAgain": 1, "isForOnlineClass": False, "isForCredit": True,
+                             "attendanceMandatory": "mandatory", "thumbsUpTotal": 1, "thumbsDownTotal": 0,
+                             "comment": "Cours génial"} for month in (3, 1)],
+            })
+    return records
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_snapshot(self):
+        with open(SNAPSHOT, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        count = export_professors(snapshot["professors"], self.path("professors.cols"),
+                                  school_id=snapshot["school_id"], row_group_size=50)
+        self.assertEqual(len(snapshot["professors"]), count)
+
+        rows = list(read_table(self.path("professors.cols"), columns=["id", "rating"], department="English"))
+        expected = [professor for professor in snapshot["professors"] if professor["department"] == "English"]
+        self.assertEqual([(p["id"], p["rating"] or None) for p in expected], [(r["id"], r["rating"]) for r in rows])
+        self.assertEqual(len(snapshot["professors"]),
+                         len(list(read_table(self.path("professors.cols"), school_id=1448))))
+
+    def test_unknown_school(self):
+        with open(SNAPSHOT, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        export_professors(snapshot["professors"][:3], self.path("professors.cols"))
+        self.assertEqual([None] * 3, [row["school_id"] for row in read_table(self.path("professors.cols"))])
+        self.assertEqual([], list(read_table(self.path("professors.cols"), school_id=0)))
+
+    def test_ratings(self):
+        self.assertEqual(8, export_ratings(crawl_records(), self.path("ratings.cols"), row_group_size=2))
+
+        rows = list(read_table(self.path("ratings.cols"), school_id=186, department="English",
+                               since=datetime.datetime(2024, 2, 1)))
+        self.assertEqual(1, len(rows))
+        self.assertEqual({"id": "1861-3", "professor_id": 1861, "school_id": 186, "department": "English",
+                          "date": datetime.datetime(2024, 3, 15, 10), "class_name": "BIO101", "grade": None,
+                          "rating": 5.0, "difficulty": 2.0, "take_again": True, "online_class": False,
+                          "credit": True, "attendance_mandatory": True, "thumbs_up": 1, "thumbs_down": 0,
+                          "comment": "Cours génial"}, rows[0])
+
+        # Each professor's two ratings are a row group, so only the matching professor's group is read.
+        reader = ColumnReader(self.path("ratings.cols"))
+        self.assertEqual(8, len(reader))
+        self.assertEqual([1], reader.matching_row_groups([("school_id", "==", 186), ("department", "==", "English")]))
+        self.assertEqual([], reader.matching_row_groups([("date", "<", datetime.datetime(2024, 1, 1))]))
+
+    def test_split_ratings(self):
+        records = crawl_records()
+        ratings = [dict(rating, professorId=record["legacyId"]) for record in records for rating in record["ratings"]]
+        export_ratings(records, self.path("ratings.cols"), ratings=ratings)
+        self.assertEqual({1448}, {row["school_id"] for row in read_table(self.path("ratings.cols"),
+                                                                         until=datetime.datetime(2024, 2, 1),
+                                                                         department="Biology", school_id=1448)})
+
+    def test_unknown_column(self):
+        export_professors(crawl_records(), self.path("professors.cols"))
+        with self.assertRaises(ValueError):
+            list(read_table(self.path("professors.cols"), since=datetime.datetime(2024, 1, 1)))
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet(self):
+        export_ratings(crawl_records(), self.path("ratings.parquet"), row_group_size=2)
+        rows = list(read_table(self.path("ratings.parquet"), columns=["id"], school_id=186, department="English",
+                               since=datetime.datetime(2024, 2, 1)))
+        self.assertEqual([{"id": "1861-3"}], rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
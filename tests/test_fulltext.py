@@ -0,0 +1,69 @@
+import datetime
+import unittest
+
+from ratemyprofessor.fulltext import CommentIndex, match_expression
+
+
+def professor(legacy_id, department, comments):
+    return {"legacyId": legacy_id, "department": department, "school": {"id": "U2Nob29sLTE4Ng==", "name": "CWRU"},
+            "ratings": [{"id": "%s-%s" % (legacy_id, number), "class": course, "date": "%s 10:00:00 +0000 UTC" % date,
+                         "comment": comment} for number, (course, date, comment) in enumerate(comments)]}
+
+
+class CommentIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = CommentIndex(":memory:")
+        self.index.add(professor(1, "Computer Science", [
+            ("CSDS132", "2024-01-05", "Hard exams but he curves generously."),
+            ("CSDS132", "2023-05-01", "The exams are fair and the curve is huge. Exams exams exams."),
+            ("CSDS233", "2024-02-01", "Lectures are boring."),
+        ]))
+        self.index.add(professor(2, "Mathematics", [
+            ("MATH121", "2024-03-01", "No curve on the final exam &quot;at all&quot;."),
+            ("MATH122", "2024-03-02", "Très bien expliqué."),
+        ]), school_id=1448)
+
+    def tearDown(self):
+        self.index.close()
+
+    def search(self, query, **filters):
+        return [hit.rating_id for hit in self.index.search(query, **filters)]
+
+    def test_ranked(self):
+        self.assertEqual(["1-1", "1-0"], self.search("exams"))
+        self.assertEqual(["1-1", "1-0", "2-0"], self.search("exam*"))
+        self.assertCountEqual(["1-1", "2-0"], self.search("curve"))
+        self.assertEqual(["2-0"], self.search('"final exam" "at all"'))
+        self.assertEqual(["2-1"], self.search("tres EXPLIQUE"))
+        self.assertEqual([], self.search('"exam final"'))
+
+    def test_filters(self):
+        self.assertEqual(["1-1"], self.search("curve", school_id=186))
+        self.assertEqual(["2-0"], self.search("curve", department="Mathematics"))
+        self.assertEqual(["1-1", "1-0"], self.search("exam*", course="csds132"))
+        self.assertEqual(["1-0", "2-0"], self.search("exam*", since=datetime.datetime(2024, 1, 1)))
+        self.assertEqual(["1-1"], self.search("exam*", until=datetime.datetime(2024, 1, 1)))
+        # Dates with a timezone are compared in UTC: 2024-01-05 10:00 UTC is 06:00 in UTC-4.
+        eastern = datetime.timezone(datetime.timedelta(hours=-4))
+        self.assertEqual(["2-0"], self.search("exam*", since=datetime.datetime(2024, 1, 5, 7, tzinfo=eastern)))
+        self.assertEqual(["1-1", "1-0"], self.search("exam*", until=datetime.datetime(2024, 1, 5, 7, tzinfo=eastern)))
+
+        hit = self.index.search("boring")[0]
+        self.assertEqual((1, 186, "CSDS233", datetime.datetime(2024, 2, 1, 10)),
+                         (hit.professor_id, hit.school_id, hit.course, hit.date))
+
+    def test_update(self):
+        self.index.add(professor(1, "Computer Science", [("CSDS132", "2024-01-05", "Edited: no more exams.")]))
+        self.assertEqual(5, len(self.index))
+        self.assertEqual([], self.search("generously"))
+        self.assertEqual(["1-0"], self.search("edited"))
+
+    def test_match_expression(self):
+        self.assertEqual('"curve" "final exam" "exam"*', match_expression('curve "final exam" exam*'))
+        self.assertEqual('"OR" "NEAR(a"', match_expression('OR NEAR(a'))
+        with self.assertRaises(ValueError):
+            match_expression(' "" ')
+
+
+if __name__ == '__main__':
+    unittest.main()
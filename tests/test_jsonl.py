@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from ratemyprofessor.jsonl import JSONLWriter, read_at, read_jsonl
+
+
+class JSONLTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "records.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        with JSONLWriter(self.path, fsync_every=2) as writer:
+            offsets = [writer.write({"id": i, "comment": "café %s" % i}) for i in range(5)]
+
+        self.assertEqual(["café %s" % i for i in range(5)], [r["comment"] for r in read_jsonl(self.path)])
+        self.assertEqual(offsets, [offset for offset, _ in read_jsonl(self.path, offsets=True)])
+        self.assertEqual({"id": 3, "comment": "café 3"}, read_at(self.path, offsets[3]))
+        self.assertEqual([], list(read_jsonl(os.path.join(self.directory.name, "missing.jsonl"))))
+
+    def test_reads_lazily(self):
+        with JSONLWriter(self.path) as writer:
+            writer.write({"id": 1})
+            records = read_jsonl(self.path)
+            writer.sync()
+            self.assertEqual({"id": 1}, next(records))
+            records.close()
+
+    def test_cut_short_line(self):
+        with JSONLWriter(self.path) as writer:
+            writer.write({"id": 1})
+        with open(self.path, "ab") as f:
+            f.write(b'{"id": 2, "comm')
+
+        self.assertEqual([{"id": 1}], list(read_jsonl(self.path)))
+        with JSONLWriter(self.path) as writer:
+            writer.write({"id": 3})
+        self.assertEqual([{"id": 1}, {"id": 3}], list(read_jsonl(self.path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
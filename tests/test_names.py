@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+import ratemyprofessor
+from ratemyprofessor import NameIndex, School, _closest_school
+from ratemyprofessor.names import normalize_name
+
+from fake_server import FakeServerTestCase
+
+
+class NameIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.schools = NameIndex()
+        for key, name in ((1, "Université de Montréal"), (2, "Columbia College"), (3, "Columbia College Chicago"),
+                          (4, "Columbia College"), (5, "Columbia University")):
+            self.schools.add(key, name)
+
+    def test_normalize(self):
+        self.assertEqual("universite de montreal", normalize_name("  Université  de Montréal!"))
+        self.assertEqual("o brien st john s", normalize_name("O'Brien, St. John's"))
+
+    def test_resolve(self):
+        self.assertEqual([1], [match.key for match in self.schools.resolve("universite de montreal", limit=1)])
+        self.assertEqual([1], [match.key for match in self.schools.resolve("Univrsité Montreal", limit=1)])
+        self.assertEqual([5], [match.key for match in self.schools.resolve("columbia univ", limit=1)])
+
+        match = self.schools.resolve("COLUMBIA COLLEGE", limit=1)[0]
+        self.assertEqual((2, "Columbia College", 1.0), (match.key, match.name, match.score))
+        self.assertEqual([], self.schools.resolve("Massachusetts", min_score=0.5))
+        self.assertEqual([], self.schools.resolve("  "))
+
+    def test_same_name(self):
+        self.assertEqual([2, 4, 3], [match.key for match in self.schools.resolve("Columbia College", limit=3)])
+        schools = [School(key, name=name) for key, name in ((10, "Columbia College Chicago"), (11, "Columbia College"),
+                                                            (12, "Columbia College"))]
+        self.assertEqual(11, _closest_school("Columbia College", schools).id)
+        self.assertEqual(10, _closest_school("Columbia College Chicago", schools).id)
+        # A name that is not close enough to any of them falls back to the top search result.
+        self.assertEqual(10, _closest_school("Columbia Univ", schools).id)
+
+    def test_many_same_names(self):
+        schools = NameIndex()
+        for key in range(200):
+            schools.add(key, "Columbia College")
+        self.assertEqual([0, 1, 2], [match.key for match in schools.resolve("Columbia College", limit=3)])
+
+    def test_common_name(self):
+        professors = NameIndex()
+        for key in range(10000):
+            professors.add(key, "John %s" % key, group=key % 10)
+        professors.add(10000, "John Smith", group=3)
+        self.assertEqual([0, 1], [match.key for match in professors.resolve("john", limit=2)])
+        self.assertEqual([3, 13], [match.key for match in professors.resolve("john", limit=2, group=3)])
+        self.assertEqual([10000], [match.key for match in professors.resolve("john smith", limit=1, group=3)])
+        self.assertEqual([], professors.resolve("john smith", group=4, min_score=0.9))
+
+    def test_replace_and_groups(self):
+        professors = NameIndex.from_professors([
+            {"legacyId": 1, "firstName": "Kevin", "lastName": "Daly", "school": {"id": "U2Nob29sLTE4Ng=="}},
+            {"legacyId": 2, "firstName": "Karen", "lastName": "Daly", "school": {"id": "U2Nob29sLTE0NDg="}},
+        ])
+        self.assertEqual([1], [match.key for match in professors.resolve("daly", group=186)])
+        self.assertEqual([2], [match.key for match in professors.resolve("daly", group=1448)])
+
+        professors.add(1, "Kevin Daley", 186)
+        self.assertEqual(2, len(professors))
+        self.assertEqual(["Kevin Daley"], [match.name for match in professors.resolve("kevin", group=186)])
+
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "schools.json")
+            self.schools.save(path)
+            loaded = NameIndex.load(path)
+        self.assertEqual(5, len(loaded))
+        self.assertEqual(self.schools.resolve("columbia", limit=5), loaded.resolve("columbia", limit=5))
+
+
+class ResolveWithoutSearchTest(FakeServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server.add_school(186, "Case Western Reserve University")
+        self.server.add_teacher(1658282, 186, "Harold", "Connamacher", "Computer Science", 4.5, 3.2, 80)
+
+    def test_resolve(self):
+        schools = NameIndex.from_schools([{"legacyId": 186, "name": "Case Western Reserve University"}])
+        professors = NameIndex.from_professors([{"id": 1658282, "name": "Harold Connamacher"}], school_id=186)
+
+        school = ratemyprofessor.get_school_by_name("case western reserve", transport=self.transport,
+                                                    name_index=schools)
+        professor = ratemyprofessor.get_professor_by_school_and_name(school, "Connamacher", transport=self.transport,
+                                                                     name_index=professors)
+        self.assertEqual((186, "Case Western Reserve University"), (school.id, school.name))
+        self.assertEqual(1658282, professor.id)
+        self.assertEqual(0, self.server.count())
+        self.assertEqual("Computer Science", professor.department)
+
+        # A name the index does not know is searched for as usual.
+        self.server.requests.clear()
+        self.assertIsNone(ratemyprofessor.get_school_by_name("Ohio State", transport=self.transport,
+                                                             name_index=schools))
+        self.assertEqual(1, self.server.count("POST", "/graphql"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import datetime
+import tempfile
+import unittest
+
+import ratemyprofessor
+from ratemyprofessor import Professor, School, Store
+from ratemyprofessor.crawl import Crawler
+
+from fake_server import FakeServerTestCase, reset_package
+
+
+class OfflineTest(FakeServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server.add_school(186, "Case Western Reserve University")
+        self.server.add_school(1448, "University of Northern British Columbia")
+        self.server.add_teacher(1658282, 186, "Harold", "Connamacher", "Computer Science", 4.5, 3.2, 80,
+                                courses={"CSDS132": 2, "CSDS233": 1})
+        self.server.add_rating(1658282, 1, "2024-01-02 10:00:00 +0000 UTC", "Great!", "CSDS132")
+        self.server.add_rating(1658282, 2, "2023-05-06 10:00:00 +0000 UTC", "Hard but fair", "CSDS233")
+        self.server.add_teacher(100, 186, "Kevin", "Daly", "Mathematics")
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = Store(":memory:")
+        Crawler(self.directory.name, transport=self.transport, store=self.store).crawl([186])
+        # A professor crawled later, who the store does not have yet.
+        self.server.add_teacher(101, 186, "Ada", "Lovelace", "Mathematics")
+
+        reset_package()
+        self.server.requests.clear()
+
+    def tearDown(self):
+        ratemyprofessor.set_offline(None)
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_offline(self):
+        ratemyprofessor.set_offline(self.store)
+        school = ratemyprofessor.get_school_by_name("case western")
+        self.assertEqual((186, "Case Western Reserve University"), (school.id, school.name))
+
+        professor = ratemyprofessor.get_professor_by_school_and_name(school, "Connamacher")
+        self.assertEqual(("Harold Connamacher", 4.5, 80), (professor.name, professor.rating,
+                                                           professor.would_take_again))
+        self.assertEqual(["Great!", "Hard but fair"], [rating.comment for rating in professor.get_ratings()])
+        self.assertEqual(["Hard but fair"], [rating.comment for rating in professor.get_ratings("CSDS233")])
+        self.assertEqual(["Great!"], [rating.comment for rating in
+                                      professor.iter_ratings(since=datetime.datetime(2024, 1, 1))])
+
+        loaded = Professor(1658282)
+        self.assertEqual(["CSDS132", "CSDS233"], [course.name for course in loaded.courses])
+        self.assertIs(loaded.school, school)
+        self.assertEqual("Kevin Daly", ratemyprofessor.get_professor_by_school_and_name(school, "daly").name)
+        self.assertEqual([100, 1658282], [found.id for found in ratemyprofessor.get_professors([100, 1658282])])
+        self.assertEqual(0, self.server.count())
+
+    def test_fallback(self):
+        ratemyprofessor.set_offline(self.store)
+        school = School(186)
+        self.assertEqual("Ada Lovelace", Professor(101).name)
+        self.assertEqual([101, 100], [found.id for found in ratemyprofessor.get_professors([101, 100])])
+        self.assertEqual("Ada Lovelace", ratemyprofessor.get_professor_by_school_and_name(school, "Lovelace").name)
+        self.assertEqual("University of Northern British Columbia", School(1448).name)
+        # The professor, the batch with the one the store does not have, the search and the school page.
+        self.assertEqual(4, self.server.count())
+
+    def test_fail_fast(self):
+        ratemyprofessor.set_offline(self.store, fallback=False)
+        school = School(186)
+        with self.assertRaises(ValueError):
+            Professor(101)
+        with self.assertRaises(ValueError):
+            School(1448)
+        self.assertIsNone(ratemyprofessor.get_professor_by_school_and_name(school, "Lovelace"))
+        self.assertIsNone(ratemyprofessor.get_school_by_name("Northern British Columbia"))
+        self.assertEqual([100], [found.id for found in ratemyprofessor.get_professors([101, 100])])
+
+        # A professor that was added without its ratings has none to give.
+        self.store.add({"legacyId": 102, "firstName": "Grace", "lastName": "Hopper", "numRatings": 3,
+                        "school": {"id": 186}})
+        with self.assertRaises(ValueError):
+            Professor(102).get_ratings()
+
+        # Nor can a professor whose school the store does not know be filled in.
+        self.store.add_all([{"id": 103, "name": "Alan Turing", "department": "Mathematics", "rating": 4.0}])
+        with self.assertRaises(ValueError):
+            Professor(103)
+        self.assertEqual([100], [found.id for found in ratemyprofessor.get_professors([103, 100])])
+        self.assertEqual(0, self.server.count())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import time
+import unittest
+
+from ratemyprofessor import Professor, Transport, aio
+from ratemyprofessor.ratelimit import RateLimiter, RetryPolicy, TokenBucket, retry_after
+
+from fake_server import FakeServerTestCase
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(10, burst=3)
+        self.assertEqual([0, 0, 0], [bucket.reserve() for _ in range(3)])
+        self.assertAlmostEqual(0.1, bucket.reserve(), delta=0.01)
+        self.assertAlmostEqual(0.2, bucket.reserve(), delta=0.01)
+
+    def test_aimd(self):
+        bucket = TokenBucket(10, increase=1)
+        bucket.on_throttle()
+        bucket.on_throttle()
+        self.assertEqual(2.5, bucket.rate)
+        bucket.on_success()
+        self.assertEqual(3.5, bucket.rate)
+        for _ in range(20):
+            bucket.on_success()
+        self.assertEqual(10, bucket.rate)
+
+        bucket.on_throttle(retry_after=5)
+        self.assertGreater(bucket.reserve(), 4.9)
+
+    def test_endpoints(self):
+        limiter = RateLimiter(graphql=TokenBucket(10))
+        self.assertIs(limiter.graphql, limiter.bucket("https://www.ratemyprofessors.com/graphql"))
+        self.assertIsNone(limiter.bucket("https://www.ratemyprofessors.com/school/186"))
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff=1, max_backoff=4)
+        self.assertTrue(all(0 <= policy.delay(attempt) <= 4 for attempt in range(10)))
+        self.assertEqual(7, policy.delay(0, retry_after=7))
+        self.assertEqual(60, policy.delay(0, retry_after=86400))
+        self.assertTrue(policy.gives_up(0, retry_after=86400))
+
+
+class RetryTest(FakeServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server.add_school(186, "Case Western Reserve University")
+        self.server.add_teacher(1658282, 186, "Harold", "Connamacher")
+        self.bucket = TokenBucket(1000, burst=10)
+        self.limiter = RateLimiter(graphql=self.bucket, html=TokenBucket(1000))
+        self.retry = RetryPolicy(retries=2, backoff=0.01)
+
+    def test_retries(self):
+        transport = Transport(base_url=self.server.url, limiter=self.limiter, retry=self.retry)
+        self.server.failures = [(503, None), (429, "0.05")]
+        start = time.monotonic()
+        self.assertEqual("Harold Connamacher", Professor(1658282, transport=transport).name)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual(3, self.server.count("POST", "/graphql"))
+        self.assertLess(self.bucket.rate, 1000)
+
+        self.server.failures = [(503, None)] * 3
+        self.assertEqual(503, transport.get("/school/186").status_code)
+        self.assertEqual(3, self.server.count("GET", "/school/"))
+        transport.close()
+
+    def test_long_retry_after(self):
+        transport = Transport(base_url=self.server.url, limiter=self.limiter,
+                              retry=RetryPolicy(retries=2, max_retry_after=0.05))
+        self.server.failures = [(429, "86400")]
+        start = time.monotonic()
+        self.assertEqual(429, transport.get("/school/186").status_code)
+        # The endpoint is only held back for max_retry_after.
+        self.assertEqual(200, transport.get("/school/186").status_code)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(2, self.server.count("GET", "/school/"))
+        transport.close()
+
+    def test_async_retries(self):
+        async def load():
+            async with aio.AsyncTransport(base_url=self.server.url, limiter=self.limiter,
+                                          retry=self.retry) as transport:
+                return await aio.get_professor(1658282, transport=transport)
+
+        self.server.failures = [(429, "0"), (502, None)]
+        self.assertEqual("Harold Connamacher", asyncio.run(load()).name)
+        self.assertEqual(3, self.server.count("POST", "/graphql"))
+
+    def test_retry_after(self):
+        class Response:
+            def __init__(self, value):
+                self.headers = {"Retry-After": value} if value is not None else {}
+
+        self.assertEqual(3, retry_after(Response("3")))
+        self.assertIsNone(retry_after(Response(None)))
+        self.assertIsNone(retry_after(Response("soon")))
+        self.assertEqual(0, retry_after(Response("Wed, 21 Oct 2015 07:28:00 GMT")))
+
+
+if __name__ == '__main__':
+    unittest.main()
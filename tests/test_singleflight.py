@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from ratemyprofessor import Professor, Transport
+from ratemyprofessor.ratelimit import RateLimiter
+from ratemyprofessor.singleflight import AsyncSingleFlight, SingleFlight
+
+from fake_server import FakeServerTestCase
+
+
+def run_threads(count, target):
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_shared(self):
+        group = SingleFlight()
+        calls = []
+
+        def call():
+            calls.append(1)
+            wait_for(lambda: group.shared == 7)
+            return object()
+
+        results = run_threads(8, lambda: group.do("key", call))
+        self.assertEqual(1, len(calls))
+        self.assertEqual(1, len({id(result) for result in results}))
+        self.assertEqual(0, group.in_flight())
+
+        # Calls that do not overlap are not shared.
+        group.do("key", call)
+        self.assertEqual(2, len(calls))
+
+    def test_error(self):
+        group = SingleFlight()
+
+        def call():
+            wait_for(lambda: group.shared == 3)
+            raise ValueError("Bad request.")
+
+        results = run_threads(4, lambda: group.do("key", call))
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(0, group.in_flight())
+
+
+class AsyncSingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def test_shared(self):
+        group = AsyncSingleFlight()
+        calls = []
+
+        async def call(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value
+
+        self.assertEqual([1, 1, 2], await asyncio.gather(group.do("a", call, 1), group.do("a", call, 1),
+                                                         group.do("b", call, 2)))
+        self.assertEqual([1, 2], calls)
+
+        # A caller that is cancelled does not cancel the call for the others.
+        first = asyncio.ensure_future(group.do("a", call, 3))
+        second = asyncio.ensure_future(group.do("a", call, 3))
+        await asyncio.sleep(0)
+        second.cancel()
+        self.assertEqual(3, await first)
+        self.assertEqual(0, group.in_flight())
+
+    async def test_cancelled_leader(self):
+        group = AsyncSingleFlight()
+        calls = []
+
+        async def call(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value
+
+        first = asyncio.ensure_future(group.do("a", call, 1))
+        second = asyncio.ensure_future(group.do("a", call, 1))
+        third = asyncio.ensure_future(group.do("a", call, 1))
+        await asyncio.sleep(0)
+        first.cancel()
+        # One of the callers that were waiting makes the call again, and the other shares it.
+        self.assertEqual([1, 1], await asyncio.gather(second, third))
+        self.assertEqual([1, 1], calls)
+        self.assertTrue(first.cancelled())
+        self.assertEqual(0, group.in_flight())
+
+
+class GatedTransport(Transport):
+    """Holds every request until a condition is met, so that concurrent callers are sure to overlap."""
+
+    def __init__(self, base_url, ready):
+        super().__init__(base_url, limiter=RateLimiter())
+        self.ready = ready
+
+    def _request(self, *args, **kwargs):
+        wait_for(self.ready)
+        return super()._request(*args, **kwargs)
+
+
+class CoalescingTest(FakeServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server.add_school(186, "Case Western Reserve University")
+        self.server.add_teacher(1658282, 186, "Harold", "Connamacher", "Computer Science", courses={"CSDS132": 3})
+        for rating_id in range(1, 4):
+            self.server.add_rating(1658282, rating_id, "2024-01-0%s 10:00:00 +0000 UTC" % rating_id, str(rating_id))
+
+    def test_transport(self):
+        transport = GatedTransport(self.server.url, lambda: transport.flights.shared == 7)
+        query, request_headers = Professor._professor_request(1658282)
+        responses = run_threads(8, lambda: transport.post("/graphql", json=query, headers=request_headers))
+        self.assertEqual(1, len({id(response) for response in responses}))
+        self.assertEqual(1, self.server.count("POST", "/graphql"))
+        transport.close()
+
+    def test_professor(self):
+        shared = [0]
+        transport = GatedTransport(self.server.url, lambda: transport.flights.shared - shared[0] == 7)
+        professors = run_threads(8, lambda: Professor(1658282, transport=transport))
+        self.assertEqual(["Harold Connamacher"] * 8, [professor.name for professor in professors])
+        self.assertEqual(1, self.server.count("POST", "/graphql"))
+
+        shared[0] = transport.flights.shared
+        ratings = run_threads(8, lambda: professors[0].get_ratings())
+        self.assertEqual([["3", "2", "1"]] * 8, [[rating.comment for rating in found] for found in ratings])
+        self.assertEqual(2, self.server.count("POST", "/graphql"))
+        transport.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
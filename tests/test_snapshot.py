@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ratemyprofessor.jsonl import JSONLWriter
+from ratemyprofessor.snapshot import Snapshot
+
+SNAPSHOT = os.path.join(os.path.dirname(__file__), "..", "professors_school_1448_complete.json")
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "professors.json")
+        shutil.copy(SNAPSHOT, self.path)
+        with open(SNAPSHOT, encoding="utf-8") as f:
+            self.professors = json.load(f)["professors"]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_iterate(self):
+        # A small chunk size makes records span several chunks.
+        with Snapshot(self.path, chunk_size=64) as snapshot:
+            self.assertEqual(self.professors, list(snapshot))
+            self.assertFalse(os.path.exists(self.path + ".idx"))
+
+    def test_lookup(self):
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(len(self.professors), snapshot.count())
+            for professor in self.professors:
+                self.assertEqual(professor, snapshot[professor["id"]])
+            self.assertIsNone(snapshot.get(1))
+            self.assertNotIn(1, snapshot)
+
+        # The index is rebuilt once the snapshot changes.
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"school_id": 1448, "professors": [dict(self.professors[0], name="Lisa Dickson-Smith")]}, f)
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(1, snapshot.count())
+            self.assertEqual("Lisa Dickson-Smith", snapshot[self.professors[0]["id"]]["name"])
+
+    def test_json_lines(self):
+        path = os.path.join(self.directory.name, "professors.jsonl")
+        with JSONLWriter(path) as writer:
+            writer.write({"legacyId": 1, "firstName": "Zoë", "numRatings": 1})
+            writer.write({"legacyId": 2, "firstName": "Harold", "numRatings": 0})
+            writer.write({"legacyId": 1, "firstName": "Zoë", "numRatings": 2})
+        with open(path, "ab") as f:
+            f.write(b'{"legacyId": 3')
+
+        with Snapshot(path) as snapshot:
+            self.assertEqual([1, 2, 1], [record["legacyId"] for record in snapshot])
+            self.assertEqual(2, snapshot[1]["numRatings"])
+            self.assertEqual(2, snapshot.count())
+
+    def test_not_a_snapshot(self):
+        with open(self.path, "w") as f:
+            json.dump({"school_id": 1448, "professors": 3}, f)
+        with Snapshot(self.path) as snapshot:
+            with self.assertRaises(ValueError):
+                list(snapshot)
+
+
+if __name__ == '__main__':
+    unittest.main()
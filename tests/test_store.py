@@ -0,0 +1,143 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from ratemyprofessor.crawl import Crawler
+from ratemyprofessor.snapshot import Snapshot
+from ratemyprofessor.store import Store
+
+from fake_server import FakeServerTestCase, reset_package
+
+SNAPSHOT = os.path.join(os.path.dirname(__file__), "..", "professors_school_1448_complete.json")
+
+
+def rating(rating_id, course, date, comment="", tags="", quality=5):
+    return {"id": rating_id, "class": course, "date": "%s 10:00:00 +0000 UTC" % date, "comment": comment,
+            "helpfulRating": quality, "difficultyRating": 3.5, "attendanceMandatory": "mandatory",
+            "wouldTakeAgain": None, "grade": "A", "isForOnlineClass": False, "isForCredit": True,
+            "ratingTags": tags, "thumbsUpTotal": 2, "thumbsDownTotal": 0}
+
+
+def professor(legacy_id, first_name, department, courses, ratings, school_id="U2Nob29sLTE4Ng=="):
+    return {"legacyId": legacy_id, "firstName": first_name, "lastName": "Smith", "department": department,
+            "avgRating": 4.5, "avgDifficulty": 3, "numRatings": len(ratings), "wouldTakeAgainPercent": 0,
+            "school": {"id": school_id, "name": "Case Western Reserve University"},
+            "courseCodes": [{"courseName": name, "courseCount": count} for name, count in courses],
+            "ratings": ratings}
+
+
+class StoreTest(unittest.TestCase):
+    def setUp(self):
+        reset_package()
+        self.store = Store(":memory:")
+        self.store.add(professor(1, "Ann", "Computer Science", [("CSDS132", 2), ("CSDS233", 1)], [
+            rating("r1", "CSDS132", "2024-01-05", "Tough &amp; fair", "Tough grader--Caring"),
+            rating("r2", "CSDS132", "2023-05-01", tags="Tough grader"),
+            rating("r3", "CSDS233", "2024-02-01"),
+        ]))
+        self.store.add(professor(2, "Bob", "Mathematics", [("MATH121", 1)], [rating("r4", "math121", "2024-03-01")]))
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_professor(self):
+        found = self.store.professor(1)
+        self.assertEqual(("Ann Smith", "Computer Science", 4.5, 3, 3, None),
+                         (found.name, found.department, found.rating, found.difficulty, found.num_ratings,
+                          found.would_take_again))
+        self.assertEqual((186, "Case Western Reserve University"), (found.school.id, found.school.name))
+        self.assertEqual([("CSDS132", 2), ("CSDS233", 1)], [(course.name, course.count) for course in found.courses])
+        self.assertIsNone(self.store.professor(3))
+        self.assertEqual(2, len(self.store))
+        self.assertIn(2, self.store)
+        self.assertEqual("Case Western Reserve University", self.store.school(186).name)
+
+    def test_professors(self):
+        def ids(**filters):
+            return [found.id for found in self.store.professors(**filters)]
+
+        self.assertEqual([1, 2], ids(school_id=186))
+        self.assertEqual([2], ids(department="Mathematics"))
+        self.assertEqual([1], ids(course="csds233"))
+        self.assertEqual([1], ids(tag="caring"))
+        self.assertEqual([1], ids(limit=1))
+        self.assertEqual([], ids(school_id=1448))
+
+    def test_ratings(self):
+        def ids(**filters):
+            return [found.comment for found in self.store.ratings(**filters)]
+
+        ratings = self.store.ratings(professor_id=1)
+        self.assertEqual([datetime.datetime(2024, 2, 1, 10), datetime.datetime(2024, 1, 5, 10),
+                          datetime.datetime(2023, 5, 1, 10)], [found.date for found in ratings])
+        self.assertEqual((5, 3.5, True, None, True, False, 2), (
+            ratings[0].rating, ratings[0].difficulty, ratings[0].attendance_mandatory, ratings[0].take_again,
+            ratings[0].credit, ratings[0].online_class, ratings[0].thumbs_up))
+        self.assertEqual("Tough & fair", ratings[1].comment)
+        self.assertEqual("Tough &amp; fair", self.store.ratings(professor_id=1, raw_comments=True)[1].comment)
+
+        self.assertEqual(2, len(self.store.ratings(course="CSDS132")))
+        self.assertEqual(1, len(self.store.ratings(course="MATH121")))
+        self.assertEqual(3, len(self.store.ratings(since=datetime.datetime(2024, 1, 1))))
+        self.assertEqual(1, len(self.store.ratings(school_id=186, department="Computer Science",
+                                                   until=datetime.datetime(2024, 1, 1))))
+        # Dates with a timezone are compared in UTC: 2024-01-05 10:00 UTC is 06:00 in UTC-4.
+        eastern = datetime.timezone(datetime.timedelta(hours=-4))
+        self.assertEqual([""], ids(professor_id=1, since=datetime.datetime(2024, 1, 5, 7, tzinfo=eastern)))
+        self.assertEqual(["Tough & fair", ""],
+                         ids(professor_id=1, until=datetime.datetime(2024, 1, 5, 7, tzinfo=eastern)))
+        self.assertEqual(4, len(self.store.ratings(bulk=True)))
+        self.assertEqual([("Tough grader", 2), ("Caring", 1)], self.store.tags(1))
+
+    def test_update(self):
+        # A synced professor comes back with only its new ratings, and the others are kept.
+        updated = professor(1, "Ann", "Computer Science", [("CSDS132", 3)],
+                            [rating("r5", "CSDS132", "2024-04-01", tags="Caring")])
+        updated["avgRating"] = 4
+        self.store.add(updated, school_id=186)
+
+        found = self.store.professor(1)
+        self.assertEqual((4, ["CSDS132"]), (found.rating, [course.name for course in found.courses]))
+        self.assertEqual(4, len(self.store.ratings(professor_id=1)))
+        self.assertEqual([("Caring", 2), ("Tough grader", 2)], self.store.tags(1))
+        self.assertEqual(2, len(self.store))
+
+    def test_snapshot(self):
+        with Snapshot(SNAPSHOT) as snapshot:
+            self.assertEqual(477, self.store.add_all(snapshot, school_id=1448))
+        found = self.store.professor(27707)
+        self.assertEqual(("Lisa Dickson", "English", 50, "University of Northern British Columbia"),
+                         (found.name, found.department, found.would_take_again, found.school.name))
+        self.assertEqual(32, len(self.store.professors(school_id=1448, department="English")))
+
+
+class CrawlStoreTest(FakeServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server.add_school(186, "Case Western Reserve University")
+        self.server.add_teacher(1658282, 186, "Harold", "Connamacher", "Computer Science", courses={"CSDS132": 3})
+        for rating_id in range(1, 4):
+            self.server.add_rating(1658282, rating_id, "2024-01-0%s 10:00:00 +0000 UTC" % rating_id, str(rating_id),
+                                   "CSDS132")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_crawl(self):
+        store = Store(os.path.join(self.directory.name, "store.sqlite3"))
+        crawler = Crawler(self.directory.name, page_size=2, transport=self.transport, sync=True, store=store)
+        crawler.crawl([186])
+        self.server.add_rating(1658282, 4, "2024-02-01 10:00:00 +0000 UTC", "4", "CSDS132")
+        crawler.crawl([186])
+
+        self.server.requests.clear()
+        found = store.professor(1658282)
+        self.assertEqual(("Harold Connamacher", 4, ["CSDS132"]),
+                         (found.name, found.num_ratings, [course.name for course in found.courses]))
+        self.assertEqual(["4", "3", "2", "1"], [found.comment for found in store.ratings(course="CSDS132")])
+        self.assertEqual(0, self.server.count())
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+import datetime
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import ratemyprofessor
+from ratemyprofessor import School, Professor, Transport
+from ratemyprofessor import school as school_module
+from ratemyprofessor.ratelimit import RateLimiter
+
+from fake_server import FakeServerTestCase
+
+
+class TransportTest(FakeServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server.add_school(186, "Case Western Reserve University", "Cleveland", "OH")
+        self.server.add_school(187, "Case Eastern University", "Cleveland", "OH")
+        self.server.add_teacher(1658282, 186, "Harold", "Connamacher", "Computer Science", 4.5, 3.2, 80,
+                                courses={"CSDS132": 2, "CSDS233": 1})
+        self.server.add_rating(1658282, 1, "2024-01-02 10:00:00 +0000 UTC", "Great!", "CSDS132")
+        self.server.add_rating(1658282, 2, "2023-05-06 10:00:00 +0000 UTC", "Hard but fair", "CSDS233")
+        self.server.add_rating(1658282, 3, "2022-03-04 10:00:00 +0000 UTC", "Loved it", "CSDS132")
+        self.server.add_teacher(1, 186, "Alan", "Smith", "Mathematics", 3.0, 4.0)
+
+    def test_school(self):
+        cwru = School(186)
+        self.assertEqual("Case Western Reserve University", cwru.name)
+        self.assertEqual(cwru, ratemyprofessor.get_school_by_name("Case Western Reserve University"))
+
+        with self.assertRaises(ValueError):
+            School(-1)
+
+    def test_school_search(self):
+        for legacy_id in range(200, 245):
+            self.server.add_school(legacy_id, "Ohio State %s" % legacy_id, "Columbus", "OH", ["History"])
+
+        schools = ratemyprofessor.get_schools_by_name("Ohio State")
+        self.assertEqual(20, len(schools))
+        self.assertEqual(("Ohio State 200", "Columbus", "OH", ["History"]),
+                         (schools[0].name, schools[0].city, schools[0].state, schools[0].departments))
+
+        self.server.requests.clear()
+        schools = list(ratemyprofessor.iter_schools("ohio state", page_size=20))
+        self.assertEqual(["Ohio State %s" % legacy_id for legacy_id in range(200, 245)], [s.name for s in schools])
+        self.assertEqual(3, self.server.count("POST", "/graphql"))
+        self.assertEqual(0, self.server.count("GET"))
+
+        self.assertEqual([], ratemyprofessor.get_schools_by_name("Fake University That Does Not Exist"))
+        self.assertIsNone(School(186).city)
+
+    def test_professor(self):
+        connamacher = Professor(1658282)
+        self.assertEqual("Harold Connamacher", connamacher.name)
+        self.assertEqual("Computer Science", connamacher.department)
+        self.assertEqual(3, connamacher.num_ratings)
+        self.assertEqual(School(186), connamacher.school)
+        self.assertEqual(["CSDS132", "CSDS233"], [course.name for course in connamacher.courses])
+
+        self.assertEqual(connamacher, ratemyprofessor.get_professor_by_school_and_name(School(186), "Connamacher"))
+        self.assertEqual([], ratemyprofessor.get_professors_by_school_and_name(School(186), "Peter Rabbit"))
+
+        with self.assertRaises(ValueError):
+            Professor(2)
+
+    def test_get_professors(self):
+        for legacy_id in range(100, 107):
+            self.server.add_teacher(legacy_id, 186, "Prof", str(legacy_id))
+
+        professors = ratemyprofessor.get_professors([106, 100, 999, 103, 1658282], chunk_size=2)
+        self.assertEqual([106, 100, 103, 1658282], [professor.id for professor in professors])
+        self.assertEqual("Prof 106", professors[0].name)
+        self.assertEqual("Harold Connamacher", professors[3].name)
+        self.assertEqual(3, self.server.count("POST", "/graphql"))
+
+    def test_school_registry(self):
+        professors = ratemyprofessor.get_professors([1658282, 1])
+        self.assertIs(professors[0].school, professors[1].school)
+        self.assertIs(professors[0].school, ratemyprofessor.get_school(186))
+        self.assertEqual("Case Western Reserve University", professors[0].school.name)
+        self.assertEqual(0, self.server.count("GET", "/school/"))
+
+    def test_search_is_lazy(self):
+        professor = ratemyprofessor.get_professor_by_school_and_name(School(186, name="Case Western Reserve University"),
+                                                                     "Harold Connamacher")
+        self.assertEqual("Harold Connamacher", professor.name)
+        self.assertEqual(3, professor.num_ratings)
+        self.assertEqual(1, self.server.count("POST", "/graphql"))
+
+        self.assertEqual(["CSDS132", "CSDS233"], [course.name for course in professor.courses])
+        self.assertEqual(2, self.server.count("POST", "/graphql"))
+
+    def test_iter_professors(self):
+        for legacy_id in range(100, 250):
+            self.server.add_teacher(legacy_id, 186, "Prof", str(legacy_id), "Physics", 4.0, 2.0, 75)
+        self.server.add_teacher(300, 187, "Prof", "Elsewhere")
+
+        professors = list(ratemyprofessor.iter_professors(School(186), page_size=50))
+        self.assertEqual(152, len(professors))
+        self.assertEqual(4, self.server.count("POST", "/graphql"))
+        third = professors[2]
+        self.assertEqual(("Prof 100", 4.0, 2.0, 75, 0),
+                         (third.name, third.rating, third.difficulty, third.would_take_again, third.num_ratings))
+        self.assertEqual(4, self.server.count("POST", "/graphql"))
+
+        self.assertEqual(100, len(list(ratemyprofessor.iter_professors(School(186), "prof 1", page_size=20))))
+        self.assertEqual(20, len(ratemyprofessor.get_professors_by_school_and_name(School(186), "prof 1")))
+
+    def test_lazy_professor(self):
+        professor = Professor(1658282, lazy=True)
+        self.assertEqual(0, self.server.count())
+
+        threads = [threading.Thread(target=lambda: professor.courses) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual("Harold Connamacher", professor.name)
+        self.assertEqual(1, self.server.count("POST", "/graphql"))
+
+        with self.assertRaises(ValueError):
+            Professor(2, lazy=True).name
+        with self.assertRaises(AttributeError):
+            Professor(1658282, lazy=True).missing
+
+    def test_lazy_school(self):
+        school = School(186, lazy=True)
+        self.assertEqual(0, self.server.count())
+        self.assertEqual("Case Western Reserve University", school.name)
+        self.assertEqual("Case Western Reserve University", school.name)
+        self.assertEqual(1, self.server.count("GET", "/school/"))
+
+    def test_ratings(self):
+        connamacher = Professor(1658282)
+        ratings = connamacher.get_ratings()
+        self.assertEqual(["Great!", "Hard but fair", "Loved it"], [rating.comment for rating in ratings])
+        self.assertEqual(2, len(connamacher.get_ratings("CSDS132")))
+        self.assertEqual([], connamacher.get_ratings("MATH101"))
+
+    def test_bulk_ratings(self):
+        connamacher = Professor(1658282)
+        ratings = connamacher.get_ratings()
+        batch = connamacher.get_ratings(bulk=True)
+
+        self.assertEqual(3, len(batch))
+        self.assertEqual([rating.date for rating in ratings], [rating.date for rating in batch])
+        self.assertEqual([rating.comment for rating in ratings], [batch.comment(i) for i in range(len(batch))])
+        self.assertEqual("CSDS233", batch.class_name(1))
+        self.assertEqual([5.0, 5.0, 5.0], list(batch.rating))
+        self.assertEqual([1, 1, 1], list(batch.take_again))
+        self.assertEqual("Loved it", batch[-1].comment)
+        self.assertTrue(batch[0].credit)
+        self.assertFalse(hasattr(ratings[0], "__dict__"))
+
+    def test_iter_ratings(self):
+        connamacher = Professor(1658282)
+        self.server.requests.clear()
+
+        ratings = connamacher.iter_ratings(page_size=2)
+        self.assertEqual("Great!", next(ratings).comment)
+        self.assertEqual(1, self.server.count("POST", "/graphql"))
+        self.assertEqual(["Hard but fair", "Loved it"], [rating.comment for rating in ratings])
+        self.assertEqual(2, self.server.count("POST", "/graphql"))
+
+        self.server.requests.clear()
+        recent = list(connamacher.iter_ratings(page_size=1, since=datetime.datetime(2023, 1, 1)))
+        self.assertEqual(["Great!", "Hard but fair"], [rating.comment for rating in recent])
+        self.assertEqual(3, self.server.count("POST", "/graphql"))
+
+        # A date with a timezone is compared in UTC: 2023-05-06 10:00 UTC is 06:00 in UTC-4.
+        eastern = datetime.timezone(datetime.timedelta(hours=-4))
+        recent = connamacher.iter_ratings(since=datetime.datetime(2023, 5, 6, 6, tzinfo=eastern))
+        self.assertEqual(["Great!", "Hard but fair"], [rating.comment for rating in recent])
+
+        by_course = connamacher.iter_ratings(page_size=1, course_name="CSDS132")
+        self.assertEqual(["Great!", "Loved it"], [rating.comment for rating in by_course])
+
+    def test_course_filter_does_not_carry_over(self):
+        connamacher = Professor(1658282)
+        self.assertEqual(["Great!", "Loved it"], [rating.comment for rating in connamacher.get_ratings("CSDS132")])
+        self.assertEqual(3, len(connamacher.get_ratings()))
+
+    def test_concurrent_professors(self):
+        for legacy_id in range(100, 140):
+            self.server.add_teacher(legacy_id, 186, "Prof", str(legacy_id))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            professors = list(executor.map(Professor, range(100, 140)))
+        self.assertEqual(["Prof %s" % legacy_id for legacy_id in range(100, 140)], [p.name for p in professors])
+
+    def test_injected_transport(self):
+        ratemyprofessor.set_transport(None)
+        school = School(186, transport=self.transport)
+        self.assertEqual("Case Western Reserve University", school.name)
+        professor = Professor(1658282, transport=self.transport)
+        self.assertEqual("Harold Connamacher", professor.name)
+
+    def test_memo(self):
+        schools = ratemyprofessor.get_schools_by_name("Case Western")
+        self.assertEqual(schools[0], ratemyprofessor.get_school_by_name("  case western "))
+        self.assertEqual(1, self.server.count("POST", "/graphql"))
+
+        ratemyprofessor.get_professors_by_school_and_name(schools[0], "Connamacher")
+        ratemyprofessor.get_professors_by_school_and_name(schools[0], "connamacher")
+        self.assertEqual(2, self.server.count("POST", "/graphql"))
+
+        Professor(1658282)
+        school_module._schools.cache_clear()
+        self.assertEqual("Harold Connamacher", Professor(1658282).name)
+        self.assertEqual("Case Western Reserve University", School(186).name)
+        self.assertEqual(3, self.server.count("POST", "/graphql"))
+        self.assertEqual(0, self.server.count("GET", "/school/"))
+
+        info = ratemyprofessor.memo.cache_info()
+        self.assertEqual((4, 3), (info.hits, info.misses))
+
+    def test_memo_is_per_transport(self):
+        Professor(1658282)
+        other = Transport(base_url=self.server.url, limiter=RateLimiter())
+        self.addCleanup(other.close)
+        self.assertEqual("Harold Connamacher", Professor(1658282, transport=other).name)
+        self.assertEqual(2, self.server.count("POST", "/graphql"))
+
+        self.assertEqual("Case Eastern University", ratemyprofessor.get_school(187).name)
+        self.server.schools[187]["name"] = "Case Eastern"
+        school = ratemyprofessor.get_school(187, transport=other)
+        self.assertIsNot(school, ratemyprofessor.get_school(187))
+        self.assertEqual("Case Eastern", school.name)
+        self.assertEqual(2, self.server.count("GET", "/school/"))
+
+    def test_connections_are_reused(self):
+        School(186)
+        School(186)
+        pool = self.transport.session.get_adapter(self.server.url).poolmanager
+        self.assertEqual(1, len(pool.pools))
+
+
+if __name__ == '__main__':
+    unittest.main()